@@ -0,0 +1,5 @@
+from feinsum_evaluation.driver import main
+
+
+if __name__ == "__main__":
+    main()
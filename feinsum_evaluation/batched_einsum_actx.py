@@ -0,0 +1,70 @@
+"""
+The :mod:`feinsum`-transformed :mod:`pytato` array context, which is only
+imported once selected by its name, see
+:func:`feinsum_evaluation.utils.get_actx_class`.
+
+.. autoclass:: BatchedEinsumPytatoPyOpenCLArrayContext
+"""
+import dataclasses as dc
+
+from arraycontext import (
+    BatchedEinsumPytatoPyOpenCLArrayContext as BaseBatchedEinsumPytatoPyOpenCLArrayContext  # noqa: E501
+)
+from feinsum_evaluation.metadata import NamedAxis
+from typing import Any, Callable, Optional
+from pytools.tag import Tag, UniqueTag
+
+
+@dc.dataclass(frozen=True)
+class _UnfusedAxis(UniqueTag):
+    # tags no axis of the benchmarked kernels, so that no loops are fused
+    name: str
+
+
+def _fused_loop_name_prefix_getter(tag: Tag) -> str:
+    if isinstance(tag, NamedAxis):
+        return f"i{tag.name}"
+    else:
+        raise NotImplementedError(type(tag))
+
+
+class BatchedEinsumPytatoPyOpenCLArrayContext(
+    BaseBatchedEinsumPytatoPyOpenCLArrayContext
+        ):
+    def __init__(
+        self,
+        queue, allocator=None,
+        *,
+        compile_trace_callback: Optional[Callable[[Any, str, Any], None]] = None,
+        feinsum_db: Optional[str] = None,
+        log_loopy_statistics: bool = False,
+        fuse_loops: bool = True,
+        assume_non_negative_indices: bool = True,
+    ) -> None:
+        """
+        :arg feinsum_db: Path of the :mod:`feinsum` database to look up the
+            transformations of the batched einsums in. Defaults to
+            :data:`feinsum.DEFAULT_DB`.
+        :arg fuse_loops: If *False*, the loops of the axes tagged with
+            :class:`~feinsum_evaluation.metadata.NamedAxis` are not fused
+            across the einsums, i.e. every einsum is code-generated as a
+            loop nest of its own.
+        :arg assume_non_negative_indices: If *True*, the indirection maps,
+            for ex. of the face gathers, are assumed to hold no negative
+            indices, which spares the generated code their wraparound.
+        """
+        import feinsum as fnsm
+
+        super().__init__(
+            queue, allocator,
+            loop_fusion_axis_tag_t=NamedAxis if fuse_loops else _UnfusedAxis,
+            fallback_to_no_fusion=not fuse_loops,
+            assume_all_indirection_maps_as_non_negative=(
+                assume_non_negative_indices),
+            compile_trace_callback=compile_trace_callback,
+            feinsum_db=fnsm.DEFAULT_DB if feinsum_db is None else feinsum_db,
+            log_loopy_statistics=log_loopy_statistics,
+            fused_loop_name_prefix_getter=_fused_loop_name_prefix_getter
+        )
+
+# vim: fdm=marker
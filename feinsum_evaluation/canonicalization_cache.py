@@ -0,0 +1,170 @@
+"""
+Memoization of :func:`feinsum.canonicalize_einsum`.
+
+.. autofunction:: get_structural_key
+.. autoclass:: CanonicalizationCache
+.. autofunction:: patch_feinsum
+"""
+import pickle
+import sys
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Iterator, Optional
+
+if TYPE_CHECKING:
+    import feinsum as f
+
+
+def get_structural_key(expr: "f.FusedEinsum") -> Hashable:
+    """
+    Returns a key of *expr* that is cheap to compute and hash, made up of its
+    subscripts, operand shapes, dtypes and the pattern in which its values
+    are used by the batch members. The names of the values do not contribute
+    to the key, since they do not affect the canonical form.
+    """
+    value_ids: Dict[str, int] = {}
+
+    def _get_value_id(name: str) -> int:
+        return value_ids.setdefault(name, len(value_ids))
+
+    use_pattern = tuple(
+        tuple(tuple(sorted(_get_value_id(name) for name in sorted(uses)))
+              for uses in batch_member_uses)
+        for batch_member_uses in expr.use_matrix)
+    dtypes = tuple(sorted((value_ids[name], str(dtype))
+                          for name, dtype in expr.value_to_dtype.items()
+                          if name in value_ids))
+
+    return (expr.get_subscripts(), tuple(expr.arg_shapes), use_pattern, dtypes)
+
+
+class CanonicalizationCache:
+    """
+    A bounded LRU cache of the canonical forms of einsums, keyed by
+    :func:`get_structural_key`.
+
+    .. attribute:: maxsize
+    .. attribute:: nhits
+    .. attribute:: nmisses
+    .. attribute:: hit_time
+
+        Total time (in seconds) spent in calls that hit the cache.
+
+    .. attribute:: miss_time
+
+        Total time (in seconds) spent in calls that missed the cache, i.e.
+        in the actual canonicalization.
+    """
+    def __init__(self, maxsize: int = 1024,
+                 canonicalize: Any = None) -> None:
+        import feinsum as f
+
+        self.maxsize = maxsize
+        self._canonicalize = (f.canonicalize_einsum
+                              if canonicalize is None
+                              else canonicalize)
+        self._entries: "OrderedDict[Hashable, f.FusedEinsum]" = OrderedDict()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.nhits = 0
+        self.nmisses = 0
+        self.hit_time = 0.
+        self.miss_time = 0.
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        ncalls = self.nhits + self.nmisses
+        return self.nhits / ncalls if ncalls else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def update(self, other: "CanonicalizationCache") -> None:
+        """
+        Adds the entries and the statistics of *other*, for ex. of a copy of
+        the cache that was used in a worker process.
+        """
+        for key, value in other._entries.items():
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+        self.nhits += other.nhits
+        self.nmisses += other.nmisses
+        self.hit_time += other.hit_time
+        self.miss_time += other.miss_time
+
+    def __call__(self, expr: "f.FusedEinsum") -> "f.FusedEinsum":
+        t_start = perf_counter_ns()
+        key = get_structural_key(expr)
+
+        try:
+            result = self._entries[key]
+        except KeyError:
+            result = self._canonicalize(expr)
+            self._entries[key] = result
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self.nmisses += 1
+            self.miss_time += (perf_counter_ns() - t_start) * 1e-9
+        else:
+            self._entries.move_to_end(key)
+            self.nhits += 1
+            self.hit_time += (perf_counter_ns() - t_start) * 1e-9
+
+        return result
+
+    # {{{ persistence
+
+    def save(self, filename: str) -> None:
+        with open(filename, "wb") as fp:
+            pickle.dump(list(self._entries.items()), fp,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, filename: str) -> None:
+        """
+        Adds the entries saved by :meth:`save` in *filename* to the cache.
+        """
+        with open(filename, "rb") as fp:
+            entries = pickle.load(fp)
+
+        for key, value in entries:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    # }}}
+
+
+@contextmanager
+def patch_feinsum(cache: CanonicalizationCache) -> Iterator[None]:
+    """
+    Within the scope, routes all calls to :func:`feinsum.canonicalize_einsum`,
+    including the ones from within :mod:`feinsum`'s submodules that imported
+    it by name, through *cache*.
+    """
+    import feinsum as f
+
+    orig = f.canonicalize_einsum
+    patched_modules = [module
+                       for name, module in list(sys.modules.items())
+                       if (name == "feinsum" or name.startswith("feinsum."))
+                       and getattr(module, "canonicalize_einsum", None) is orig]
+
+    for module in patched_modules:
+        module.canonicalize_einsum = cache
+    try:
+        yield
+    finally:
+        for module in patched_modules:
+            module.canonicalize_einsum = orig
+
+# vim: fdm=marker
@@ -1,111 +1,97 @@
-import feinsum as f
-import numpy as np
-from typing import Tuple
+"""
+Measures the time taken by :func:`feinsum.canonicalize_einsum` on the
+contractions of the TCCG benchmark suite, read from ``data/tccg.csv``.
+
+The cases are timed concurrently in a pool of worker processes, each pinned
+to its own core.
+"""
+import argparse
+import csv
+import dataclasses as dc
+import io
+import json
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple
 from tabulate import tabulate
+from feinsum_evaluation.timing import TimingStatistics, time_callable
+from feinsum_evaluation.canonicalization_cache import CanonicalizationCache
+from feinsum_evaluation.precision import (PRECISIONS, DEFAULT_PRECISION,
+                                          Precision)
+from feinsum_evaluation.utils import (parse_comma_separated,
+                                      parse_comma_separated_ints)
+from feinsum_evaluation.results_db import (DEFAULT_RESULTS_DB, ResultRecord,
+                                           ResultsDatabase)
 
+if TYPE_CHECKING:
+    import feinsum as f
 
-def _get_index_shape_str(i: int) -> Tuple[str, str]:
-    if i == 1:
-        return ("abc-bda-dc", "312 312 24 312")
-    elif i == 2:
-        return ("abc-dca-bd", "312 24 296 312")
-    elif i == 3:
-        return ("abcd-dbea-ec", "72 72 24 72 72")
-    elif i == 4:
-        return ("abcd-deca-be", "72 24 72 72 72")
-    elif i == 5:
-        return ("abcd-ebad-ce", "72 72 24 72 72")
-    elif i == 6:
-        return ("abcde-efbad-cf", "48 32 24 32 48 32")
-    elif i == 7:
-        return ("abcde-ecbfa-fd", "48 32 32 24 48 48")
-    elif i == 8:
-        return ("abcde-efcad-bf", "48 24 32 32 48 32")
-    elif i == 9:
-        return ("abcd-ea-ebcd", "72 72 72 72 72")
-    elif i == 10:
-        return ("abcd-eb-aecd", "72 72 72 72 72")
-    elif i == 11:
-        return ("abcd-ec-abed", "72 72 72 72 72")
-    elif i == 12:
-        return ("ab-ac-cb", "5136 5120 5136")
-    elif i == 13:
-        return ("ab-acd-dbc", "312 296 296 312")
-    elif i == 14:
-        return ("ab-cad-dcb", "312 296 312 312")
-    elif i == 15:
-        return ("abc-acd-db", "312 296 296 312")
-    elif i == 16:
-        return ("abc-ad-bdc", "312 312 296 296")
-    elif i == 17:
-        return ("abc-adc-bd", "312 312 296 296")
-    elif i == 18:
-        return ("abc-adc-db", "312 296 296 312")
-    elif i == 19:
-        return ("abc-adec-ebd", "72 72 72 72 72")
-    elif i == 20:
-        return ("abcd-aebf-dfce", "72 72 72 72 72 72")
-    elif i == 21:
-        return ("abcd-aebf-fdec", "72 72 72 72 72 72")
-    elif i == 22:
-        return ("abcd-aecf-bfde", "72 72 72 72 72 72")
-    elif i == 23:
-        return ("abcd-aecf-fbed", "72 72 72 72 72 72")
-    elif i == 24:
-        return ("abcd-aedf-bfce", "72 72 72 72 72 72")
-    elif i == 25:
-        return ("abcd-aedf-fbec", "72 72 72 72 72 72")
-    elif i == 26:
-        return ("abcd-aefb-fdce", "72 72 72 72 72 72")
-    elif i == 27:
-        return ("abcd-aefc-fbed", "72 72 72 72 72 72")
-    elif i == 28:
-        return ("abcd-eafb-fdec", "72 72 72 72 72 72")
-    elif i == 29:
-        return ("abcd-eafc-bfde", "72 72 72 72 72 72")
-    elif i == 30:
-        return ("abcd-eafd-fbec", "72 72 72 72 72 72")
-    elif i == 31:
-        return ("abcdef-dega-gfbc", "24 16 16 24 16 16 24")
-    elif i == 32:
-        return ("abcdef-degb-gfac", "24 16 16 24 16 16 24")
-    elif i == 33:
-        return ("abcdef-degc-gfab", "24 16 16 24 16 16 24")
-    elif i == 34:
-        return ("abcdef-dfga-gebc", "24 16 16 24 16 16 24")
-    elif i == 35:
-        return ("abcdef-dfgb-geac", "24 16 16 24 16 16 24")
-    elif i == 36:
-        return ("abcdef-dfgc-geab", "24 16 16 24 16 16 24")
-    elif i == 37:
-        return ("abcdef-efga-gdbc", "24 16 16 16 24 16 24")
-    elif i == 38:
-        return ("abcdef-efgb-gdac", "24 16 16 16 24 16 24")
-    elif i == 39:
-        return ("abcdef-efgc-gdab", "24 16 16 16 24 16 24")
-    elif i == 40:
-        return ("abcdef-gdab-efgc", "24 16 16 16 24 16 24")
-    elif i == 41:
-        return ("abcdef-gdac-efgb", "24 16 16 16 24 16 24")
-    elif i == 42:
-        return ("abcdef-gdbc-efga", "24 16 16 16 24 16 24")
-    elif i == 43:
-        return ("abcdef-geab-dfgc", "24 16 16 24 16 16 24")
-    elif i == 44:
-        return ("abcdef-geac-dfgb", "24 16 16 24 16 16 24")
-    elif i == 45:
-        return ("abcdef-gebc-dfga", "24 16 16 24 16 16 24")
-    elif i == 46:
-        return ("abcdef-gfab-degc", "24 16 16 24 16 16 24")
-    elif i == 47:
-        return ("abcdef-gfac-degb", "24 16 16 24 16 16 24")
-    elif i == 48:
-        return ("abcdef-gfbc-dega", "24 16 16 24 16 16 24")
-    else:
-        raise NotImplementedError(i)
 
+TCCG_SUITE_FILENAME = os.path.join(os.path.dirname(__file__), "data",
+                                   "tccg.csv")
+
+
+@dc.dataclass(frozen=True)
+class TCCGBenchmark:
+    """
+    .. attribute:: subscript
+
+        Indices of the output and the two inputs, separated by ``"-"``, for ex.
+        ``"abc-bda-dc"``.
+
+    .. attribute:: shape
+
+        Space separated lengths of the indices in alphabetical order.
+    """
+    id: int
+    subscript: str
+    shape: str
+
+
+@dc.dataclass(frozen=True)
+class CanonicalizationResult:
+    """
+    .. attribute:: timing
+
+        :class:`~feinsum_evaluation.timing.TimingStatistics` of
+        :func:`feinsum.canonicalize_einsum`.
+
+    .. attribute:: cached_timing
+
+        :class:`~feinsum_evaluation.timing.TimingStatistics` of a lookup that
+        hits the
+        :class:`~feinsum_evaluation.canonicalization_cache.CanonicalizationCache`.
+        *None* if the cache was not benchmarked.
+
+    .. attribute:: dtype
 
-def _parse_tccg_benchmark(subscript: str, shape: str) -> f.FusedEinsum:
+        Name of the :class:`~feinsum_evaluation.precision.Precision` of the
+        operands.
+    """
+    id: int
+    einsum: str
+    timing: TimingStatistics
+    cached_timing: Optional[TimingStatistics] = None
+    dtype: str = DEFAULT_PRECISION
+
+
+def load_tccg_suite(filename: str = TCCG_SUITE_FILENAME) -> List[TCCGBenchmark]:
+    with open(filename, newline="") as fp:
+        return [TCCGBenchmark(id=int(row["id"]),
+                              subscript=row["subscript"],
+                              shape=row["shape"])
+                for row in csv.DictReader(fp)]
+
+
+def _parse_tccg_benchmark(subscript: str, shape: str,
+                          precision: Precision = PRECISIONS[DEFAULT_PRECISION],
+                          ) -> "f.FusedEinsum":
+    import feinsum as f
+
+    # the first operand plays the role of the batched operands of the
+    # DG-kernels, i.e. it is stored in the precision's storage type.
     output, inA, inB = subscript.split("-")
     axis_lens = {chr(97+i): int(axis_len)
                  for i, axis_len in enumerate(shape.split(" "))}
@@ -114,27 +100,282 @@ def _parse_tccg_benchmark(subscript: str, shape: str) -> f.FusedEinsum:
     shapeB = [axis_lens[idx] for idx in inB]
 
     return f.einsum(f"{inA},{inB}->{output}",
-                    f.array(shapeA, np.float64),
-                    f.array(shapeB, np.float64))
+                    f.array(shapeA, precision.get_dtype(is_batched=True)),
+                    f.array(shapeB, precision.get_dtype(is_batched=False)))
+
+
+def _get_time_to_canonicalize(expr: "f.FusedEinsum", *,
+                              rel_ci_width: float,
+                              max_time: float) -> TimingStatistics:
+    import feinsum as f
+    return time_callable(f.canonicalize_einsum, (expr,),
+                         rel_ci_width=rel_ci_width,
+                         max_time=max_time,
+                         max_samples=10_000,
+                         max_warmup_samples=3)
 
 
-def _get_time_to_canonicalize_in_secs(expr: f.FusedEinsum) -> float:
-    import timeit
-    ncount = 1000
-    return timeit.timeit(lambda: f.canonicalize_einsum(expr), number=ncount)/ncount
+# {{{ process pool
+
+def _pin_worker(cores: Any) -> None:
+    # each worker claims one of the cores
+    os.sched_setaffinity(0, {cores.get()})
+
+
+def _run_benchmark(benchmark: TCCGBenchmark,
+                   dtype: str,
+                   rel_ci_width: float,
+                   max_time: float,
+                   with_cache: bool) -> CanonicalizationResult:
+    einsum = _parse_tccg_benchmark(benchmark.subscript, benchmark.shape,
+                                   PRECISIONS[dtype])
+    timing = _get_time_to_canonicalize(einsum,
+                                       rel_ci_width=rel_ci_width,
+                                       max_time=max_time)
+
+    if with_cache:
+        cache = CanonicalizationCache()
+        cached_timing = time_callable(cache, (einsum,),
+                                      rel_ci_width=rel_ci_width,
+                                      max_time=max_time,
+                                      max_samples=10_000,
+                                      max_warmup_samples=3)
+    else:
+        cached_timing = None
+
+    return CanonicalizationResult(id=benchmark.id,
+                                  einsum=einsum.get_subscripts(),
+                                  timing=timing,
+                                  cached_timing=cached_timing,
+                                  dtype=dtype)
 
 
-def plot_time_to_canonicalize():
-    table = []
-    for i in range(1, 49):
-        einsum = _parse_tccg_benchmark(*_get_index_shape_str(i))
-        time_in_ms = _get_time_to_canonicalize_in_secs(einsum) * 1000
-        table.append([r"\texttt{" + einsum.get_subscripts() + "}",
-                      f"{time_in_ms:.2f}"])
+def run_benchmarks(benchmarks: Sequence[TCCGBenchmark], *,
+                   nworkers: Optional[int] = None,
+                   rel_ci_width: float = 0.02,
+                   max_time: float = 2,
+                   with_cache: bool = False,
+                   dtypes: Sequence[str] = (DEFAULT_PRECISION,),
+                   ) -> List[CanonicalizationResult]:
+    """
+    Times the canonicalization of *benchmarks* in *nworkers* processes, each
+    pinned to one of the cores available to this process.
 
-    print(tabulate(table, headers=["einsum", "Time to canonicalize (in msecs)"],
-                   tablefmt="latex_raw"))
+    :arg dtypes: Names of the precisions, see
+        :data:`~feinsum_evaluation.precision.PRECISIONS`, in which every
+        benchmark is canonicalized.
+
+    :arg with_cache: If *True*, also times the lookups that hit a
+        :class:`~feinsum_evaluation.canonicalization_cache.CanonicalizationCache`.
+    """
+    import multiprocessing as mp
+
+    cores = sorted(os.sched_getaffinity(0))
+    if nworkers is None:
+        nworkers = len(cores)
+    nworkers = min(nworkers, len(cores))
+
+    ctx = mp.get_context("spawn")
+    core_queue = ctx.Queue()
+    for core in cores[:nworkers]:
+        core_queue.put(core)
+
+    cases = [(benchmark, dtype)
+             for benchmark in benchmarks
+             for dtype in dtypes]
+
+    with ProcessPoolExecutor(max_workers=nworkers, mp_context=ctx,
+                             initializer=_pin_worker,
+                             initargs=(core_queue,)) as executor:
+        results = list(executor.map(_run_benchmark,
+                                    [benchmark for benchmark, _ in cases],
+                                    [dtype for _, dtype in cases],
+                                    [rel_ci_width] * len(cases),
+                                    [max_time] * len(cases),
+                                    [with_cache] * len(cases)))
+
+    return results
+
+# }}}
+
+
+# {{{ rendering
+
+FORMATS = ("table", "latex", "csv", "json")
+
+
+def render_results(results: Sequence[CanonicalizationResult],
+                   fmt: str) -> str:
+    if fmt == "json":
+        return json.dumps([dc.asdict(result) for result in results], indent=2)
+    elif fmt == "csv":
+        fp = io.StringIO()
+        writer = csv.writer(fp)
+        writer.writerow(["id", "einsum", "dtype", "median_s", "min_s", "q1_s",
+                         "q3_s", "ci_low_s", "ci_high_s", "nsamples",
+                         "noutliers", "cached_median_s"])
+        for result in results:
+            writer.writerow([result.id, result.einsum, result.dtype,
+                             result.timing.median,
+                             result.timing.min, result.timing.q1,
+                             result.timing.q3, result.timing.ci_low,
+                             result.timing.ci_high,
+                             len(result.timing.samples),
+                             result.timing.n_outliers,
+                             ("" if result.cached_timing is None
+                              else result.cached_timing.median)])
+        return fp.getvalue()
+    elif fmt == "latex":
+        # the columns of the table of the paper, which has a single
+        # precision, the dtype column tells the rows of several apart
+        with_dtype = len({result.dtype for result in results}) > 1
+        table = [[r"\texttt{" + result.einsum + "}",
+                  *([r"\texttt{" + result.dtype + "}"] if with_dtype else []),
+                  f"{result.timing.median * 1000:.2f}"]
+                 for result in results]
+        return tabulate(table,
+                        headers=["einsum",
+                                 *(["dtype"] if with_dtype else []),
+                                 "Time to canonicalize (in msecs)"],
+                        tablefmt="latex_raw")
+    elif fmt == "table":
+        table = []
+        for result in results:
+            row = [result.id, result.einsum, result.dtype,
+                   f"{result.timing.median * 1000:.3f}",
+                   f"{result.timing.iqr * 1000:.3f}",
+                   f"{100 * result.timing.iqr / result.timing.median:.1f}%",
+                   len(result.timing.samples)]
+            if result.cached_timing is not None:
+                row += [f"{result.cached_timing.median * 1e6:.2f}",
+                        f"{result.timing.median/result.cached_timing.median:.0f}x"]
+            table.append(row)
+
+        return tabulate(table,
+                        headers=["#", "einsum", "dtype", "median (ms)",
+                                 "IQR (ms)",
+                                 "IQR/median", "#samples",
+                                 "cache hit (us)", "speedup"])
+    else:
+        raise NotImplementedError(fmt)
+
+# }}}
+
+
+def to_result_record(result: CanonicalizationResult) -> ResultRecord:
+    key = f"canonicalize|tccg{result.id}|{result.einsum}"
+    # keeps the keys of the float64 cases comparable with earlier runs
+    if result.dtype != DEFAULT_PRECISION:
+        key += f"|dtype={result.dtype}"
+    return ResultRecord(key=key,
+                        suite="canonicalization",
+                        kernel=result.einsum,
+                        actx=None, nbatch=None, ni=None, nj=None, nel=None,
+                        device=None, driver_version=None,
+                        median=result.timing.median,
+                        samples=result.timing.samples,
+                        peak_device_bytes=None,
+                        record=dc.asdict(result))
+
+
+def plot_time_to_canonicalize(*,
+                              fmt: str = "latex",
+                              output: Optional[str] = None,
+                              nworkers: Optional[int] = None,
+                              ids: Optional[Tuple[int, ...]] = None,
+                              rel_ci_width: float = 0.02,
+                              max_time: float = 2,
+                              with_cache: bool = False,
+                              dtypes: Sequence[str] = (DEFAULT_PRECISION,),
+                              results_db: Optional[str] = None) -> None:
+    """
+    :arg dtypes: See :func:`run_benchmarks`.
+    :arg results_db: If not *None*, the results are appended as a new run to
+        the :class:`~feinsum_evaluation.results_db.ResultsDatabase` in this
+        file.
+    """
+    benchmarks = load_tccg_suite()
+    if ids is not None:
+        benchmarks = [benchmark for benchmark in benchmarks
+                      if benchmark.id in ids]
+
+    results = run_benchmarks(benchmarks,
+                             nworkers=nworkers,
+                             rel_ci_width=rel_ci_width,
+                             max_time=max_time,
+                             with_cache=with_cache,
+                             dtypes=dtypes)
+    rendered = render_results(results, fmt)
+
+    if results_db is not None:
+        with ResultsDatabase(results_db) as db:
+            db.add_run("canonicalization",
+                       [to_result_record(result) for result in results],
+                       argv=sys.argv[1:])
+
+    if output is None:
+        print(rendered)
+    else:
+        with open(output, "w") as fp:
+            fp.write(rendered)
 
 
 if __name__ == "__main__":
-    plot_time_to_canonicalize()
+    parser = argparse.ArgumentParser(
+        prog="canonicalization_costs.py",
+        description="Time feinsum's canonicalization of the TCCG suite",
+    )
+    parser.add_argument("--format", choices=FORMATS, default="latex",
+                        help="output format. Defaults to 'latex'.")
+    parser.add_argument("--output", metavar="FILE", type=str, default=None,
+                        help="write the output to FILE instead of stdout.")
+    parser.add_argument("--nworkers", type=int, default=None,
+                        help=("number of worker processes. Defaults to the"
+                              " number of available cores."))
+    parser.add_argument("--ids", type=str, default=None,
+                        help=("comma separated ids of the TCCG contractions to"
+                              " run. Defaults to all of them."))
+    parser.add_argument("--rel-ci-width", type=float, default=0.02,
+                        help=("stop sampling once the width of the confidence"
+                              " interval of the median relative to the median"
+                              " is below this value. Defaults to 0.02."))
+    parser.add_argument("--max-time", type=float, default=2,
+                        help=("time budget (in seconds) for the samples of each"
+                              " contraction. Defaults to 2."))
+
+    parser.add_argument("--cache", action="store_true",
+                        help=("also time the lookups of the canonical forms"
+                              " that hit an in-memory cache."))
+    parser.add_argument("--dtype", metavar="D", type=str,
+                        default=DEFAULT_PRECISION,
+                        help=("comma separated precisions of the operands:"
+                              f" {', '.join(PRECISIONS)}. With 'mixed' the"
+                              " first operand is float32 and the second one"
+                              f" float64. Defaults to '{DEFAULT_PRECISION}'."))
+    parser.add_argument("--results-db", metavar="FILE", type=str,
+                        default=DEFAULT_RESULTS_DB,
+                        help=("append the results as a new run to the SQLite"
+                              " database FILE. Defaults to"
+                              f" '{DEFAULT_RESULTS_DB}'."))
+    parser.add_argument("--no-results-db", action="store_true",
+                        help="do not store the results.")
+
+    args = parser.parse_args()
+    dtypes = parse_comma_separated(args.dtype)
+    for dtype in dtypes:
+        if dtype not in PRECISIONS:
+            parser.error(f"unknown dtype '{dtype}', expected one of"
+                         f" {', '.join(PRECISIONS)}.")
+
+    plot_time_to_canonicalize(
+        fmt=args.format,
+        output=args.output,
+        nworkers=args.nworkers,
+        ids=(None
+             if args.ids is None
+             else tuple(parse_comma_separated_ints(args.ids))),
+        rel_ci_width=args.rel_ci_width,
+        max_time=args.max_time,
+        with_cache=args.cache,
+        dtypes=dtypes,
+        results_db=None if args.no_results_db else args.results_db)
@@ -0,0 +1,279 @@
+"""
+Stress test for :func:`feinsum.canonicalize_einsum` on synthetic batched
+einsums, resembling the fused batches of the DG-kernels, that grow along one
+of three axes:
+
+- ``operands``: number of operands per einsum,
+- ``indices``: number of distinct indices per einsum,
+- ``batch``: number of einsums in the batch.
+
+For each axis, the time and the peak memory to canonicalize are fit to a
+power law :math:`c\\,n^k` so that super-linear growth is visible before it is
+hit in production.
+"""
+import argparse
+import dataclasses as dc
+import itertools
+import json
+import tracemalloc
+import numpy as np
+
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from tabulate import tabulate
+from feinsum_evaluation.timing import TimingStatistics, time_callable
+from feinsum_evaluation.precision import (PRECISIONS, DEFAULT_PRECISION,
+                                          Precision)
+from feinsum_evaluation.utils import (parse_comma_separated,
+                                      parse_comma_separated_ints)
+
+if TYPE_CHECKING:
+    import feinsum as f
+
+
+# "e" is reserved for the element index
+_INDEX_CHARS = "abcdfghijklmnopqrstuvwxyz"
+
+DEFAULT_SWEEPS: Dict[str, Tuple[int, ...]] = {
+    "operands": (2, 3, 4, 6, 8),
+    "indices": (3, 4, 6, 8, 10, 12),
+    "batch": (1, 2, 4, 8, 16, 32, 64),
+}
+
+
+def make_synthetic_einsum(*, noperands: int, nindices: int, nbatch: int,
+                          index_len: int = 8, nel: int = 1000,
+                          seed: int = 0,
+                          precision: Precision = PRECISIONS[DEFAULT_PRECISION],
+                          ) -> "f.FusedEinsum":
+    """
+    Returns a batched einsum of *nbatch* einsums with *noperands* operands
+    over *nindices* distinct indices. The output is indexed by the element
+    index ``"e"`` and, if available, one more index. Operands without the
+    element index are shared across the batch, as the reference matrices
+    are in the DG-kernels.
+    """
+    rng = np.random.default_rng(seed)
+    indices = ["e", *_INDEX_CHARS[:nindices-1]]
+    output = "".join(indices[:2])
+
+    operand_indices = [set() for _ in range(noperands)]
+    for i, idx in enumerate(indices):
+        operand_indices[i % noperands].add(idx)
+    for op_indices in operand_indices:
+        while len(op_indices) < min(3, nindices):
+            op_indices.add(indices[rng.integers(nindices)])
+
+    subscript = (",".join("".join(sorted(op_indices))
+                          for op_indices in operand_indices)
+                 + f"->{output}")
+    return make_batched_einsum(subscript, nbatch,
+                               {idx: (nel if idx == "e" else index_len)
+                                for idx in indices},
+                               precision=precision)
+
+
+def make_batched_einsum(subscript: str, nbatch: int,
+                        index_lens: Dict[str, int],
+                        precision: Precision = PRECISIONS[DEFAULT_PRECISION],
+                        ) -> "f.FusedEinsum":
+    """
+    Returns a batch of *nbatch* einsums *subscript*. Operands without the
+    element index ``"e"`` are shared across the batch and are of
+    *precision*'s compute type, the remaining ones of its storage type.
+    """
+    import feinsum as f
+
+    inputs = subscript.split("->")[0].split(",")
+    shared = {iop: f.array([index_lens[idx] for idx in op_indices],
+                           precision.get_dtype(is_batched=False))
+              for iop, op_indices in enumerate(inputs)
+              if "e" not in op_indices}
+
+    return f.batched_einsum(
+        subscript,
+        [[shared[iop] if iop in shared
+          else f.array([index_lens[idx] for idx in op_indices],
+                       precision.get_dtype(is_batched=True))
+          for iop, op_indices in enumerate(inputs)]
+         for _ in range(nbatch)])
+
+
+@dc.dataclass(frozen=True)
+class ScalingResult:
+    """
+    .. attribute:: peak_memory
+
+        Peak bytes allocated by the Python heap during a single
+        canonicalization.
+    """
+    axis: str
+    n: int
+    timing: TimingStatistics
+    peak_memory: int
+    dtype: str = DEFAULT_PRECISION
+
+
+@dc.dataclass(frozen=True)
+class PowerLawFit:
+    """
+    Least squares fit of :math:`y = c\\,n^k` in log-log space.
+    """
+    coefficient: float
+    exponent: float
+
+
+def fit_power_law(ns: Sequence[float], ys: Sequence[float]) -> PowerLawFit:
+    exponent, log_coefficient = np.polyfit(np.log(ns), np.log(ys), 1)
+    return PowerLawFit(coefficient=float(np.exp(log_coefficient)),
+                       exponent=float(exponent))
+
+
+def _get_peak_memory_to_canonicalize(expr: "f.FusedEinsum") -> int:
+    import feinsum as f
+
+    tracemalloc.start()
+    try:
+        f.canonicalize_einsum(expr)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def make_einsum_along_axis(axis: str, n: int, *,
+                           base_noperands: int = 3,
+                           base_nindices: int = 6,
+                           batch_subscript: str = "ifj,fe,fej->ei",
+                           precision: Precision = PRECISIONS[
+                               DEFAULT_PRECISION],
+                           ) -> "f.FusedEinsum":
+    if axis == "operands":
+        return make_synthetic_einsum(noperands=n, nindices=base_nindices,
+                                     nbatch=1, precision=precision)
+    elif axis == "indices":
+        return make_synthetic_einsum(noperands=base_noperands, nindices=n,
+                                     nbatch=1, precision=precision)
+    elif axis == "batch":
+        # the face mass einsum of the DG-kernels (with ni=10, nj=6)
+        return make_batched_einsum(batch_subscript, n,
+                                   {"i": 10, "f": 4, "j": 6, "e": 1000},
+                                   precision=precision)
+    else:
+        raise NotImplementedError(axis)
+
+
+def run_scaling_sweep(sweeps: Dict[str, Sequence[int]], *,
+                      rel_ci_width: float = 0.02,
+                      max_time: float = 2,
+                      dtypes: Sequence[str] = (DEFAULT_PRECISION,),
+                      ) -> List[ScalingResult]:
+    import feinsum as f
+
+    results = []
+    for (axis, ns), dtype in itertools.product(sweeps.items(), dtypes):
+        for n in ns:
+            expr = make_einsum_along_axis(axis, n,
+                                          precision=PRECISIONS[dtype])
+            timing = time_callable(f.canonicalize_einsum, (expr,),
+                                   rel_ci_width=rel_ci_width,
+                                   max_time=max_time,
+                                   max_warmup_samples=3)
+            results.append(ScalingResult(
+                axis=axis, n=n, timing=timing,
+                peak_memory=_get_peak_memory_to_canonicalize(expr),
+                dtype=dtype))
+
+    return results
+
+
+def get_fits(results: Sequence[ScalingResult]
+             ) -> Dict[Tuple[str, str], Tuple[PowerLawFit, PowerLawFit]]:
+    """
+    Returns a mapping from each ``(axis, dtype)`` to the power law fits of
+    the time and the peak memory to canonicalize along that axis.
+    """
+    fits = {}
+    for axis, dtype in dict.fromkeys((result.axis, result.dtype)
+                                     for result in results):
+        axis_results = [result for result in results
+                        if result.axis == axis and result.dtype == dtype]
+        if len(axis_results) < 2:
+            continue
+        ns = [result.n for result in axis_results]
+        fits[axis, dtype] = (
+            fit_power_law(ns, [result.timing.median for result in axis_results]),
+            fit_power_law(ns, [result.peak_memory for result in axis_results]))
+
+    return fits
+
+
+def print_results(results: Sequence[ScalingResult]) -> None:
+    fits = get_fits(results)
+    for axis, dtype in dict.fromkeys((result.axis, result.dtype)
+                                     for result in results):
+        print(f"Scaling along '{axis}' ({dtype}):")
+        print(tabulate([[result.n,
+                         f"{result.timing.median * 1000:.3f}",
+                         f"{result.timing.iqr * 1000:.3f}",
+                         f"{result.peak_memory / (1 << 10):.1f}"]
+                        for result in results
+                        if result.axis == axis and result.dtype == dtype],
+                       headers=["n", "median (ms)", "IQR (ms)",
+                                "peak memory (KiB)"]))
+        if (axis, dtype) in fits:
+            time_fit, memory_fit = fits[axis, dtype]
+            print(f"time ~ n^{time_fit.exponent:.2f},"
+                  f" memory ~ n^{memory_fit.exponent:.2f}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="canonicalization_scaling.py",
+        description=("Measure how feinsum's canonicalization scales with the"
+                     " number of operands, indices and batch size"),
+    )
+    for axis, ns in DEFAULT_SWEEPS.items():
+        parser.add_argument(f"--{axis}", type=str,
+                            default=",".join(str(n) for n in ns),
+                            help=(f"comma separated values of '{axis}' to sweep"
+                                  " over. Pass an empty string to skip the"
+                                  f" axis. Defaults to '{','.join(map(str, ns))}'."))
+    parser.add_argument("--format", choices=("table", "json"), default="table",
+                        help="output format. Defaults to 'table'.")
+    parser.add_argument("--max-time", type=float, default=2,
+                        help=("time budget (in seconds) for the samples of each"
+                              " einsum. Defaults to 2."))
+    parser.add_argument("--dtype", metavar="D", type=str,
+                        default=DEFAULT_PRECISION,
+                        help=("comma separated precisions of the operands:"
+                              f" {', '.join(PRECISIONS)}. Defaults to"
+                              f" '{DEFAULT_PRECISION}'."))
+
+    args = parser.parse_args(argv)
+    sweeps = {axis: parse_comma_separated_ints(getattr(args, axis))
+              for axis in DEFAULT_SWEEPS}
+    dtypes = parse_comma_separated(args.dtype)
+    for dtype in dtypes:
+        if dtype not in PRECISIONS:
+            parser.error(f"unknown dtype '{dtype}', expected one of"
+                         f" {', '.join(PRECISIONS)}.")
+
+    results = run_scaling_sweep({axis: ns for axis, ns in sweeps.items() if ns},
+                                max_time=args.max_time,
+                                dtypes=dtypes)
+
+    if args.format == "json":
+        print(json.dumps({
+            "results": [dc.asdict(result) for result in results],
+            "fits": {f"{axis}:{dtype}": {"time": dc.asdict(time_fit),
+                                         "memory": dc.asdict(memory_fit)}
+                     for (axis, dtype), (time_fit, memory_fit)
+                     in get_fits(results).items()}},
+            indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Synthetic face connectivity of a mesh, driving the interior and exterior
+face gathers of the indirection-heavy DG-kernels.
+
+The elements are the cells of a periodic 2D lattice, whose four faces are
+glued to the ones of the neighboring cells, so that every element has
+exactly :data:`NFACES` neighbors, see :func:`get_lattice_shape`. The
+locality of the gathers is controlled by the order in which the cells are
+numbered, see :data:`ELEMENT_ORDERINGS`.
+
+.. autodata:: ELEMENT_ORDERINGS
+.. autofunction:: get_lattice_shape
+.. autofunction:: get_element_neighbors
+.. autofunction:: get_face_gather_connectivity
+"""
+import math
+import numpy as np
+
+from typing import Callable, Dict, Tuple
+
+
+#: Number of faces of an element, shared by the DG-kernels.
+NFACES = 4
+INDEX_DTYPE = np.int32
+
+
+# {{{ element orderings
+
+def _get_random_ordering(nel: int, nx: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).permutation(nel)
+
+
+def _get_morton_ordering(nel: int, nx: int, seed: int) -> np.ndarray:
+    cells = np.arange(nel, dtype=np.uint64)
+    x, y = cells % np.uint64(nx), cells // np.uint64(nx)
+    key = np.zeros(nel, dtype=np.uint64)
+    for bit in range(max(nx, -(-nel // nx)).bit_length()):
+        b = np.uint64(bit)
+        key |= ((x >> b) & np.uint64(1)) << (np.uint64(2) * b)
+        key |= ((y >> b) & np.uint64(1)) << (np.uint64(2) * b + np.uint64(1))
+
+    # the cells are identified by their lexicographic index y * nx + x
+    return np.argsort(key, kind="stable")
+
+
+#: Mapping from the name of an element ordering to a callable with the
+#: signature ``get_ordering(nel, nx, seed)`` returning the lexicographic
+#: indices of the *nel* cells of a lattice *nx* cells wide in the order in
+#: which they are numbered as elements.
+#:
+#: - ``"sfc"``: along the Morton (Z-order) space-filling curve, so that the
+#:   neighbors of most elements are numbered close to it.
+#: - ``"random"``: in a random order, so that almost no exterior gather hits
+#:   the cache.
+ELEMENT_ORDERINGS: Dict[str, Callable[[int, int, int], np.ndarray]] = {
+    "sfc": _get_morton_ordering,
+    "random": _get_random_ordering,
+}
+
+# }}}
+
+
+def _is_valid_lattice(nel: int, nx: int) -> bool:
+    # every row and every column of the lattice holds at least 2 cells, so
+    # that no element is its own neighbor
+    ny = -(-nel // nx)
+    nlast_row = nel - nx * (ny - 1)
+    return (nx >= 2 and ny >= 2 and nlast_row >= 2
+            and (nlast_row == nx or ny >= 3))
+
+
+def get_lattice_shape(nel: int) -> Tuple[int, int]:
+    """
+    Returns the ``(nx, ny)`` of the lattice of *nel* cells, numbered
+    lexicographically row by row, that is closest to a square. If *nel* has
+    a divisor of at least 2, the lattice is the rectangle of *nel* cells
+    that is closest to a square, with ``nx <= ny``. Otherwise, for ex. if
+    *nel* is prime, the lattice is *nx* cells wide with its last row
+    partially filled.
+
+    The lattice is periodic along each of its rows and columns, hence the
+    neighbors of the cells in the partially filled row and in the shorter
+    columns wrap around earlier. Every row and column holds at least 2
+    cells, so that no element is its own neighbor, unless *nel* is
+    smaller than 11 and prime.
+    """
+    isqrt = math.isqrt(nel)
+    nx = next((nx for nx in range(isqrt, 1, -1) if nel % nx == 0), None)
+    if nx is None:
+        nx = next((nx for nx in range(max(isqrt, 2), nel)
+                   if _is_valid_lattice(nel, nx)),
+                  max(isqrt, 1))
+
+    return nx, -(-nel // nx)
+
+
+def get_element_neighbors(nel: int, ordering: str, *,
+                          seed: int = 0) -> np.ndarray:
+    """
+    Returns an array of shape ``(NFACES, nel)`` whose entry ``[f, e]`` is the
+    element glued to the face *f* of the element *e*, on the lattice of
+    :func:`get_lattice_shape`. The face *f* of an element is glued to the
+    face ``f ^ 1`` of its neighbor.
+
+    :arg ordering: A key of :data:`ELEMENT_ORDERINGS`.
+    """
+    nx, ny = get_lattice_shape(nel)
+    nlast_row = nel - nx * (ny - 1)
+    cell_of_element = ELEMENT_ORDERINGS[ordering](nel, nx, seed)
+    element_of_cell = np.empty(nel, dtype=INDEX_DTYPE)
+    element_of_cell[cell_of_element] = np.arange(nel, dtype=INDEX_DTYPE)
+
+    x, y = cell_of_element % nx, cell_of_element // nx
+    # lengths of the row and the column of every cell
+    row_len = np.where(y == ny - 1, nlast_row, nx)
+    col_len = np.where(x < nlast_row, ny, ny - 1)
+    neighbor_cells = [y * nx + (x - 1) % row_len,
+                      y * nx + (x + 1) % row_len,
+                      ((y - 1) % col_len) * nx + x,
+                      ((y + 1) % col_len) * nx + x]
+    return element_of_cell[np.stack(neighbor_cells)]
+
+
+def get_face_gather_connectivity(nel: int, ni: int, nj: int, *,
+                                 ordering: str,
+                                 seed: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Returns the index arrays of the face gathers of a mesh of *nel* elements
+    with *ni* volume and *nj* face degrees of freedom per element, keyed by
+    the names of the operands of the gather kernels in
+    :data:`~feinsum_evaluation.kernels.KERNELS`:
+
+    - ``"int_elements"`` of shape ``(NFACES, nel)``: the element of every
+      face on the interior side, i.e. the face's own element.
+    - ``"int_dofs"`` of shape ``(NFACES, nj)``: the volume degrees of freedom
+      on each face of the reference element.
+    - ``"ext_elements"`` of shape ``(NFACES, nel)``: the element of every
+      face on the exterior side, see :func:`get_element_neighbors`.
+    - ``"ext_dofs"`` of shape ``(NFACES, nel, nj)``: the volume degree of
+      freedom of the exterior element matching every face node. The faces
+      are glued in one of *nj* random rotations each, as on an unstructured
+      mesh, so that this map is not uniform across the elements.
+    """
+    if nj > ni:
+        raise ValueError(f"nj must not exceed ni, got nj={nj}, ni={ni}.")
+
+    rng = np.random.default_rng(seed)
+    # the face f of the reference simplex with ni = nj + 1 holds all the
+    # vertices but the f-th one
+    int_dofs = ((np.arange(NFACES)[:, np.newaxis] + 1
+                 + np.arange(nj)[np.newaxis, :]) % ni).astype(INDEX_DTYPE)
+    rotations = rng.integers(nj, size=(NFACES, nel))
+    ext_dofs = int_dofs[np.arange(NFACES)[:, np.newaxis, np.newaxis] ^ 1,
+                        (np.arange(nj)[np.newaxis, np.newaxis, :]
+                         + rotations[:, :, np.newaxis]) % nj]
+
+    return {
+        "int_elements": np.broadcast_to(np.arange(nel, dtype=INDEX_DTYPE),
+                                        (NFACES, nel)).copy(),
+        "int_dofs": int_dofs,
+        "ext_elements": get_element_neighbors(nel, ordering, seed=seed),
+        "ext_dofs": ext_dofs.astype(INDEX_DTYPE),
+    }
+
+# vim: fdm=marker
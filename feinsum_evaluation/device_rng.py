@@ -0,0 +1,197 @@
+"""
+Counter-based generation of uniformly distributed random numbers directly on
+an array context's device.
+
+The entry at counter :math:`k` of a stream is obtained by hashing :math:`k`
+with SplitMix64, which needs nothing but 64-bit integer arithmetic and is
+hence evaluated identically, bit for bit, by NumPy, OpenCL and JAX. This
+makes the benchmarked inputs identical across array contexts without
+generating them on the host.
+
+An array whose innermost axis is padded draws the counters of the unpadded
+array, and its padding is zero, so that its entries do not depend on the
+padding, which may vary with the array's dtype.
+
+.. autofunction:: get_stream_start
+.. autofunction:: generate_uniform
+.. autofunction:: generate_uniform_slice
+"""
+import math
+import numpy as np
+
+from typing import TYPE_CHECKING, Any, Optional, Tuple
+
+from pytools import memoize
+from feinsum_evaluation.utils import is_opencl_actx, is_jax_actx, is_numpy_actx
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+# bits of the counter available to a single stream
+_STREAM_BITS = 40
+_MAX_NSTREAMS_PER_SEED = 16
+
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+_MIX_MULTIPLIER_1 = 0xBF58476D1CE4E5B9
+_MIX_MULTIPLIER_2 = 0x94D049BB133111EB
+
+
+def get_stream_start(seed: int, stream: int) -> int:
+    """
+    Returns the first counter of the *stream*-th stream of *seed*. Each
+    stream holds :math:`2^{40}` numbers.
+    """
+    if not 0 <= stream < _MAX_NSTREAMS_PER_SEED:
+        raise ValueError(f"stream must be in [0, {_MAX_NSTREAMS_PER_SEED}),"
+                         f" got {stream}.")
+    if not 0 <= seed < (1 << (64 - _STREAM_BITS - 4)):
+        raise ValueError(f"seed out of range, got {seed}.")
+
+    return ((seed * _MAX_NSTREAMS_PER_SEED + stream) << _STREAM_BITS)
+
+
+# {{{ NumPy
+
+def _hash_counters_numpy(x: np.ndarray, dtype: "np.dtype[Any]") -> np.ndarray:
+    # uint64 arithmetic wraps around as in the other backends
+    z = x + np.uint64(_GOLDEN_GAMMA)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(_MIX_MULTIPLIER_1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(_MIX_MULTIPLIER_2)
+    z = z ^ (z >> np.uint64(31))
+    return ((z >> np.uint64(11)) * 2.0**-53).astype(dtype)
+
+
+def _generate_uniform_numpy(shape: Tuple[int, ...], start: int,
+                            dtype: "np.dtype[Any]",
+                            unpadded_len: Optional[int] = None
+                            ) -> np.ndarray:
+    if unpadded_len is not None:
+        return generate_uniform_slice(shape, (), start=start, dtype=dtype,
+                                      unpadded_len=unpadded_len)
+    x = np.arange(math.prod(shape), dtype=np.uint64) + np.uint64(start)
+    return _hash_counters_numpy(x, dtype).reshape(shape)
+
+
+def generate_uniform_slice(shape: Tuple[int, ...], index: Tuple[slice, ...],
+                           *, start: int, dtype: Any = np.float64,
+                           unpadded_len: Optional[int] = None) -> np.ndarray:
+    """
+    Returns the entries at *index*, a :class:`tuple` of :class:`slice`, of
+    the array generated by :func:`generate_uniform` for *shape*, *start* and
+    *unpadded_len* as a :class:`numpy.ndarray`, without generating the
+    remaining entries. This lets arrays larger than the host memory be
+    generated piece by piece.
+    """
+    dtype = np.dtype(dtype)
+    index = index + (slice(None),) * (len(shape) - len(index))
+    # counters of the entries in C-order, built from the innermost axis
+    counters = np.array(start, dtype=np.uint64)
+    stride = 1
+    for iaxis, (axis_len, axis_index) in enumerate(zip(reversed(shape),
+                                                       reversed(index))):
+        axis_counters = (np.arange(axis_len, dtype=np.uint64)[axis_index]
+                         * np.uint64(stride))
+        counters = np.add.outer(axis_counters, counters)
+        stride *= (unpadded_len
+                   if iaxis == 0 and unpadded_len is not None
+                   else axis_len)
+
+    result = _hash_counters_numpy(counters, dtype)
+    if unpadded_len is not None:
+        result[..., np.arange(shape[-1])[index[-1]] >= unpadded_len] = 0
+    return result
+
+# }}}
+
+
+# {{{ OpenCL
+
+@memoize
+def _get_cl_uniform_kernel(context: Any, dtype: "np.dtype[Any]") -> Any:
+    from pyopencl.elementwise import ElementwiseKernel
+    from pyopencl.tools import dtype_to_ctype
+    ctype = dtype_to_ctype(dtype)
+    # rounded from double, as in the other backends
+    return ElementwiseKernel(
+        context,
+        f"{ctype} *out, unsigned long start, unsigned long row_len,"
+        " unsigned long unpadded_len",
+        f"""
+        ulong k = i % row_len;
+        ulong z = start + (i / row_len) * unpadded_len + k + {_GOLDEN_GAMMA}UL;
+        z = (z ^ (z >> 30)) * {_MIX_MULTIPLIER_1}UL;
+        z = (z ^ (z >> 27)) * {_MIX_MULTIPLIER_2}UL;
+        z = z ^ (z >> 31);
+        out[i] = k < unpadded_len ? ({ctype}) ((z >> 11) * 0x1.0p-53) : 0;
+        """,
+        f"splitmix64_uniform_{ctype}")
+
+
+def _generate_uniform_cl(queue: Any, allocator: Any,
+                         shape: Tuple[int, ...], start: int,
+                         dtype: "np.dtype[Any]",
+                         unpadded_len: Optional[int] = None) -> Any:
+    import pyopencl.array as cla
+    out = cla.empty(queue, shape, dtype, allocator=allocator)
+    row_len = shape[-1] if shape else 1
+    _get_cl_uniform_kernel(queue.context, dtype)(
+        out, np.uint64(start), np.uint64(max(row_len, 1)),
+        np.uint64(row_len if unpadded_len is None else unpadded_len))
+    return out
+
+# }}}
+
+
+# {{{ JAX
+
+def _generate_uniform_jax(shape: Tuple[int, ...], start: int,
+                          dtype: "np.dtype[Any]",
+                          unpadded_len: Optional[int] = None) -> Any:
+    import jax.numpy as jnp
+    x = jnp.arange(math.prod(shape), dtype=jnp.uint64)
+    if unpadded_len is not None:
+        row_len = jnp.uint64(shape[-1])
+        k = x % row_len
+        x = (x // row_len) * jnp.uint64(unpadded_len) + k
+    z = x + jnp.uint64(start) + jnp.uint64(_GOLDEN_GAMMA)
+    z = (z ^ (z >> 30)) * jnp.uint64(_MIX_MULTIPLIER_1)
+    z = (z ^ (z >> 27)) * jnp.uint64(_MIX_MULTIPLIER_2)
+    z = z ^ (z >> 31)
+    result = ((z >> 11) * 2.0**-53).astype(jnp.float64).astype(dtype)
+    if unpadded_len is not None:
+        result = jnp.where(k < unpadded_len, result, 0).astype(dtype)
+    return result.reshape(shape)
+
+# }}}
+
+
+def generate_uniform(actx: "ArrayContext", shape: Tuple[int, ...], *,
+                     start: int, dtype: Any = np.float64,
+                     unpadded_len: Optional[int] = None) -> Any:
+    """
+    Returns an array of *actx* of *shape* whose entries, in C-order, are the
+    uniformly distributed random numbers in :math:`[0, 1)` at the counters
+    *start*, *start* + 1, .... The array is generated on *actx*'s device.
+
+    :arg dtype: The floating point type of the array. The numbers are
+        generated in float64 and rounded to *dtype*, so that they are
+        identical across array contexts in every precision.
+    :arg unpadded_len: If not *None*, the innermost axis of *shape* is padded
+        from *unpadded_len* entries. The entries are then the ones of the
+        unpadded array, followed by zeros.
+    """
+    dtype = np.dtype(dtype)
+    if is_numpy_actx(actx):
+        return _generate_uniform_numpy(shape, start, dtype, unpadded_len)
+    elif is_opencl_actx(actx):
+        return actx.thaw(_generate_uniform_cl(actx.queue, actx.allocator,
+                                              shape, start, dtype,
+                                              unpadded_len))
+    elif is_jax_actx(actx):
+        return actx.thaw(_generate_uniform_jax(shape, start, dtype,
+                                               unpadded_len))
+    else:
+        raise NotImplementedError(type(actx))
+
+# vim: fdm=marker
@@ -0,0 +1,1839 @@
+"""
+Entry point for running the DG-kernel suite registered in
+:mod:`feinsum_evaluation.kernels` over a Cartesian product of kernels, array
+contexts, batch sizes and problem sizes.
+
+.. autoclass:: BenchmarkResult
+.. autofunction:: run_sweep
+.. autofunction:: main
+"""
+import argparse
+import dataclasses as dc
+import itertools
+import os
+import sys
+
+from contextlib import nullcontext
+from functools import partial
+from tabulate import tabulate
+from typing import (TYPE_CHECKING, Callable, Dict, List, Optional, Sequence,
+                    Tuple)
+
+from feinsum_evaluation.kernels import (KERNELS, COMPOSITE_KERNELS,
+                                        SEPARATE_SUFFIX, AnyKernel, InputPool,
+                                        get_kernel, get_nel, get_axis_lengths)
+from feinsum_evaluation.precision import PRECISIONS, DEFAULT_PRECISION
+from feinsum_evaluation.layouts import LAYOUTS, DEFAULT_LAYOUT
+from feinsum_evaluation.sizing import (parse_nbytes, get_nel_for_memory_budget,
+                                       get_weak_scaling_nels,
+                                       get_working_set_size, get_cache_sizes,
+                                       get_memory_level)
+from feinsum_evaluation.timing import (TimingStatistics, FirstCallTiming,
+                                       CompileTraceRecorder, time_callable,
+                                       time_first_call, get_break_even_iterations)
+from feinsum_evaluation.profiling import (CompileProfiler,
+                                          get_device_code_digest)
+from feinsum_evaluation.event_profiling import (DeviceTimeProfile,
+                                               profile_device_time)
+from feinsum_evaluation.roofline import MachineRoofline, measure_roofline
+from feinsum_evaluation.memory import (MemoryUsage, measure_memory_usage,
+                                       load_memory_baseline, save_memory_baseline,
+                                       find_memory_regressions)
+from feinsum_evaluation.verification import VerificationResult, verify_kernel
+from feinsum_evaluation.saturation import (get_geometric_batches, is_saturated,
+                                           get_saturation_batch)
+from feinsum_evaluation.canonicalization_cache import (CanonicalizationCache,
+                                                       patch_feinsum)
+from feinsum_evaluation.results_db import (DEFAULT_RESULTS_DB, COMMANDS,
+                                           ResultRecord, ResultsDatabase,
+                                           get_device_info, compare_records,
+                                           print_comparisons, has_regressions,
+                                           add_slowdown_arguments)
+from feinsum_evaluation.results_db import main as results_db_main
+from feinsum_evaluation.utils import (ACTX_CLASS_PATHS,
+                                      BATCHED_EINSUM_ACTX_NAMES,
+                                      GATHER_ACTX_NAMES,
+                                      STRIDED_LAYOUT_ACTX_NAMES,
+                                      get_actx_class, instantiate_actx_t,
+                                      synchronize, parse_comma_separated,
+                                      parse_comma_separated_ints)
+from feinsum_evaluation.workers import (TaskFailure, get_numa_cpu_sets,
+                                        run_isolated, drop_failures)
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+MIN_WEAK_SCALING_WORKING_SET_SIZE = 64 << 10
+
+# seed of the inputs of every cell, shared by all array contexts
+INPUT_SEED = 0
+
+# suffix of the array contexts run with feinsum's default database when a
+# tuned database is provided
+DEFAULT_FEINSUM_DB_SUFFIX = "[default db]"
+
+# suffix of the array contexts run without loop fusion when comparing
+# against fused code generation
+NO_FUSION_SUFFIX = "[no fusion]"
+
+# suffix of the array contexts run without assuming the indirection maps to
+# be non-negative when comparing against the assumption
+SIGNED_INDICES_SUFFIX = "[signed indices]"
+
+
+@dc.dataclass(frozen=True)
+class BenchmarkResult:
+    """
+    Records the measurement of a single cell of the sweep.
+
+    .. attribute:: timing
+
+        :class:`~feinsum_evaluation.timing.TimingStatistics` of a call to the
+        compiled kernel.
+
+    .. attribute:: first_call
+
+        :class:`~feinsum_evaluation.timing.FirstCallTiming` of the first call
+        to the compiled kernel. If :attr:`cold_cache` is *True*, the
+        persistent compilation caches were empty at the start of the sweep.
+
+    .. attribute:: warm_first_call
+
+        :class:`~feinsum_evaluation.timing.FirstCallTiming` of the first call
+        to the compiled kernel in a fresh process sharing the persistent
+        compilation caches populated by :attr:`first_call`, see
+        :func:`run_sweep`. Hence no in-memory cache of the process that
+        measured :attr:`first_call` is reused. *None* if that process
+        failed.
+
+    .. attribute:: device_profile
+
+        :class:`~feinsum_evaluation.event_profiling.DeviceTimeProfile` of a
+        call to the compiled kernel. *None* if OpenCL event profiling was not
+        requested or is not supported by the array context.
+
+    .. attribute:: flop_count
+
+        Number of floating point operations performed by a call to the
+        kernel.
+
+    .. attribute:: min_bytes_moved
+
+        Number of bytes moved by a call to the kernel if every operand is
+        read once and every output is written once.
+
+    .. attribute:: roofline
+
+        :class:`~feinsum_evaluation.roofline.MachineRoofline` of the array
+        context's device in the compute dtype of :attr:`dtype`. *None* if
+        the roofline was not probed.
+
+    .. attribute:: memory_level
+
+        The smallest level of the device's memory hierarchy that can hold
+        the working set of a call to the kernel.
+
+    .. attribute:: memory
+
+        :class:`~feinsum_evaluation.memory.MemoryUsage` of calls to the
+        compiled kernel.
+
+    .. attribute:: device
+    .. attribute:: driver_version
+    .. attribute:: verification
+
+        :class:`~feinsum_evaluation.verification.VerificationResult` of the
+        compiled kernel's outputs. *None* if the outputs were not verified.
+
+    .. attribute:: dtype
+
+        Name of the :class:`~feinsum_evaluation.precision.Precision` the
+        kernel was run in.
+
+    .. attribute:: layout
+
+        Name of the :class:`~feinsum_evaluation.layouts.Layout` the kernel's
+        operands were stored in.
+
+    .. attribute:: device_code_digest
+
+        Digest of the device code generated for the kernel, see
+        :func:`~feinsum_evaluation.profiling.get_device_code_digest`. *None*
+        for array contexts without a compilation pipeline.
+    """
+    kernel: str
+    actx: str
+    nbatch: int
+    ni: int
+    nj: Optional[int]
+    nel: int
+    timing: TimingStatistics
+    first_call: FirstCallTiming
+    warm_first_call: Optional[FirstCallTiming]
+    cold_cache: bool
+    flop_count: int
+    min_bytes_moved: int
+    device_profile: Optional[DeviceTimeProfile] = None
+    roofline: Optional[MachineRoofline] = None
+    memory_level: Optional[str] = None
+    memory: Optional[MemoryUsage] = None
+    device: Optional[str] = None
+    driver_version: Optional[str] = None
+    verification: Optional[VerificationResult] = None
+    dtype: str = DEFAULT_PRECISION
+    layout: str = DEFAULT_LAYOUT
+    device_code_digest: Optional[str] = None
+
+    @property
+    def is_valid(self) -> bool:
+        """
+        *False* if the compiled kernel's outputs failed verification.
+        """
+        return self.verification is None or self.verification.passed
+
+    @property
+    def key(self) -> str:
+        """
+        Identifies the cell of the sweep across runs.
+        """
+        key = (f"{self.kernel}|{self.actx}|nbatch={self.nbatch}|ni={self.ni}"
+               f"|nj={self.nj}|nel={self.nel}")
+        # keeps the keys of the float64 cells in the declared layout
+        # comparable with earlier runs
+        if self.dtype != DEFAULT_PRECISION:
+            key += f"|dtype={self.dtype}"
+        if self.layout != DEFAULT_LAYOUT:
+            key += f"|layout={self.layout}"
+        return key
+
+    @property
+    def compile_time(self) -> float:
+        """
+        Time (in seconds) taken by the first call in excess of a call in the
+        steady state.
+        """
+        return self.first_call.get_compile_overhead(self.timing.median)
+
+    @property
+    def flop_rate(self) -> float:
+        return self.flop_count / self.timing.median
+
+    @property
+    def bandwidth(self) -> float:
+        return self.min_bytes_moved / self.timing.median
+
+    @property
+    def arithmetic_intensity(self) -> float:
+        return self.flop_count / self.min_bytes_moved
+
+    @property
+    def roofline_fraction(self) -> Optional[float]:
+        """
+        Achieved FLOP rate relative to the one attainable on the array
+        context's device at the kernel's arithmetic intensity.
+        """
+        if self.roofline is None:
+            return None
+        return self.flop_rate / self.roofline.get_attainable_flop_rate(
+            self.arithmetic_intensity)
+
+    @property
+    def wallclock_time(self) -> float:
+        """
+        Median time (in seconds) per call to the compiled kernel.
+        """
+        return self.timing.median
+
+
+def get_problem_sizes(knl: AnyKernel,
+                      nis: Sequence[int],
+                      njs: Sequence[int]) -> List[Tuple[int, Optional[int]]]:
+    """
+    Returns the ``(ni, nj)`` pairs to benchmark *knl* with. Kernels that do
+    not have a face-dof axis are benchmarked with ``nj=None``. Kernels that
+    gather the face-dofs from the volume-dofs are only benchmarked with
+    ``nj <= ni``, see
+    :func:`~feinsum_evaluation.connectivity.get_face_gather_connectivity`.
+    """
+    if knl.uses_nj:
+        if not njs:
+            raise ValueError(f"Kernel '{knl.name}' requires '--nj'.")
+        return [(ni, nj)
+                for ni, nj in itertools.product(nis, njs)
+                if not knl.uses_gathers or nj <= ni]
+    else:
+        return [(ni, None) for ni in nis]
+
+
+def is_supported(actx_name: str, knl: AnyKernel) -> bool:
+    """
+    Returns *True* if the array context named *actx_name* can run *knl*.
+    """
+    return not knl.uses_gathers or actx_name in GATHER_ACTX_NAMES
+
+
+def get_nels(knl: AnyKernel, nbatch: int, ni: int, nj: Optional[int], *,
+             memory_budget: Optional[int] = None,
+             weak_scaling: bool = False) -> List[int]:
+    """
+    Returns the element counts to benchmark *knl* with.
+
+    :arg nbatch: The largest batch size of the sweep. All batch sizes are
+        run with the same element counts.
+    :arg memory_budget: If not *None*, the largest working set (in bytes) of a
+        call to *knl*. Otherwise the element count is looked up from
+        :func:`~feinsum_evaluation.kernels.get_nel`.
+    :arg weak_scaling: If *True*, returns element counts whose working sets
+        grow geometrically from :data:`MIN_WEAK_SCALING_WORKING_SET_SIZE` to
+        the largest working set.
+    """
+    if memory_budget is None:
+        max_nel = get_nel(ni)
+    else:
+        max_nel = get_nel_for_memory_budget(knl, nbatch, ni, nj, memory_budget)
+
+    if weak_scaling:
+        return get_weak_scaling_nels(
+            knl, nbatch, ni, nj,
+            min_working_set_size=MIN_WEAK_SCALING_WORKING_SET_SIZE,
+            max_working_set_size=get_working_set_size(knl, nbatch, ni, nj,
+                                                      max_nel))
+    else:
+        return [max_nel]
+
+
+@dc.dataclass(frozen=True)
+class ActxVariant:
+    """
+    An array context to run the sweep with, as returned by
+    :func:`get_actx_variants`.
+
+    .. attribute:: label
+
+        Name of the variant in the reports.
+
+    .. attribute:: actx_name
+    .. attribute:: feinsum_db
+    .. attribute:: fuse_loops
+    .. attribute:: assume_non_negative_indices
+
+        See :func:`~feinsum_evaluation.utils.instantiate_actx_t`.
+    """
+    label: str
+    actx_name: str
+    feinsum_db: Optional[str] = None
+    fuse_loops: bool = True
+    assume_non_negative_indices: bool = True
+
+
+def get_actx_variants(actx_names: Sequence[str],
+                      feinsum_db: Optional[str] = None,
+                      compare_fusion: bool = False,
+                      compare_index_assumption: bool = False,
+                      ) -> List[ActxVariant]:
+    """
+    Returns the :class:`ActxVariant` of each array context to run the sweep
+    with. The array contexts that transform the batched einsums via
+    :mod:`feinsum` are run in more than one variant:
+
+    - If *feinsum_db* is not *None*, with *feinsum_db* and, to compare
+      against, with :mod:`feinsum`'s default database under a label suffixed
+      by :data:`DEFAULT_FEINSUM_DB_SUFFIX`.
+    - If *compare_fusion* is *True*, with and, to compare against, without
+      loop fusion under a label suffixed by :data:`NO_FUSION_SUFFIX`.
+    - If *compare_index_assumption* is *True*, with and, to compare against,
+      without assuming the indirection maps to be non-negative under a label
+      suffixed by :data:`SIGNED_INDICES_SUFFIX`.
+    """
+    variants = []
+    for actx_name in actx_names:
+        if actx_name not in BATCHED_EINSUM_ACTX_NAMES:
+            variants.append(ActxVariant(actx_name, actx_name))
+            continue
+
+        fusion_variants = [("", True)]
+        if compare_fusion:
+            fusion_variants.append((NO_FUSION_SUFFIX, False))
+        index_variants = [("", True)]
+        if compare_index_assumption:
+            index_variants.append((SIGNED_INDICES_SUFFIX, False))
+        db_variants = [("", None)]
+        if feinsum_db is not None:
+            db_variants = [("", feinsum_db), (DEFAULT_FEINSUM_DB_SUFFIX, None)]
+
+        for ((fusion_suffix, fuse_loops),
+             (index_suffix, assume_non_negative_indices),
+             (db_suffix, variant_db)) in itertools.product(
+                 fusion_variants, index_variants, db_variants):
+            variants.append(ActxVariant(
+                f"{actx_name}{fusion_suffix}{index_suffix}{db_suffix}",
+                actx_name, feinsum_db=variant_db, fuse_loops=fuse_loops,
+                assume_non_negative_indices=assume_non_negative_indices))
+
+    return variants
+
+
+def _run_cell(actx: "ArrayContext", actx_name: str, knl: AnyKernel,
+              nbatch: int, ni: int, nj: Optional[int], nel: int, *,
+              inputs: InputPool,
+              recorder: CompileTraceRecorder,
+              rel_ci_width: float,
+              max_time: float,
+              profile_dir: Optional[str],
+              cl_profile: bool,
+              verify_rtol: Optional[float]) -> BenchmarkResult:
+    axis_lens = get_axis_lengths(ni=ni, nj=nj, nel=nel)
+    args = inputs.get_inputs(nbatch)
+    sync = partial(synchronize, actx)
+
+    compiled_knl = knl.compile(actx, axis_lens)
+    first_call = time_first_call(compiled_knl, args, recorder,
+                                 synchronize=sync)
+    device_code_digest = get_device_code_digest(recorder.post_stage_irs)
+    if profile_dir is not None:
+        name = (f"{knl.name}-{actx_name}-ni{ni}-nj{nj}-nel{nel}"
+                f"-nbatch{nbatch}")
+        if inputs.precision.name != DEFAULT_PRECISION:
+            name += f"-{inputs.precision.name}"
+        if knl.layout.name != DEFAULT_LAYOUT:
+            name += f"-{knl.layout.name}"
+        recorder.save(name, actx)
+
+    timing = time_callable(compiled_knl, args,
+                           synchronize=sync,
+                           rel_ci_width=rel_ci_width,
+                           max_time=max_time)
+
+    if cl_profile and hasattr(actx, "queue"):
+        device_profile = profile_device_time(compiled_knl, args,
+                                             synchronize=sync)
+    else:
+        device_profile = None
+
+    memory = measure_memory_usage(actx, compiled_knl, args, synchronize=sync)
+
+    if verify_rtol is not None:
+        verification = verify_kernel(actx, compiled_knl, knl, args, nbatch,
+                                     axis_lens, seed=inputs.seed,
+                                     rtol=verify_rtol)
+    else:
+        verification = None
+
+    return BenchmarkResult(
+        kernel=knl.name,
+        actx=actx_name,
+        nbatch=nbatch,
+        ni=ni,
+        nj=nj,
+        nel=nel,
+        timing=timing,
+        first_call=first_call,
+        # measured in a fresh process, see run_sweep
+        warm_first_call=None,
+        cold_cache=_is_cold_cache(),
+        flop_count=knl.get_flop_count(nbatch, axis_lens),
+        min_bytes_moved=knl.get_min_bytes_moved(nbatch, axis_lens,
+                                                inputs.precision),
+        device_profile=device_profile,
+        memory=memory,
+        verification=verification,
+        dtype=inputs.precision.name,
+        layout=knl.layout.name,
+        device_code_digest=device_code_digest)
+
+
+@dc.dataclass(frozen=True)
+class _SweepTask:
+    """
+    The cells of the sweep for one array context and one kernel, which are
+    run in a worker process of their own. See :func:`run_sweep` for the
+    options.
+    """
+    actx_variant: ActxVariant
+    kernel_name: str
+    batches: Tuple[int, ...]
+    nis: Tuple[int, ...]
+    njs: Tuple[int, ...]
+    rel_ci_width: float
+    max_time: float
+    profile_dir: Optional[str]
+    cl_profile: bool
+    memory_budget: Optional[int]
+    weak_scaling: bool
+    saturation_tolerance: Optional[float]
+    dtypes: Tuple[str, ...]
+    layouts: Tuple[str, ...]
+    verify: bool
+    verify_rtol: Optional[float]
+    # keyed by the name of the compute dtype
+    rooflines: Dict[str, MachineRoofline]
+    canonicalization_cache: Optional[CanonicalizationCache]
+
+    def __repr__(self) -> str:
+        return f"<{self.kernel_name} on {self.actx_variant.label}>"
+
+
+def _setup_trace_logging(trace_dir: str) -> None:
+    import logging
+    # records the loopy statistics and the compilation progress logged
+    # by the pipeline.
+    handler = logging.FileHandler(os.path.join(trace_dir, "compile.log"))
+    handler.setFormatter(logging.Formatter(
+        "%(asctime)s %(process)d %(name)s %(levelname)s: %(message)s"))
+    logging.getLogger().addHandler(handler)
+    logging.getLogger().setLevel(logging.INFO)
+
+
+def _run_sweep_task(task: _SweepTask
+                    ) -> Tuple[List[BenchmarkResult],
+                               Optional[CanonicalizationCache]]:
+    # runs in a worker process, see run_sweep
+    if task.profile_dir is None:
+        recorder = CompileTraceRecorder()
+    else:
+        _setup_trace_logging(task.profile_dir)
+        recorder = CompileProfiler(task.profile_dir)
+
+    variant = task.actx_variant
+    actx = instantiate_actx_t(get_actx_class(variant.actx_name),
+                              compile_trace_callback=recorder,
+                              log_loopy_statistics=task.profile_dir is not None,
+                              enable_cl_profiling=task.cl_profile,
+                              feinsum_db=variant.feinsum_db,
+                              fuse_loops=variant.fuse_loops,
+                              assume_non_negative_indices=(
+                                  variant.assume_non_negative_indices))
+    cache_sizes = get_cache_sizes(actx)
+    device, driver_version = get_device_info(actx)
+    knl = get_kernel(task.kernel_name)
+    max_nbatch = max(task.batches)
+
+    results = []
+    with (nullcontext()
+          if task.canonicalization_cache is None
+          else patch_feinsum(task.canonicalization_cache)):
+        for ni, nj in get_problem_sizes(knl, task.nis, task.njs):
+            # the element counts are sized for float64 in every precision,
+            # so that the throughputs of the precisions are comparable
+            for nel, dtype, layout in itertools.product(
+                    get_nels(knl, max_nbatch, ni, nj,
+                             memory_budget=task.memory_budget,
+                             weak_scaling=task.weak_scaling),
+                    task.dtypes, task.layouts):
+                precision = PRECISIONS[dtype]
+                layout_knl = knl.with_layout(LAYOUTS[layout])
+                if not task.verify:
+                    verify_rtol = None
+                elif task.verify_rtol is None:
+                    verify_rtol = precision.rtol
+                else:
+                    verify_rtol = task.verify_rtol
+
+                # the inputs of the smaller batches are prefixes of the ones
+                # of the largest batch
+                inputs = InputPool(actx, layout_knl, max_nbatch,
+                                   get_axis_lengths(ni=ni, nj=nj, nel=nel),
+                                   seed=INPUT_SEED,
+                                   precision=precision)
+                flop_rates = []
+                for nbatch in task.batches:
+                    result = _run_cell(
+                        actx, variant.label, layout_knl, nbatch, ni, nj, nel,
+                        inputs=inputs,
+                        recorder=recorder,
+                        rel_ci_width=task.rel_ci_width,
+                        max_time=task.max_time,
+                        profile_dir=task.profile_dir,
+                        cl_profile=task.cl_profile,
+                        verify_rtol=verify_rtol)
+                    results.append(dc.replace(
+                        result,
+                        roofline=task.rooflines.get(
+                            precision.get_dtype(is_batched=False).name),
+                        device=device,
+                        driver_version=driver_version,
+                        memory_level=get_memory_level(
+                            result.min_bytes_moved, cache_sizes)))
+
+                    # proportional to the per-einsum throughput
+                    flop_rates.append(result.flop_rate)
+                    if (task.saturation_tolerance is not None
+                            and is_saturated(flop_rates,
+                                             task.saturation_tolerance)):
+                        break
+
+                # release the inputs before allocating the next ones
+                del inputs
+
+    return results, task.canonicalization_cache
+
+
+def _describe_sweep_task(task: _SweepTask) -> str:
+    return f"('{task.actx_variant.label}', '{task.kernel_name}')"
+
+
+@dc.dataclass(frozen=True)
+class _WarmFirstCallTask:
+    """
+    The cells of a :class:`_SweepTask` whose first call is timed again in a
+    worker process of their own, once the sweep has populated the persistent
+    compilation caches.
+
+    .. attribute:: cells
+
+        A :class:`tuple` of ``(nbatch, ni, nj, nel, dtype, layout)``.
+    """
+    sweep_task: _SweepTask
+    cells: Tuple[Tuple[int, int, Optional[int], int, str, str], ...]
+
+
+def _run_warm_first_call_task(task: _WarmFirstCallTask
+                              ) -> List[FirstCallTiming]:
+    # runs in a worker process, see run_sweep
+    recorder = CompileTraceRecorder()
+    variant = task.sweep_task.actx_variant
+    actx = instantiate_actx_t(get_actx_class(variant.actx_name),
+                              compile_trace_callback=recorder,
+                              feinsum_db=variant.feinsum_db,
+                              fuse_loops=variant.fuse_loops,
+                              assume_non_negative_indices=(
+                                  variant.assume_non_negative_indices))
+    knl = get_kernel(task.sweep_task.kernel_name)
+    sync = partial(synchronize, actx)
+
+    first_calls = []
+    with (nullcontext()
+          if task.sweep_task.canonicalization_cache is None
+          else patch_feinsum(task.sweep_task.canonicalization_cache)):
+        for nbatch, ni, nj, nel, dtype, layout in task.cells:
+            layout_knl = knl.with_layout(LAYOUTS[layout])
+            axis_lens = get_axis_lengths(ni=ni, nj=nj, nel=nel)
+            inputs = InputPool(actx, layout_knl, nbatch, axis_lens,
+                               seed=INPUT_SEED, precision=PRECISIONS[dtype])
+            first_calls.append(time_first_call(
+                layout_knl.compile(actx, axis_lens), inputs.get_inputs(nbatch),
+                recorder, synchronize=sync))
+            del inputs
+
+    return first_calls
+
+
+def _probe_roofline(actx_name_and_dtype: Tuple[str, str]) -> MachineRoofline:
+    # runs in a worker process, see run_sweep
+    actx_name, dtype = actx_name_and_dtype
+    return measure_roofline(instantiate_actx_t(get_actx_class(actx_name)),
+                            dtype=dtype)
+
+
+def run_sweep(*,
+              kernel_names: Sequence[str],
+              actx_names: Sequence[str],
+              batches: Sequence[int],
+              nis: Sequence[int],
+              njs: Sequence[int],
+              rel_ci_width: float = 0.01,
+              max_time: float = 5,
+              profile_dir: Optional[str] = None,
+              cl_profile: bool = False,
+              probe_roofline: bool = False,
+              memory_budget: Optional[int] = None,
+              weak_scaling: bool = False,
+              saturation_tolerance: Optional[float] = None,
+              feinsum_db: Optional[str] = None,
+              compare_fusion: bool = False,
+              compare_index_assumption: bool = False,
+              dtypes: Sequence[str] = (DEFAULT_PRECISION,),
+              layouts: Sequence[str] = (DEFAULT_LAYOUT,),
+              verify: bool = False,
+              verify_rtol: Optional[float] = None,
+              canonicalization_cache: Optional[CanonicalizationCache] = None,
+              numa_parallel: bool = False
+              ) -> Tuple[List[BenchmarkResult], List[TaskFailure]]:
+    """
+    Runs the cells of every ``(array context, kernel)`` in a fresh worker
+    process, see :func:`~feinsum_evaluation.workers.run_isolated`, so that
+    no runtime state leaks from one array context to the next. The pairs
+    that are not supported, see :func:`is_supported`, are skipped. The first
+    call of every cell is then timed again in another fresh worker process
+    per pair, which shares the persistent compilation caches populated by
+    the first, see :attr:`BenchmarkResult.warm_first_call`.
+
+    Returns the results of the cells and the
+    :class:`~feinsum_evaluation.workers.TaskFailure` of every pair whose
+    worker failed. The failures are printed to stderr and do not discard
+    the results of the other pairs.
+
+    :arg profile_dir: If not *None*, the compilation of every cell of the
+        sweep is profiled via
+        :class:`~feinsum_evaluation.profiling.CompileProfiler` and saved in
+        this directory.
+    :arg cl_profile: If *True*, the OpenCL array contexts are run with
+        profiling-enabled queues and the device time of every cell is
+        recorded.
+    :arg probe_roofline: If *True*, the roofline of every array context's
+        device is measured via
+        :func:`~feinsum_evaluation.roofline.measure_roofline` in the compute
+        dtype of every precision in *dtypes*.
+    :arg memory_budget: See :func:`get_nels`.
+    :arg weak_scaling: See :func:`get_nels`.
+    :arg saturation_tolerance: If not *None*, the batch sizes of every
+        ``(kernel, ni, nj, nel)`` are swept in increasing order until the
+        per-einsum throughput saturates, see
+        :func:`~feinsum_evaluation.saturation.is_saturated`.
+    :arg feinsum_db: See :func:`get_actx_variants`.
+    :arg compare_fusion: See :func:`get_actx_variants`.
+    :arg compare_index_assumption: See :func:`get_actx_variants`.
+    :arg dtypes: Names of the precisions, see
+        :data:`~feinsum_evaluation.precision.PRECISIONS`, to run every cell
+        in.
+    :arg layouts: Names of the layouts, see
+        :data:`~feinsum_evaluation.layouts.LAYOUTS`, to store the operands of
+        every cell in. Layouts other than the declared one are only
+        supported by the array contexts in
+        :data:`~feinsum_evaluation.utils.STRIDED_LAYOUT_ACTX_NAMES`.
+    :arg verify: If *True*, the outputs of every compiled kernel are
+        verified, after its timings, against a float64 reference, see
+        :func:`~feinsum_evaluation.verification.verify_kernel`.
+    :arg verify_rtol: The relative tolerance of the verification. If *None*,
+        the one of the cell's precision,
+        :attr:`~feinsum_evaluation.precision.Precision.rtol`, is used.
+    :arg canonicalization_cache: If not *None*, the worker processes
+        memoize the canonicalization of einsums starting from a copy of
+        this cache, whose entries and statistics are merged back into it.
+    :arg numa_parallel: If *True*, the ``(array context, kernel)`` pairs are
+        run concurrently, one per NUMA domain of the host, see
+        :func:`~feinsum_evaluation.workers.get_numa_cpu_sets`. Only
+        meaningful if the array contexts execute on the host's CPUs.
+    """
+    cpu_sets = get_numa_cpu_sets() if numa_parallel else None
+    variants = get_actx_variants(actx_names, feinsum_db, compare_fusion,
+                                 compare_index_assumption)
+
+    if probe_roofline:
+        probed = list(itertools.product(
+            dict.fromkeys(variant.actx_name for variant in variants),
+            dict.fromkeys(PRECISIONS[dtype].get_dtype(is_batched=False).name
+                          for dtype in dtypes)))
+        outcomes = run_isolated(_probe_roofline, probed, cpu_sets=cpu_sets)
+        drop_failures(outcomes,
+                      describe=lambda actx_name_and_dtype: (
+                          "roofline of '{}' in {}".format(
+                              *actx_name_and_dtype)))
+        # the cells of an array context whose roofline could not be probed
+        # are reported without it
+        rooflines = {actx_name_and_dtype: roofline
+                     for actx_name_and_dtype, roofline in zip(probed, outcomes)
+                     if not isinstance(roofline, TaskFailure)}
+    else:
+        rooflines = {}
+
+    tasks = [_SweepTask(actx_variant=variant,
+                        kernel_name=kernel_name,
+                        batches=tuple(batches),
+                        nis=tuple(nis),
+                        njs=tuple(njs),
+                        rel_ci_width=rel_ci_width,
+                        max_time=max_time,
+                        profile_dir=profile_dir,
+                        cl_profile=cl_profile,
+                        memory_budget=memory_budget,
+                        weak_scaling=weak_scaling,
+                        saturation_tolerance=saturation_tolerance,
+                        dtypes=tuple(dtypes),
+                        layouts=tuple(layouts),
+                        verify=verify,
+                        verify_rtol=verify_rtol,
+                        rooflines={
+                            dtype: rooflines[variant.actx_name, dtype]
+                            for actx_name, dtype in rooflines
+                            if actx_name == variant.actx_name},
+                        canonicalization_cache=canonicalization_cache)
+             for variant in variants
+             for kernel_name in kernel_names
+             if is_supported(variant.actx_name, get_kernel(kernel_name))]
+
+    outcomes = run_isolated(_run_sweep_task, tasks, cpu_sets=cpu_sets)
+    drop_failures(outcomes, describe=_describe_sweep_task)
+    failures = [outcome
+                for outcome in outcomes
+                if isinstance(outcome, TaskFailure)]
+    task_results = []
+    for task, outcome in zip(tasks, outcomes, strict=True):
+        if not isinstance(outcome, TaskFailure):
+            results, task_cache = outcome
+            task_results.append((task, results))
+            if canonicalization_cache is not None:
+                canonicalization_cache.update(task_cache)
+
+    # The first calls with warm persistent caches are timed in fresh
+    # processes, since a second compilation in the process that populated
+    # the caches would also hit its in-memory caches.
+    warm_tasks = [_WarmFirstCallTask(
+                      sweep_task=task,
+                      cells=tuple((result.nbatch, result.ni, result.nj,
+                                   result.nel, result.dtype, result.layout)
+                                  for result in results))
+                  for task, results in task_results]
+    warm_outcomes = run_isolated(_run_warm_first_call_task, warm_tasks,
+                                 cpu_sets=cpu_sets)
+    drop_failures(warm_outcomes,
+                  describe=lambda warm_task: (
+                      "warm first calls of"
+                      f" {_describe_sweep_task(warm_task.sweep_task)}"))
+
+    all_results = []
+    for (_, results), warm_outcome in zip(task_results, warm_outcomes,
+                                          strict=True):
+        if isinstance(warm_outcome, TaskFailure):
+            failures.append(warm_outcome)
+            all_results.extend(results)
+        else:
+            all_results.extend(
+                dc.replace(result, warm_first_call=warm_first_call)
+                for result, warm_first_call in zip(results, warm_outcome,
+                                                   strict=True))
+
+    return all_results, failures
+
+
+def _format_mib(nbytes: Optional[int]) -> str:
+    return "N/A" if nbytes is None else f"{nbytes / (1 << 20):.1f}"
+
+
+def _format_cell(result: BenchmarkResult) -> str:
+    formatted = (f"{result.timing.median:.4f}"
+                 f" ±{50*result.timing.rel_ci_width:.1f}%")
+    return formatted if result.is_valid else f"{formatted} (INVALID)"
+
+
+def print_results(results: Sequence[BenchmarkResult],
+                  actx_names: Sequence[str]) -> None:
+    """
+    Prints one table per ``(kernel, ni, nj, nel, dtype, layout)`` with the
+    batch sizes along the rows and the array contexts along the columns. Each
+    cell reports the median time per call along with the half-width of its
+    confidence interval, followed by a table with the remaining statistics.
+    Only the array contexts with results in a table get a column, so that
+    the kernels that are not supported by, or whose worker failed on, an
+    array context are still reported. The cells without a result are
+    printed as "-".
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault((result.kernel, result.ni, result.nj, result.nel,
+                           result.dtype, result.layout),
+                          []).append(result)
+
+    for (kernel, ni, nj, nel, dtype, layout), group in groups.items():
+        results_by_cell = {(result.nbatch, result.actx): result
+                           for result in group}
+        batches = sorted({result.nbatch for result in group})
+        group_actx_names = [actx_name
+                            for actx_name in actx_names
+                            if any(result.actx == actx_name
+                                   for result in group)]
+
+        table = [["", *group_actx_names]]
+        for nbatch in batches:
+            table.append([str(nbatch)]
+                         + [(_format_cell(results_by_cell[nbatch, actx_name])
+                             if (nbatch, actx_name) in results_by_cell
+                             else "-")
+                            for actx_name in group_actx_names])
+
+        print(f"{kernel} (ni={ni}, nj={nj}, nel={nel}, dtype={dtype},"
+              f" layout={layout})")
+        print(tabulate(table, tablefmt="fancy_grid"))
+
+        details = [[result.actx, result.nbatch,
+                    f"{result.timing.median:.4f}",
+                    f"{result.timing.min:.4f}",
+                    f"{result.timing.iqr:.4f}",
+                    f"[{result.timing.ci_low:.4f}, {result.timing.ci_high:.4f}]",
+                    len(result.timing.samples),
+                    result.timing.n_outliers]
+                   for result in group]
+        print(tabulate(details,
+                       headers=["actx", "#batches", "median", "min", "IQR",
+                                f"{100*group[0].timing.confidence:.0f}% CI",
+                                "#samples", "#outliers"]))
+
+        # {{{ compile latency
+
+        ref_actx_name = group_actx_names[0]
+
+        compile_table = []
+        for result in group:
+            ref_result = results_by_cell.get((result.nbatch, ref_actx_name))
+            if ref_result is None:
+                break_even_str = "N/A"
+            else:
+                break_even = get_break_even_iterations(
+                    result.compile_time, result.timing.median,
+                    ref_result.compile_time, ref_result.timing.median)
+                break_even_str = ("never"
+                                  if break_even is None
+                                  else f"{break_even:.0f}")
+            compile_table.append([
+                result.actx, result.nbatch,
+                f"{result.first_call.trace:.3f}",
+                f"{result.first_call.transform:.3f}",
+                f"{result.first_call.codegen:.3f}",
+                f"{result.first_call.first_execution:.3f}",
+                f"{result.first_call.total:.3f}",
+                ("N/A"
+                 if result.warm_first_call is None
+                 else f"{result.warm_first_call.total:.3f}"),
+                f"{result.timing.median:.4f}",
+                break_even_str,
+            ])
+
+        first_call_header = ("first call (cold cache)"
+                             if group[0].cold_cache
+                             else "first call")
+        print(tabulate(compile_table,
+                       headers=["actx", "#batches", "trace", "transform",
+                                "codegen", "build+first exec",
+                                first_call_header, "first call (warm cache)",
+                                "steady state",
+                                f"break-even #calls vs {ref_actx_name}"]))
+
+        # }}}
+
+        # {{{ throughput
+
+        throughput_table = []
+        for result in group:
+            row = [result.actx, result.nbatch,
+                   f"{result.flop_rate*1e-9:.2f}",
+                   f"{result.bandwidth*1e-9:.2f}",
+                   f"{result.arithmetic_intensity:.2f}"]
+            if result.roofline is not None:
+                row += [f"{result.roofline.peak_flop_rate*1e-9:.2f}",
+                        f"{result.roofline.peak_bandwidth*1e-9:.2f}",
+                        f"{100*result.roofline_fraction:.1f}%"]
+            throughput_table.append(row)
+
+        print(tabulate(throughput_table,
+                       headers=["actx", "#batches", "GFLOP/s", "GB/s",
+                                "FLOPs/byte", "peak GFLOP/s", "peak GB/s",
+                                "% of roofline"]))
+
+        # }}}
+
+        # {{{ memory
+
+        print(tabulate(
+            [[result.actx, result.nbatch,
+              _format_mib(result.memory.peak_device_bytes),
+              _format_mib(result.memory.peak_host_bytes),
+              ("-"
+               if result.memory.nallocations_per_call is None
+               else f"{result.memory.nallocations_per_call:.1f}"),
+              _format_mib(result.memory.pool_held_bytes)]
+             for result in group],
+            headers=["actx", "#batches", "peak device (MiB)",
+                     "peak host RSS (MiB)", "#allocations/call",
+                     "pool held (MiB)"]))
+
+        # }}}
+
+        # {{{ verification
+
+        verified = [result for result in group
+                    if result.verification is not None]
+        if verified:
+            print(tabulate(
+                [[result.actx, result.nbatch,
+                  f"{result.verification.max_error:.2e}",
+                  f"{result.verification.rtol:.0e}",
+                  "ok" if result.verification.passed else "INVALID"]
+                 for result in verified],
+                headers=["actx", "#batches", "max rel. error", "tolerance",
+                         "verification"]))
+
+        # }}}
+
+        # {{{ device time vs host overhead
+
+        profiled = [result for result in group
+                    if result.device_profile is not None]
+        if profiled:
+            print(tabulate(
+                [[result.actx, result.nbatch,
+                  f"{result.device_profile.wall_time:.4f}",
+                  f"{result.device_profile.device_time:.4f}",
+                  f"{result.device_profile.host_overhead:.4f}",
+                  f"{100*result.device_profile.host_overhead_fraction:.1f}%",
+                  result.device_profile.nlaunches]
+                 for result in profiled],
+                headers=["actx", "#batches", "wall time", "device time",
+                         "host overhead", "host overhead (%)", "#launches"]))
+
+        # }}}
+
+
+# {{{ cold persistent caches
+
+_COLD_CACHE_DIR_ENV_VAR = "FEINSUM_EVALUATION_COLD_CACHE_DIR"
+
+
+def _is_cold_cache() -> bool:
+    return _COLD_CACHE_DIR_ENV_VAR in os.environ
+
+
+def _reexec_with_cold_cache(argv: Sequence[str]) -> None:
+    """
+    Re-executes the driver with the persistent compilation caches (of
+    :mod:`loopy`, :mod:`pyopencl`, etc.) pointing to an empty directory. The
+    caches' locations are resolved when the backends are imported and hence
+    a fresh process is needed.
+    """
+    import tempfile
+    cache_dir = tempfile.mkdtemp(prefix="feinsum-evaluation-cache-")
+    env = dict(os.environ)
+    env["XDG_CACHE_HOME"] = cache_dir
+    env[_COLD_CACHE_DIR_ENV_VAR] = cache_dir
+    os.execve(sys.executable,
+              [sys.executable, "-m", "feinsum_evaluation", *argv],
+              env)
+
+
+def _cleanup_cold_cache() -> None:
+    import shutil
+    shutil.rmtree(os.environ[_COLD_CACHE_DIR_ENV_VAR], ignore_errors=True)
+
+# }}}
+
+
+def _print_variant_speedups(results: Sequence[BenchmarkResult],
+                            get_variant_label: Callable[[str], Optional[str]],
+                            title: str,
+                            baseline_header: str,
+                            variant_header: str) -> None:
+    # *get_variant_label* maps the label of a baseline array context to the
+    # label of the variant compared against it, or *None* if the label is
+    # not of a baseline.
+    baseline_results = {}
+    for result in results:
+        variant_label = get_variant_label(result.actx)
+        if variant_label is not None:
+            baseline_results[result.kernel, variant_label, result.nbatch,
+                             result.ni, result.nj, result.nel,
+                             result.dtype, result.layout] = result
+
+    table = []
+    for result in results:
+        baseline_result = baseline_results.get(
+            (result.kernel, result.actx, result.nbatch, result.ni, result.nj,
+             result.nel, result.dtype, result.layout))
+        if baseline_result is None:
+            continue
+        speedup = baseline_result.timing.median / result.timing.median
+        table.append([result.kernel, result.actx, result.nbatch, result.ni,
+                      result.nj, result.nel, result.dtype, result.layout,
+                      f"{baseline_result.timing.median:.4f}",
+                      f"{result.timing.median:.4f}",
+                      f"{speedup:.2f}x"])
+
+    if table:
+        print(f"{title}:")
+        print(tabulate(table,
+                       headers=["kernel", "actx", "#batches", "ni", "nj", "nel",
+                                "dtype", "layout", baseline_header,
+                                variant_header, "speedup"]))
+
+
+def print_tuning_speedups(results: Sequence[BenchmarkResult]) -> None:
+    """
+    Prints the speedup of every cell run with a tuned :mod:`feinsum` database
+    over the same cell run with the default database.
+    """
+    _print_variant_speedups(
+        results,
+        lambda label: (label[:-len(DEFAULT_FEINSUM_DB_SUFFIX)]
+                       if label.endswith(DEFAULT_FEINSUM_DB_SUFFIX)
+                       else None),
+        "Tuned vs default feinsum database", "default db", "tuned db")
+
+
+def print_fusion_speedups(results: Sequence[BenchmarkResult]) -> None:
+    """
+    Prints the speedup of every cell run with loop fusion over the same cell
+    run without loop fusion.
+    """
+    _print_variant_speedups(
+        results,
+        lambda label: (label.replace(NO_FUSION_SUFFIX, "")
+                       if NO_FUSION_SUFFIX in label
+                       else None),
+        "Fused vs unfused code generation", "unfused", "fused")
+
+
+def print_index_assumption_speedups(results: Sequence[BenchmarkResult]
+                                    ) -> None:
+    """
+    Prints the speedup of every cell run assuming the indirection maps to be
+    non-negative over the same cell run without the assumption.
+    """
+    _print_variant_speedups(
+        results,
+        lambda label: (label.replace(SIGNED_INDICES_SUFFIX, "")
+                       if SIGNED_INDICES_SUFFIX in label
+                       else None),
+        "Non-negative vs signed indirection maps", "signed", "non-negative")
+
+
+def print_precision_speedups(results: Sequence[BenchmarkResult]) -> None:
+    """
+    Prints the speedup and, if verified, the accuracy of every cell run in a
+    reduced precision over the same cell run in float64.
+    """
+    float64_results = {
+        (result.kernel, result.actx, result.nbatch, result.ni, result.nj,
+         result.nel, result.layout): result
+        for result in results
+        if result.dtype == DEFAULT_PRECISION}
+
+    table = []
+    for result in results:
+        float64_result = float64_results.get(
+            (result.kernel, result.actx, result.nbatch, result.ni, result.nj,
+             result.nel, result.layout))
+        if result.dtype == DEFAULT_PRECISION or float64_result is None:
+            continue
+        speedup = float64_result.timing.median / result.timing.median
+        table.append([result.kernel, result.actx, result.nbatch, result.ni,
+                      result.nj, result.nel, result.dtype, result.layout,
+                      f"{float64_result.timing.median:.4f}",
+                      f"{result.timing.median:.4f}",
+                      f"{speedup:.2f}x",
+                      f"{result.bandwidth*1e-9:.2f}",
+                      ("-"
+                       if result.verification is None
+                       else f"{result.verification.max_error:.2e}")])
+
+    if table:
+        print(f"Reduced precision vs {DEFAULT_PRECISION}:")
+        print(tabulate(table,
+                       headers=["kernel", "actx", "#batches", "ni", "nj", "nel",
+                                "dtype", "layout", DEFAULT_PRECISION, "reduced",
+                                "speedup", "GB/s", "max rel. error"]))
+
+
+def print_layout_results(results: Sequence[BenchmarkResult]) -> None:
+    """
+    Prints the median time of every layout run for each
+    ``(kernel, actx, ni, nj, nel, nbatch, dtype)`` along with the fastest
+    layout and its speedup over the declared one. The layouts whose outputs
+    failed verification are not considered for the fastest one.
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault((result.kernel, result.actx, result.ni, result.nj,
+                           result.nel, result.nbatch, result.dtype),
+                          {})[result.layout] = result
+
+    layouts = list(dict.fromkeys(result.layout for result in results))
+    if len(layouts) < 2:
+        return
+
+    table = []
+    for (kernel, actx_name, ni, nj, nel, nbatch, dtype), layout_to_result in (
+            groups.items()):
+        valid_layouts = [layout
+                         for layout, result in layout_to_result.items()
+                         if result.is_valid]
+        best_layout = min(valid_layouts,
+                          key=lambda layout: (
+                              layout_to_result[layout].timing.median),
+                          default=None)
+        default_result = layout_to_result.get(DEFAULT_LAYOUT)
+        if (best_layout is None or default_result is None
+                or not default_result.is_valid):
+            speedup = "-"
+        else:
+            best_time = layout_to_result[best_layout].timing.median
+            speedup = f"{default_result.timing.median / best_time:.2f}x"
+        table.append([
+            kernel, actx_name, ni, nj, nel, nbatch, dtype,
+            *(("-"
+               if layout not in layout_to_result
+               else _format_cell(layout_to_result[layout]))
+              for layout in layouts),
+            "-" if best_layout is None else best_layout,
+            speedup])
+
+    print("Layouts:")
+    print(tabulate(table,
+                   headers=["kernel", "actx", "ni", "nj", "nel", "#batches",
+                            "dtype", *layouts, "best layout",
+                            f"speedup vs {DEFAULT_LAYOUT}"]))
+
+
+def print_composite_results(results: Sequence[BenchmarkResult]) -> None:
+    """
+    Prints the runtime and the memory traffic of every composite kernel
+    compiled as one program against the same kernel with its parts compiled
+    separately, see
+    :attr:`~feinsum_evaluation.kernels.CompositeKernel.compile_separately`.
+    The traffic is the one of :attr:`BenchmarkResult.min_bytes_moved`, i.e.
+    counts the operands shared by the parts once per compiled program.
+    """
+    separate_results = {
+        (result.kernel[:-len(SEPARATE_SUFFIX)], result.actx, result.nbatch,
+         result.ni, result.nj, result.nel, result.dtype, result.layout): result
+        for result in results
+        if (result.kernel in COMPOSITE_KERNELS
+            and COMPOSITE_KERNELS[result.kernel].compile_separately)}
+
+    table = []
+    for result in results:
+        separate_result = separate_results.get(
+            (result.kernel, result.actx, result.nbatch, result.ni, result.nj,
+             result.nel, result.dtype, result.layout))
+        if separate_result is None:
+            continue
+
+        saved_traffic = 1 - (result.min_bytes_moved
+                             / separate_result.min_bytes_moved)
+        table.append([
+            result.kernel, result.actx, result.nbatch, result.ni, result.nj,
+            result.nel, result.dtype, result.layout,
+            f"{separate_result.timing.median:.4f}",
+            f"{result.timing.median:.4f}",
+            f"{separate_result.timing.median / result.timing.median:.2f}x",
+            _format_mib(separate_result.min_bytes_moved),
+            _format_mib(result.min_bytes_moved),
+            f"{100*saved_traffic:.1f}%",
+            _format_mib(separate_result.memory.peak_device_bytes),
+            _format_mib(result.memory.peak_device_bytes)])
+
+    if table:
+        print("Fused vs separately compiled operators:")
+        print(tabulate(table,
+                       headers=["kernel", "actx", "#batches", "ni", "nj", "nel",
+                                "dtype", "layout", "separate", "fused",
+                                "speedup", "separate traffic (MiB)",
+                                "fused traffic (MiB)", "traffic saved",
+                                "separate peak device (MiB)",
+                                "fused peak device (MiB)"]))
+
+
+def print_saturation_results(results: Sequence[BenchmarkResult],
+                             tolerance: float) -> None:
+    """
+    Prints one table per ``(kernel, ni, nj, nel, dtype, layout)`` with the
+    per-einsum
+    throughput of every array context along the rows of increasing batch
+    size, relative to the throughput of a single einsum, followed by the
+    batch size at which the throughput saturates, see
+    :func:`~feinsum_evaluation.saturation.get_saturation_batch`.
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault((result.kernel, result.ni, result.nj, result.nel,
+                           result.dtype, result.layout),
+                          {}).setdefault(result.actx, []).append(result)
+
+    for ((kernel, ni, nj, nel, dtype, layout),
+         actx_to_results) in groups.items():
+        print(f"Batch saturation: {kernel} (ni={ni}, nj={nj}, nel={nel},"
+              f" dtype={dtype}, layout={layout})")
+        saturation_table = []
+        for actx_name, actx_results in actx_to_results.items():
+            actx_results = sorted(actx_results, key=lambda r: r.nbatch)
+            # the FLOP count is proportional to the number of einsums, i.e.
+            # the FLOP rate is proportional to the per-einsum throughput
+            base_flop_rate = actx_results[0].flop_rate
+            print(tabulate(
+                [[actx_name, result.nbatch,
+                  f"{result.timing.median:.4f}",
+                  f"{result.flop_rate*1e-9:.2f}",
+                  f"{result.flop_rate/base_flop_rate:.2f}x"]
+                 for result in actx_results],
+                headers=["actx", "#batches", "median", "GFLOP/s",
+                         f"speedup vs {actx_results[0].nbatch} batch(es)"]))
+
+            batches = [result.nbatch for result in actx_results]
+            flop_rates = [result.flop_rate for result in actx_results]
+            saturation_batch = get_saturation_batch(batches, flop_rates,
+                                                    tolerance)
+            saturation_table.append([actx_name, saturation_batch,
+                                     f"{max(flop_rates)*1e-9:.2f}",
+                                     batches[-1]])
+
+        print(tabulate(saturation_table,
+                       headers=["actx", "saturates at #batches",
+                                "peak GFLOP/s", "largest #batches run"]))
+
+
+def print_weak_scaling_results(results: Sequence[BenchmarkResult]) -> None:
+    """
+    Prints one table per ``(kernel, ni, nj, actx, nbatch, dtype, layout)``
+    that was run with more than one element count, with the throughput along
+    the rows of increasing working set size.
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault((result.kernel, result.ni, result.nj, result.actx,
+                           result.nbatch, result.dtype, result.layout),
+                          []).append(result)
+
+    for ((kernel, ni, nj, actx_name, nbatch, dtype, layout),
+         group) in groups.items():
+        if len(group) < 2:
+            continue
+
+        print(f"Weak scaling: {kernel} (ni={ni}, nj={nj}, dtype={dtype},"
+              f" layout={layout}) on {actx_name} with {nbatch} batches")
+        print(tabulate(
+            [[result.nel,
+              f"{result.min_bytes_moved / (1 << 20):.2f}",
+              result.memory_level,
+              f"{result.timing.median:.3g}",
+              f"{result.flop_rate*1e-9:.2f}",
+              f"{result.bandwidth*1e-9:.2f}"]
+             for result in sorted(group, key=lambda r: r.nel)],
+            headers=["nel", "working set (MiB)", "fits in", "median",
+                     "GFLOP/s", "GB/s"]))
+
+
+def check_memory_regressions(results: Sequence[BenchmarkResult],
+                             baseline_filename: str,
+                             tolerance: float) -> bool:
+    """
+    Prints the cells whose peak device memory exceeds the one recorded in
+    *baseline_filename* by more than *tolerance* and returns *True* if there
+    are any.
+    """
+    regressions = find_memory_regressions(
+        {result.key: result.memory.peak_device_bytes
+         for result in results
+         if result.memory.peak_device_bytes is not None},
+        load_memory_baseline(baseline_filename),
+        tolerance)
+
+    if regressions:
+        print("Memory regressions:")
+        print(tabulate([[key, baseline_nbytes, nbytes,
+                         f"{100*(nbytes/baseline_nbytes - 1):+.1f}%"]
+                        for key, baseline_nbytes, nbytes in regressions],
+                       headers=["cell", "baseline (bytes)", "peak (bytes)",
+                                "change"]))
+
+    return bool(regressions)
+
+
+def check_fusion_disabled(results: Sequence[BenchmarkResult]) -> bool:
+    """
+    Prints the cells run without loop fusion, see :data:`NO_FUSION_SUFFIX`,
+    whose device code is not known to differ from the one of the same cell
+    run with loop fusion, and returns *True* if there are any. Their
+    speedups reported by :func:`print_fusion_speedups` do not measure loop
+    fusion.
+    """
+    fused_digests = {
+        (result.kernel, result.actx, result.nbatch, result.ni, result.nj,
+         result.nel, result.dtype, result.layout): result.device_code_digest
+        for result in results
+        if NO_FUSION_SUFFIX not in result.actx}
+
+    table = []
+    for result in results:
+        if NO_FUSION_SUFFIX not in result.actx:
+            continue
+        key = (result.kernel, result.actx.replace(NO_FUSION_SUFFIX, ""),
+               result.nbatch, result.ni, result.nj, result.nel, result.dtype,
+               result.layout)
+        if key not in fused_digests:
+            continue
+        fused_digest = fused_digests[key]
+        if result.device_code_digest is None or fused_digest is None:
+            table.append([*key, "device code unavailable"])
+        elif result.device_code_digest == fused_digest:
+            table.append([*key, "same device code as fused"])
+
+    if table:
+        print("Loop fusion not disabled:")
+        print(tabulate(table,
+                       headers=["kernel", "actx", "#batches", "ni", "nj", "nel",
+                                "dtype", "layout", "reason"]))
+
+    return bool(table)
+
+
+# {{{ results database
+
+def to_result_record(result: BenchmarkResult) -> ResultRecord:
+    return ResultRecord(
+        key=result.key,
+        suite="dg",
+        kernel=result.kernel,
+        actx=result.actx,
+        nbatch=result.nbatch,
+        ni=result.ni,
+        nj=result.nj,
+        nel=result.nel,
+        device=result.device,
+        driver_version=result.driver_version,
+        median=result.timing.median,
+        samples=result.timing.samples,
+        peak_device_bytes=(None
+                           if result.memory is None
+                           else result.memory.peak_device_bytes),
+        record=dc.asdict(result))
+
+
+def store_results(filename: str, results: Sequence[BenchmarkResult],
+                  argv: Sequence[str], *,
+                  baseline_run: Optional[int] = None,
+                  alpha: float = 0.01,
+                  threshold: float = 0.05,
+                  memory_tolerance: float = 0.05) -> bool:
+    """
+    Appends *results* as a new run to the
+    :class:`~feinsum_evaluation.results_db.ResultsDatabase` in *filename*. If
+    *baseline_run* is not *None*, the run is compared against it and *True*
+    is returned if any cell regressed.
+    """
+    with ResultsDatabase(filename) as db:
+        records = {result.key: to_result_record(result) for result in results}
+        run_id = db.add_run("dg", list(records.values()), argv=argv)
+        print(f"Stored as run {run_id} in '{filename}'.")
+
+        if baseline_run is None:
+            return False
+
+        comparisons = compare_records(db.get_records(baseline_run), records)
+
+    print(f"Run {run_id} vs baseline run {baseline_run}:")
+    print_comparisons(comparisons, alpha=alpha, threshold=threshold,
+                      memory_tolerance=memory_tolerance)
+    return has_regressions(comparisons, alpha=alpha, threshold=threshold,
+                           memory_tolerance=memory_tolerance)
+
+# }}}
+
+
+def print_canonicalization_cache_stats(cache: CanonicalizationCache) -> None:
+    if cache.hit_rate is None:
+        print("Canonicalization cache: unused")
+        return
+
+    avg_miss_time = cache.miss_time / cache.nmisses if cache.nmisses else 0
+    avg_hit_time = cache.hit_time / cache.nhits if cache.nhits else 0
+    print("Canonicalization cache:")
+    print(tabulate([
+        ["#hits", cache.nhits],
+        ["#misses", cache.nmisses],
+        ["hit rate", f"{100*cache.hit_rate:.1f}%"],
+        ["time per miss (ms)", f"{avg_miss_time*1e3:.3f}"],
+        ["time per hit (ms)", f"{avg_hit_time*1e3:.3f}"],
+        ["time saved (s)", f"{cache.nhits*(avg_miss_time-avg_hit_time):.3f}"],
+    ]))
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="feinsum_evaluation",
+        description="Run batched DG-kernel benchmarks for arraycontexts",
+    )
+
+    parser.add_argument("--kernels", metavar="K", type=str,
+                        default=None,
+                        help=("comma separated names of the kernels to"
+                              " run the benchmark for (for ex."
+                              " 'ifj_fe_fej_to_ei,xre_rij_ej_to_xei')."
+                              " Defaults to all the registered kernels, except"
+                              " for the composite ones (for ex."
+                              " 'grad_div_face_lift', compiled as one program,"
+                              " and 'grad_div_face_lift_separate', compiled"
+                              " per operator). The face gathers are skipped on"
+                              " the array contexts that do not support them."))
+
+    parser.add_argument("--actxs", metavar="A", type=str,
+                        help=("comma separated names of the"
+                              " array context types"
+                              " to run the benchmark with (for ex."
+                              " 'pyopencl,jax:jit,pytato:batched_einsum')"),
+                        required=True,)
+
+    parser.add_argument("--batches", metavar="N", type=str,
+                        help=("comma separated integers representing the"
+                              " #batches to run"
+                              " the benchmark with (for ex."
+                              " '1,3,6,19'). Required unless '--saturation'"
+                              " is passed."),
+                        default=None)
+
+    parser.add_argument("--ni", metavar="NI", type=str,
+                        help=("comma separated loop-lengths of `i` (for ex."
+                              " '4,10,20,35')."),
+                        required=True,)
+
+    parser.add_argument("--nj", metavar="NJ", type=str, default="",
+                        help=("comma separated loop-lengths of `j`. Only"
+                              " required by kernels with face-dofs."))
+
+    parser.add_argument("--rel-ci-width", type=float, default=0.01,
+                        help=("stop sampling once the width of the confidence"
+                              " interval of the median relative to the median"
+                              " is below this value. Defaults to 0.01."))
+
+    parser.add_argument("--max-time", type=float, default=5,
+                        help=("time budget (in seconds) for the timed samples of"
+                              " each cell of the sweep. Defaults to 5."))
+
+    parser.add_argument("--cold-cache", action="store_true",
+                        help=("run with empty persistent compilation caches so"
+                              " that the reported first call times include"
+                              " the entire code generation. The first calls"
+                              " with warm caches are timed in fresh processes"
+                              " sharing the caches populated by the sweep."))
+
+    parser.add_argument("--trace", metavar="DIR", type=str, default=None,
+                        help=("profile every stage of the compilation pipeline"
+                              " and save the stage timings, IR sizes,"
+                              " generated kernels and loopy statistics of"
+                              " each run in DIR."))
+
+    parser.add_argument("--cl-profile", action="store_true",
+                        help=("create profiling-enabled OpenCL queues and"
+                              " report the device time, host dispatch overhead"
+                              " and kernel launch count of every call."))
+
+    parser.add_argument("--roofline", action="store_true",
+                        help=("probe the peak FLOP rate and bandwidth of every"
+                              " array context's device in the compute dtype"
+                              " of every '--dtype' and report the achieved"
+                              " performance as a fraction of the roofline."))
+
+    parser.add_argument("--memory-budget", metavar="BYTES", type=str,
+                        default=None,
+                        help=("size the problems so that the working set of"
+                              " the largest batch fits in BYTES (for ex."
+                              " '512M', '4G') instead of using the element"
+                              " counts tabulated for each ni."))
+
+    parser.add_argument("--weak-scaling", action="store_true",
+                        help=("sweep the number of elements so that the working"
+                              " set grows geometrically up to the memory"
+                              " budget, and report the throughput at each"
+                              " level of the memory hierarchy."))
+
+    parser.add_argument("--saturation", action="store_true",
+                        help=("grow the #batches geometrically from 1 up to"
+                              " '--max-batch' until the per-einsum throughput"
+                              " stops improving by more than"
+                              " '--saturation-tolerance', and report the"
+                              " saturation point and the speedup curve."))
+
+    parser.add_argument("--max-batch", metavar="N", type=int, default=64,
+                        help=("largest #batches of '--saturation'. The element"
+                              " counts are sized for it. Defaults to 64."))
+
+    parser.add_argument("--saturation-tolerance", type=float, default=0.05,
+                        help=("relative improvement in the per-einsum"
+                              " throughput below which it is considered"
+                              " saturated. Defaults to 0.05."))
+
+    parser.add_argument("--compare-fusion", action="store_true",
+                        help=("also run the array contexts that batch einsums"
+                              " via feinsum without loop fusion, and report"
+                              " the speedups of fused code generation. Fails"
+                              " if the device code generated without loop"
+                              " fusion is the same as with it."))
+
+    parser.add_argument("--compare-index-assumption", action="store_true",
+                        help=("also run the array contexts that batch einsums"
+                              " via feinsum without assuming the indirection"
+                              " maps of the gather kernels to be non-negative,"
+                              " and report the speedups of the assumption."))
+
+    parser.add_argument("--save-memory-baseline", metavar="FILE", type=str,
+                        default=None,
+                        help=("save the peak device memory of every cell to"
+                              " FILE to be used as '--memory-baseline' in"
+                              " later runs. The cells of array contexts that"
+                              " do not report it, for ex. JAX, are left"
+                              " out."))
+
+    parser.add_argument("--memory-baseline", metavar="FILE", type=str,
+                        default=None,
+                        help=("fail the run if the peak device memory of any"
+                              " cell exceeds the one recorded in FILE by more"
+                              " than '--memory-tolerance'."))
+
+    parser.add_argument("--memory-tolerance", type=float, default=0.05,
+                        help=("relative increase in the peak device memory"
+                              " over '--memory-baseline' that is tolerated."
+                              " Defaults to 0.05."))
+
+    parser.add_argument("--canonicalization-cache", metavar="FILE", nargs="?",
+                        const="", default=None,
+                        help=("memoize feinsum's canonicalization of einsums"
+                              " across the sweep and report the cache's hit"
+                              " rate. If FILE is provided, the cache is loaded"
+                              " from (if it exists) and saved to FILE."))
+
+    parser.add_argument("--numa-parallel", action="store_true",
+                        help=("run the (array context, kernel) pairs"
+                              " concurrently, each in a worker process pinned"
+                              " to one of the host's NUMA domains. Only"
+                              " meaningful if the array contexts execute on"
+                              " the host's CPUs."))
+
+    parser.add_argument("--verify", action="store_true",
+                        help=("after timing each cell, check the compiled"
+                              " kernel's outputs against a float64 NumPy"
+                              " reference on seeded inputs and mark the cells"
+                              " exceeding '--verify-rtol' as invalid."))
+
+    parser.add_argument("--verify-rtol", type=float, default=None,
+                        help=("largest relative error (in the max-norm) of a"
+                              " verified output. Defaults to a tolerance per"
+                              " '--dtype', 1e-10 for float64."))
+
+    parser.add_argument("--dtype", metavar="D", type=str,
+                        default=DEFAULT_PRECISION,
+                        help=("comma separated precisions to run every cell in:"
+                              " 'float64', 'float32' or 'mixed' (float32"
+                              " storage of the batched operands with float64"
+                              " accumulation). Pass '--verify' to also report"
+                              " the accuracy lost relative to float64."
+                              f" Defaults to '{DEFAULT_PRECISION}'."))
+
+    parser.add_argument("--layout", metavar="L", type=str,
+                        default=DEFAULT_LAYOUT,
+                        help=("comma separated layouts to store the operands"
+                              " of every cell in: 'declared' (as listed by"
+                              " each kernel), 'element-major' (the element"
+                              " axis outermost), 'dof-major' (the element axis"
+                              " innermost) or 'element-major-padded' (with"
+                              " the innermost axis padded to 64 bytes), and"
+                              " report the fastest one. Defaults to"
+                              f" '{DEFAULT_LAYOUT}'."))
+
+    parser.add_argument("--feinsum-db", metavar="FILE", nargs="?", const="",
+                        default=None,
+                        help=("look up the transformations of the batched"
+                              " einsums in the feinsum database FILE, as built"
+                              " by 'feinsum_evaluation tune', and report the"
+                              " speedups over feinsum's default database. If"
+                              " FILE is not provided, this machine's tuning"
+                              " database is used."))
+
+    parser.add_argument("--results-db", metavar="FILE", type=str,
+                        default=DEFAULT_RESULTS_DB,
+                        help=("append the results, with all the timing samples"
+                              " and the environment, as a new run to the"
+                              " SQLite database FILE. Defaults to"
+                              f" '{DEFAULT_RESULTS_DB}'."))
+
+    parser.add_argument("--no-results-db", action="store_true",
+                        help="do not store the results.")
+
+    parser.add_argument("--baseline-run", metavar="RUN", type=int, default=None,
+                        help=("fail the run if any cell is significantly slower"
+                              " than, or uses more device memory than, in the"
+                              " run with id RUN of '--results-db'. See"
+                              " 'feinsum_evaluation runs'."))
+
+    add_slowdown_arguments(parser)
+
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv and argv[0] in COMMANDS:
+        results_db_main(argv)
+        return
+    if argv and argv[0] == "tune":
+        from feinsum_evaluation.tuning import main as tuning_main
+        tuning_main(argv[1:])
+        return
+    if argv and argv[0] == "import-times":
+        from feinsum_evaluation.import_times import main as import_times_main
+        import_times_main(argv[1:])
+        return
+    if argv and argv[0] == "time-stepping":
+        from feinsum_evaluation.time_stepping import main as time_stepping_main
+        time_stepping_main(argv[1:])
+        return
+    if argv and argv[0] == "streaming":
+        from feinsum_evaluation.streaming import main as streaming_main
+        streaming_main(argv[1:])
+        return
+
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    if args.cold_cache:
+        if not _is_cold_cache():
+            _reexec_with_cold_cache(argv)
+        import atexit
+        atexit.register(_cleanup_cold_cache)
+
+    kernel_names = (list(KERNELS)
+                    if args.kernels is None
+                    else parse_comma_separated(args.kernels))
+    actx_names = parse_comma_separated(args.actxs)
+
+    for kernel_name in kernel_names:
+        if kernel_name not in KERNELS and kernel_name not in COMPOSITE_KERNELS:
+            parser.error(f"unknown kernel '{kernel_name}', expected one of"
+                         f" {', '.join([*KERNELS, *COMPOSITE_KERNELS])}.")
+    for actx_name in actx_names:
+        if actx_name not in ACTX_CLASS_PATHS:
+            parser.error(f"unknown array context '{actx_name}', expected one of"
+                         f" {', '.join(ACTX_CLASS_PATHS)}.")
+    if args.kernels is not None:
+        for kernel_name, actx_name in itertools.product(kernel_names,
+                                                        actx_names):
+            if not is_supported(actx_name, get_kernel(kernel_name)):
+                parser.error(f"kernel '{kernel_name}' gathers through index"
+                             f" arrays, which '{actx_name}' does not support,"
+                             " expected one of"
+                             f" {', '.join(sorted(GATHER_ACTX_NAMES))}.")
+    dtypes = parse_comma_separated(args.dtype)
+    for dtype in dtypes:
+        if dtype not in PRECISIONS:
+            parser.error(f"unknown dtype '{dtype}', expected one of"
+                         f" {', '.join(PRECISIONS)}.")
+
+    layouts = parse_comma_separated(args.layout)
+    for layout in layouts:
+        if layout not in LAYOUTS:
+            parser.error(f"unknown layout '{layout}', expected one of"
+                         f" {', '.join(LAYOUTS)}.")
+    if layouts != [DEFAULT_LAYOUT]:
+        for actx_name in actx_names:
+            if actx_name not in STRIDED_LAYOUT_ACTX_NAMES:
+                parser.error(f"'--layout' is not supported by '{actx_name}',"
+                             " which copies the operands to convert them"
+                             " from their layout, expected one of"
+                             f" {', '.join(sorted(STRIDED_LAYOUT_ACTX_NAMES))}.")
+
+    if args.saturation:
+        if args.weak_scaling:
+            parser.error("'--saturation' cannot be combined with"
+                         " '--weak-scaling'.")
+        batches = get_geometric_batches(args.max_batch)
+    elif args.batches is None:
+        parser.error("'--batches' is required unless '--saturation' is"
+                     " passed.")
+    else:
+        batches = parse_comma_separated_ints(args.batches)
+
+    if args.no_results_db and args.baseline_run is not None:
+        parser.error("'--baseline-run' requires the results database.")
+
+    if args.trace is not None:
+        os.makedirs(args.trace, exist_ok=True)
+
+    feinsum_db = args.feinsum_db
+    if feinsum_db == "":
+        from feinsum_evaluation.tuning import get_default_tuning_db
+        feinsum_db = get_default_tuning_db()
+    if feinsum_db is not None and not os.path.exists(feinsum_db):
+        parser.error(f"feinsum database '{feinsum_db}' does not exist, see"
+                     " 'feinsum_evaluation tune'.")
+    actx_labels = [variant.label
+                   for variant in get_actx_variants(
+                       actx_names, feinsum_db, args.compare_fusion,
+                       args.compare_index_assumption)]
+
+    cache = None
+    if args.canonicalization_cache is not None:
+        cache = CanonicalizationCache()
+        if (args.canonicalization_cache
+                and os.path.exists(args.canonicalization_cache)):
+            cache.load(args.canonicalization_cache)
+
+    results, failures = run_sweep(
+        kernel_names=kernel_names,
+        actx_names=actx_names,
+        batches=batches,
+        nis=parse_comma_separated_ints(args.ni),
+        njs=parse_comma_separated_ints(args.nj),
+        rel_ci_width=args.rel_ci_width,
+        max_time=args.max_time,
+        profile_dir=args.trace,
+        cl_profile=args.cl_profile,
+        probe_roofline=args.roofline,
+        memory_budget=(None
+                       if args.memory_budget is None
+                       else parse_nbytes(args.memory_budget)),
+        weak_scaling=args.weak_scaling,
+        saturation_tolerance=(args.saturation_tolerance
+                              if args.saturation
+                              else None),
+        feinsum_db=feinsum_db,
+        compare_fusion=args.compare_fusion,
+        compare_index_assumption=args.compare_index_assumption,
+        dtypes=dtypes,
+        layouts=layouts,
+        verify=args.verify,
+        verify_rtol=args.verify_rtol,
+        canonicalization_cache=cache,
+        numa_parallel=args.numa_parallel)
+
+    # stored before anything is printed, so that the measurements are kept
+    # even if reporting them fails
+    failed = False
+    if not args.no_results_db:
+        failed = store_results(args.results_db, results, argv,
+                               baseline_run=args.baseline_run,
+                               alpha=args.alpha,
+                               threshold=args.threshold,
+                               memory_tolerance=args.memory_tolerance)
+
+    if args.weak_scaling:
+        print_weak_scaling_results(results)
+    elif args.saturation:
+        # the sweep stops at different batch sizes per array context
+        print_saturation_results(results, args.saturation_tolerance)
+    else:
+        print_results(results, actx_labels)
+    print_tuning_speedups(results)
+    print_fusion_speedups(results)
+    print_index_assumption_speedups(results)
+    print_precision_speedups(results)
+    print_layout_results(results)
+    print_composite_results(results)
+
+    if cache is not None:
+        print_canonicalization_cache_stats(cache)
+        if args.canonicalization_cache:
+            cache.save(args.canonicalization_cache)
+
+    if args.save_memory_baseline is not None:
+        save_memory_baseline(args.save_memory_baseline,
+                             {result.key: result.memory.peak_device_bytes
+                              for result in results
+                              if result.memory.peak_device_bytes is not None})
+
+    if args.memory_baseline is not None:
+        failed = check_memory_regressions(results, args.memory_baseline,
+                                          args.memory_tolerance) or failed
+
+    if args.compare_fusion:
+        failed = check_fusion_disabled(results) or failed
+
+    if failures:
+        print(f"{len(failures)} worker processes failed, see above.")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
+# vim: fdm=marker
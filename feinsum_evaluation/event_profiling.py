@@ -0,0 +1,149 @@
+"""
+Splits the time of a call to a compiled kernel into the time spent executing
+OpenCL kernels on the device and the host overhead of dispatching them. This
+requires the array context's queue to be created with
+:attr:`pyopencl.command_queue_properties.PROFILING_ENABLE`.
+
+.. autoclass:: KernelEventCollector
+.. autoclass:: DeviceTimeProfile
+.. autofunction:: profile_device_time
+"""
+import dataclasses as dc
+import numpy as np
+
+from time import perf_counter_ns
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class KernelEventCollector:
+    """
+    A context manager that records the events of all the OpenCL kernels
+    launched within its scope.
+
+    Both :mod:`loopy`'s generated invokers and :class:`pyopencl.Kernel` launch
+    kernels by looking up :func:`pyopencl.enqueue_nd_range_kernel` at call
+    time, hence that function is swapped for a recording wrapper within the
+    scope.
+
+    .. attribute:: events
+
+        A :class:`list` of ``(kernel_name, event)``.
+    """
+    def __init__(self) -> None:
+        self.events: List[Tuple[str, Any]] = []
+        self._orig_enqueue_nd_range_kernel = None
+
+    def __enter__(self) -> "KernelEventCollector":
+        import pyopencl as cl
+        import pyopencl._cl as _cl
+
+        orig_enqueue_nd_range_kernel = _cl.enqueue_nd_range_kernel
+
+        def enqueue_nd_range_kernel(queue, kernel, *args, **kwargs):
+            evt = orig_enqueue_nd_range_kernel(queue, kernel, *args, **kwargs)
+            self.events.append((kernel.function_name, evt))
+            return evt
+
+        self._orig_enqueue_nd_range_kernel = orig_enqueue_nd_range_kernel
+        cl.enqueue_nd_range_kernel = enqueue_nd_range_kernel
+        _cl.enqueue_nd_range_kernel = enqueue_nd_range_kernel
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        import pyopencl as cl
+        import pyopencl._cl as _cl
+
+        cl.enqueue_nd_range_kernel = self._orig_enqueue_nd_range_kernel
+        _cl.enqueue_nd_range_kernel = self._orig_enqueue_nd_range_kernel
+        self._orig_enqueue_nd_range_kernel = None
+
+
+@dc.dataclass(frozen=True)
+class DeviceTimeProfile:
+    """
+    Medians (over the profiled calls) of the time (in seconds) taken by a
+    call.
+
+    .. attribute:: wall_time
+
+        Wall time of the call, including device synchronization.
+
+    .. attribute:: device_time
+
+        Sum of the execution times of the OpenCL kernels launched by the call
+        as reported by their profiling events.
+
+    .. attribute:: nlaunches
+
+        Number of OpenCL kernels launched by the call.
+
+    .. attribute:: kernel_times
+
+        A :class:`tuple` of ``(kernel_name, time)`` with *time* being the
+        total execution time of all the launches of the kernel in a call.
+    """
+    wall_time: float
+    device_time: float
+    nlaunches: int
+    kernel_times: Tuple[Tuple[str, float], ...]
+
+    @property
+    def host_overhead(self) -> float:
+        """
+        Wall time of a call not spent executing kernels on the device.
+        """
+        return max(self.wall_time - self.device_time, 0)
+
+    @property
+    def host_overhead_fraction(self) -> float:
+        return self.host_overhead / self.wall_time
+
+
+def profile_device_time(f: Callable[..., Any],
+                        args: Tuple[Any, ...],
+                        *,
+                        synchronize: Optional[Callable[[Any], None]] = None,
+                        nsamples: int = 20) -> DeviceTimeProfile:
+    """
+    Returns the :class:`DeviceTimeProfile` of ``f(*args)``. *f* is expected
+    to have been called before to exclude the compilation costs.
+    """
+    wall_times = []
+    device_times = []
+    nlaunches = []
+    kernel_times = {}
+
+    for isample in range(nsamples):
+        with KernelEventCollector() as collector:
+            t_start = perf_counter_ns()
+            result = f(*args)
+            if synchronize is not None:
+                synchronize(result)
+            t_end = perf_counter_ns()
+
+        wall_times.append((t_end - t_start) * 1e-9)
+        nlaunches.append(len(collector.events))
+
+        sample_kernel_times = {}
+        for name, evt in collector.events:
+            evt.wait()
+            sample_kernel_times[name] = (sample_kernel_times.get(name, 0)
+                                         + (evt.profile.end
+                                            - evt.profile.start) * 1e-9)
+
+        device_times.append(sum(sample_kernel_times.values()))
+        for name, time in sample_kernel_times.items():
+            kernel_times.setdefault(name, [0] * isample).append(time)
+        for times in kernel_times.values():
+            if len(times) == isample:
+                times.append(0)
+
+    return DeviceTimeProfile(
+        wall_time=float(np.median(wall_times)),
+        device_time=float(np.median(device_times)),
+        nlaunches=int(np.median(nlaunches)),
+        kernel_times=tuple(sorted(((name, float(np.median(times)))
+                                   for name, times in kernel_times.items()),
+                                  key=lambda k: -k[1])))
+
+# vim: fdm=marker
@@ -0,0 +1,239 @@
+"""
+Measures the time spent importing the CLI and the backends of each array
+context, as reported by ``python -X importtime``, so that regressions in the
+startup time of the suite are caught.
+
+Every measurement is made in a fresh interpreter. Only the imports made by
+the measured statement are accounted for, i.e. the interpreter's own
+startup imports are excluded from :attr:`ImportTime.import_time`, but not
+from :attr:`ImportTime.wall_time`.
+
+.. autoclass:: ImportTime
+.. autofunction:: parse_importtime
+.. autofunction:: measure_import_time
+.. autofunction:: get_import_targets
+.. autofunction:: main
+"""
+import argparse
+import dataclasses as dc
+import subprocess
+import sys
+import numpy as np
+
+from time import perf_counter_ns
+from typing import Dict, List, Optional, Sequence, Tuple
+from tabulate import tabulate
+
+from feinsum_evaluation.utils import ACTX_CLASS_PATHS, parse_comma_separated
+
+
+# written to stderr right before the measured statement to tell its imports
+# apart from the ones of the interpreter's startup
+_MARKER = "feinsum_evaluation: start of the measured imports"
+
+# modules that the array contexts only import once instantiated
+_ACTX_BACKEND_MODULES = {
+    "pyopencl": ("pyopencl", "pyopencl.array"),
+    "jax:nojit": ("jax", "jax.numpy"),
+    "jax:jit": ("jax", "jax.numpy", "pytato"),
+    "pytato:batched_einsum": ("pyopencl", "pyopencl.array", "pytato",
+                              "loopy", "feinsum"),
+    "numpy": (),
+}
+
+
+@dc.dataclass(frozen=True)
+class ImportTime:
+    """
+    .. attribute:: target
+
+        Name of the measured statement, see :func:`get_import_targets`.
+
+    .. attribute:: import_time
+
+        Median over the runs of the time (in seconds) spent in the top-level
+        imports of the statement.
+
+    .. attribute:: wall_time
+
+        Median over the runs of the wall time (in seconds) of the
+        interpreter, including its startup.
+
+    .. attribute:: slowest_modules
+
+        ``(module, self_time)`` of the modules with the largest median
+        self time (in seconds), i.e. excluding the time of their own
+        imports, in decreasing order.
+
+    .. attribute:: error
+
+        If the statement failed, the last line of its traceback. All the
+        timings are *None* then.
+    """
+    target: str
+    import_time: Optional[float]
+    wall_time: Optional[float]
+    slowest_modules: Tuple[Tuple[str, float], ...]
+    error: Optional[str] = None
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Returns the total time (in seconds) of the top-level imports and the
+    self time (in seconds) of every imported module as logged to *stderr*
+    by ``python -X importtime`` after the statement's start marker.
+    """
+    _, _, stderr = stderr.rpartition(_MARKER)
+
+    total = 0.
+    self_times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # the header line
+            continue
+
+        self_us, cumulative_us, name = fields
+        # nested imports are indented by two spaces per level
+        if not name[1:].startswith(" "):
+            total += int(cumulative_us) * 1e-6
+        self_times[name.strip()] = int(self_us) * 1e-6
+
+    return total, self_times
+
+
+def _run_importtime(statement: str) -> Tuple[float, str, int]:
+    code = (f"import sys; sys.stderr.write({_MARKER!r} + '\\n');"
+            f" sys.stderr.flush()\n{statement}")
+    t_start = perf_counter_ns()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          text=True)
+    wall_time = (perf_counter_ns() - t_start) * 1e-9
+    return wall_time, proc.stderr, proc.returncode
+
+
+def measure_import_time(target: str, statement: str, *,
+                        nruns: int = 5, nslowest: int = 5) -> ImportTime:
+    """
+    Returns the :class:`ImportTime` of running *statement* in *nruns* fresh
+    interpreters. An initial run, which might write the bytecode caches, is
+    discarded.
+    """
+    _, stderr, returncode = _run_importtime(statement)
+    if returncode != 0:
+        lines = stderr.strip().splitlines()
+        return ImportTime(target, None, None, (),
+                          error=lines[-1] if lines else f"exit {returncode}")
+
+    import_times = []
+    wall_times = []
+    module_self_times: Dict[str, List[float]] = {}
+    for _ in range(nruns):
+        wall_time, stderr, _ = _run_importtime(statement)
+        import_time, self_times = parse_importtime(stderr)
+        import_times.append(import_time)
+        wall_times.append(wall_time)
+        for module, self_time in self_times.items():
+            module_self_times.setdefault(module, []).append(self_time)
+
+    slowest_modules = sorted(
+        ((module, float(np.median(self_times)))
+         for module, self_times in module_self_times.items()),
+        key=lambda module_time: -module_time[1])[:nslowest]
+
+    return ImportTime(target,
+                      import_time=float(np.median(import_times)),
+                      wall_time=float(np.median(wall_times)),
+                      slowest_modules=tuple(slowest_modules))
+
+
+def get_import_targets(actx_names: Sequence[str]) -> Dict[str, str]:
+    """
+    Returns a mapping from the names of the measured targets to the
+    statements measured for them: the import of the CLI, a call to the CLI
+    with ``--help`` and, per array context in *actx_names*, the lookup of its
+    type along with the import of the backends it instantiates.
+    """
+    targets = {
+        "cli": "import feinsum_evaluation.driver",
+        "cli --help": ("from feinsum_evaluation.driver import main\n"
+                       "try:\n"
+                       "    main(['--help'])\n"
+                       "except SystemExit:\n"
+                       "    pass"),
+    }
+    for actx_name in actx_names:
+        statement = ("from feinsum_evaluation.utils import get_actx_class\n"
+                     f"get_actx_class({actx_name!r})")
+        for module in _ACTX_BACKEND_MODULES[actx_name]:
+            statement += f"\nimport {module}"
+        targets[f"actx: {actx_name}"] = statement
+
+    return targets
+
+
+def print_import_times(import_times: Sequence[ImportTime]) -> None:
+    rows = []
+    for result in import_times:
+        if result.error is not None:
+            rows.append([result.target, "n/a", "n/a", result.error])
+        else:
+            rows.append([
+                result.target,
+                f"{result.import_time * 1e3:.1f}",
+                f"{result.wall_time * 1e3:.1f}",
+                ", ".join(f"{module} ({self_time * 1e3:.1f})"
+                          for module, self_time in result.slowest_modules)])
+
+    print(tabulate(rows,
+                   headers=["Target", "Imports [ms]", "Wall [ms]",
+                            "Slowest modules (self) [ms]"],
+                   tablefmt="fancy_grid"))
+
+
+def main(argv: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="feinsum_evaluation import-times",
+        description=("Measure the import time of the CLI and of each array"
+                     " context's backends via 'python -X importtime'"),
+    )
+    parser.add_argument("--actxs", metavar="A", type=str,
+                        default=",".join(ACTX_CLASS_PATHS),
+                        help=("comma separated names of the array contexts"
+                              " whose backends are measured. Defaults to all"
+                              " of them."))
+    parser.add_argument("--runs", metavar="N", type=int, default=5,
+                        help="number of fresh interpreters per target.")
+    parser.add_argument("--slowest", metavar="N", type=int, default=3,
+                        help="number of slowest modules reported per target.")
+    parser.add_argument("--max-cli-import-time", metavar="SECONDS",
+                        type=float, default=None,
+                        help=("fail if importing the CLI takes longer than"
+                              " SECONDS."))
+
+    args = parser.parse_args(argv)
+
+    actx_names = parse_comma_separated(args.actxs)
+    for actx_name in actx_names:
+        if actx_name not in ACTX_CLASS_PATHS:
+            parser.error(f"unknown array context '{actx_name}', expected one of"
+                         f" {', '.join(ACTX_CLASS_PATHS)}.")
+
+    import_times = [measure_import_time(target, statement,
+                                        nruns=args.runs,
+                                        nslowest=args.slowest)
+                    for target, statement in get_import_targets(
+                        actx_names).items()]
+    print_import_times(import_times)
+
+    if args.max_cli_import_time is not None:
+        cli_time, = [result.import_time
+                     for result in import_times if result.target == "cli"]
+        if cli_time is None or cli_time > args.max_cli_import_time:
+            print(f"Importing the CLI exceeds {args.max_cli_import_time} s.")
+            sys.exit(1)
+
+# vim: fdm=marker
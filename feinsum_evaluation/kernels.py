@@ -0,0 +1,973 @@
+"""
+Registry of the DG-kernels benchmarked by :mod:`feinsum_evaluation.driver`.
+
+A new kernel is added to the suite by describing its operands via
+:class:`Operand` and appending a :class:`DGKernel` to :data:`KERNELS`.
+
+.. autoclass:: Operand
+.. autoclass:: DGKernel
+.. autoclass:: CompositeKernel
+.. autoclass:: InputPool
+.. autodata:: NELS
+.. autofunction:: get_nel
+.. autofunction:: get_axis_lengths
+.. autofunction:: get_einsum_flop_count
+.. autofunction:: get_kernel
+"""
+import dataclasses as dc
+import itertools
+import math
+import numpy as np
+
+from functools import partial
+
+from pytools.obj_array import make_obj_array
+from feinsum_evaluation.metadata import NamedAxis
+from feinsum_evaluation.connectivity import (NFACES, INDEX_DTYPE,
+                                             ELEMENT_ORDERINGS,
+                                             get_face_gather_connectivity)
+from feinsum_evaluation.device_rng import (get_stream_start, generate_uniform,
+                                           generate_uniform_slice)
+from feinsum_evaluation.precision import (PRECISIONS, DEFAULT_PRECISION,
+                                          Precision)
+from feinsum_evaluation.layouts import LAYOUTS, DEFAULT_LAYOUT, Layout
+from feinsum_evaluation.utils import is_numpy_actx
+from typing import (TYPE_CHECKING, Any, Callable, Dict, FrozenSet, List,
+                    Mapping, Optional, Sequence, Tuple, Union)
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext, ArrayT
+
+
+DIM = 3
+
+
+@dc.dataclass(frozen=True)
+class Operand:
+    """
+    An argument of a :class:`DGKernel`.
+
+    .. attribute:: name
+    .. attribute:: axes
+
+        Names of the operand's axes. The i-th axis of the operand is tagged
+        with ``NamedAxis(axes[i])`` and its length is looked up in the
+        mapping returned by :func:`get_axis_lengths`.
+
+    .. attribute:: is_batched
+
+        If *True*, the kernel accepts an object array of *nbatch* such
+        operands.
+
+    .. attribute:: dtype
+
+        The dtype of the operand, for ex. of an index array. If *None*, the
+        operand is of the precision the kernel is run in, see
+        :meth:`get_dtype`.
+
+    .. automethod:: get_dtype
+    """
+    name: str
+    axes: Tuple[str, ...]
+    is_batched: bool = False
+    dtype: Optional[Any] = None
+
+    def get_dtype(self, precision: Precision) -> "np.dtype[Any]":
+        """
+        Returns the dtype of the operand when the kernel is run in
+        *precision*.
+        """
+        if self.dtype is not None:
+            return np.dtype(self.dtype)
+        return precision.get_dtype(self.is_batched)
+
+
+def get_einsum_flop_count(subscript: str,
+                          index_lens: Mapping[str, int]) -> int:
+    """
+    Returns the number of floating point operations needed to evaluate the
+    einsum *subscript* as a sequence of pairwise contractions in the cheapest
+    order. A contraction over an iteration space of *n* points that produces
+    *m* entries costs *n* multiplications and *n - m* additions.
+
+    :arg index_lens: Mapping from the indices in *subscript* to their lengths.
+    """
+    inputs, output = subscript.split("->")
+
+    def _get_size(indices: FrozenSet[str]) -> int:
+        return math.prod(index_lens[idx] for idx in indices)
+
+    def _get_flop_count(operands: List[FrozenSet[str]]) -> int:
+        if len(operands) == 1:
+            if operands[0] == frozenset(output):
+                return 0
+            # only a reduction remains
+            return _get_size(operands[0]) - _get_size(frozenset(output))
+
+        min_flop_count = None
+        for i, j in itertools.combinations(range(len(operands)), 2):
+            rest = [op for k, op in enumerate(operands) if k not in (i, j)]
+            needed_indices = frozenset(output).union(*rest)
+            iteration_space = operands[i] | operands[j]
+            result = iteration_space & needed_indices
+            flop_count = (2 * _get_size(iteration_space) - _get_size(result)
+                          + _get_flop_count([*rest, result]))
+            if min_flop_count is None or flop_count < min_flop_count:
+                min_flop_count = flop_count
+
+        return min_flop_count
+
+    return _get_flop_count([frozenset(operand)
+                            for operand in inputs.split(",")])
+
+
+def _get_operands_nbytes(knl: "AnyKernel",
+                         operands: Sequence[Operand],
+                         nbatch: int,
+                         axis_lens: Mapping[str, int],
+                         precision: Precision) -> int:
+    nbytes = 0
+    for operand in operands:
+        operand_size = math.prod(knl.get_operand_shape(operand, axis_lens))
+        nbytes += ((nbatch * operand_size
+                    if operand.is_batched
+                    else operand_size)
+                   * operand.get_dtype(precision).itemsize)
+
+    return nbytes
+
+
+def _get_random_input_storage(knl: "DGKernel",
+                              operand: Operand,
+                              axis_lens: Mapping[str, int],
+                              dtype: "np.dtype[Any]"
+                              ) -> Tuple[Tuple[int, ...], Optional[int], int]:
+    # Returns the storage shape of *operand*, the length of its innermost
+    # axis before padding, or *None* if it is not padded, and the number of
+    # counters drawn per batch member. The counters do not depend on the
+    # padding, so that the inputs are identical in every precision.
+    shape = knl.get_operand_shape(operand, axis_lens)
+    storage_shape = knl.layout.get_storage_shape(operand.axes, shape, dtype)
+    if not knl.layout.is_padded(operand.axes, shape, dtype):
+        return storage_shape, None, math.prod(storage_shape)
+
+    unpadded_len = shape[knl.layout.get_axis_order(operand.axes)[-1]]
+    return (storage_shape, unpadded_len,
+            math.prod(storage_shape[:-1]) * unpadded_len)
+
+
+def generate_random_inputs(actx: "ArrayContext",
+                           knl: "DGKernel",
+                           nbatch: int,
+                           axis_lens: Mapping[str, int],
+                           *, seed: int = 0,
+                           precision: Precision = PRECISIONS[DEFAULT_PRECISION],
+                           fixed_inputs: Optional[Mapping[str, np.ndarray]] = None,
+                           ) -> Tuple[Any, ...]:
+    """
+    Returns the arguments to *knl* populated on *actx*'s device with
+    uniformly distributed random numbers via
+    :func:`~feinsum_evaluation.device_rng.generate_uniform`. Every operand
+    is drawn from its own stream of *seed*, and the batch members of a
+    batched operand from consecutive chunks of the stream. Hence the inputs
+    are identical across array contexts and the inputs for *nbatch* batch
+    members are a prefix of the ones for more batch members, see
+    :class:`InputPool`.
+
+    The batched operands are of *precision*'s storage type and the remaining
+    ones of its compute type, see
+    :class:`~feinsum_evaluation.precision.Precision`. The operands are
+    generated as stored in the kernel's :attr:`DGKernel.layout`, hence the
+    inputs of different layouts differ. The padding of a layout is zero and
+    does not change the remaining entries, which are hence identical in
+    every precision.
+
+    On a :class:`~feinsum_evaluation.numpy_actx.NumpyReferenceArrayContext`,
+    the batched operands are stacked along a leading axis, see
+    :attr:`DGKernel.compute_stacked`.
+
+    :arg fixed_inputs: A mapping from the names of the operands that are not
+        drawn at random, for ex. index arrays, to their values on the host,
+        which are transferred to the device as is.
+    """
+    if fixed_inputs is None:
+        fixed_inputs = {}
+
+    args = []
+    for ioperand, operand in enumerate(knl.operands):
+        dtype = operand.get_dtype(precision)
+        shape, unpadded_len, size = _get_random_input_storage(
+            knl, operand, axis_lens, dtype)
+        start = get_stream_start(seed, ioperand)
+        if operand.name in fixed_inputs:
+            ary = fixed_inputs[operand.name]
+            assert ary.dtype == dtype
+            args.append(actx.from_numpy(knl.layout.to_storage(ary,
+                                                              operand.axes)))
+        elif operand.is_batched and is_numpy_actx(actx):
+            args.append(generate_uniform(actx, (nbatch, *shape), start=start,
+                                         dtype=dtype,
+                                         unpadded_len=unpadded_len))
+        elif operand.is_batched:
+            args.append(make_obj_array([
+                generate_uniform(actx, shape, start=start + ibatch * size,
+                                 dtype=dtype, unpadded_len=unpadded_len)
+                for ibatch in range(nbatch)]))
+        else:
+            args.append(generate_uniform(actx, shape, start=start,
+                                         dtype=dtype,
+                                         unpadded_len=unpadded_len))
+
+    return tuple(args)
+
+
+def generate_random_input_slice(knl: "DGKernel",
+                                ioperand: int,
+                                ibatch: int,
+                                axis_lens: Mapping[str, int],
+                                index: Tuple[slice, ...],
+                                *, seed: int = 0,
+                                precision: Precision = PRECISIONS[
+                                    DEFAULT_PRECISION]) -> np.ndarray:
+    """
+    Returns the entries at *index* of the *ibatch*-th batch member of the
+    *ioperand*-th argument returned by :func:`generate_random_inputs` as a
+    :class:`numpy.ndarray`, without generating the remaining entries. For an
+    operand that is not batched, *ibatch* must be 0.
+    """
+    operand = knl.operands[ioperand]
+    if not (operand.is_batched or ibatch == 0):
+        raise ValueError(f"Operand '{operand.name}' is not batched.")
+
+    dtype = operand.get_dtype(precision)
+    shape, unpadded_len, size = _get_random_input_storage(
+        knl, operand, axis_lens, dtype)
+    return generate_uniform_slice(
+        shape, index,
+        start=get_stream_start(seed, ioperand) + ibatch * size,
+        dtype=dtype, unpadded_len=unpadded_len)
+
+
+def generate_face_gather_inputs(actx: "ArrayContext",
+                                knl: "DGKernel",
+                                nbatch: int,
+                                axis_lens: Mapping[str, int],
+                                *, seed: int = 0,
+                                precision: Precision = PRECISIONS[
+                                    DEFAULT_PRECISION],
+                                ordering: str) -> Tuple[Any, ...]:
+    """
+    Returns the arguments to a face gather kernel, whose index arrays are the
+    synthetic connectivity of
+    :func:`~feinsum_evaluation.connectivity.get_face_gather_connectivity`
+    with the elements numbered in *ordering*. The remaining operands are
+    drawn at random as in :func:`generate_random_inputs`.
+    """
+    connectivity = get_face_gather_connectivity(
+        axis_lens["element"], axis_lens["dof"], axis_lens["facedof"],
+        ordering=ordering, seed=seed)
+    return generate_random_inputs(actx, knl, nbatch, axis_lens,
+                                  seed=seed, precision=precision,
+                                  fixed_inputs=connectivity)
+
+
+class InputPool:
+    """
+    Inputs to a :class:`DGKernel` for up to *max_nbatch* batch members,
+    shared by all the batch sizes of a sweep. The inputs are generated on
+    demand for the largest batch size requested so far, and regenerated once
+    a larger one is requested, so that a sweep that stops early, for ex. once
+    its throughput saturates, never allocates inputs for *max_nbatch* batch
+    members. The inputs for fewer batch members are prefixes of the ones for
+    more, see :func:`generate_random_inputs`, hence they do not change as the
+    pool grows.
+
+    .. attribute:: nbatch_allocated
+
+        Number of batch members the pool currently holds inputs for.
+
+    .. automethod:: get_inputs
+    """
+    def __init__(self, actx: "ArrayContext", knl: "DGKernel", max_nbatch: int,
+                 axis_lens: Mapping[str, int], *, seed: int = 0,
+                 precision: Precision = PRECISIONS[DEFAULT_PRECISION],
+                 ) -> None:
+        self.actx = actx
+        self.knl = knl
+        self.max_nbatch = max_nbatch
+        self.axis_lens = axis_lens
+        self.seed = seed
+        self.precision = precision
+        self.nbatch_allocated = 0
+        self._args: Optional[Tuple[Any, ...]] = None
+
+    def _grow(self, nbatch: int) -> None:
+        # release the current inputs before allocating the larger ones
+        self._args = None
+        self.nbatch_allocated = 0
+        self._args = self.knl.input_generator(self.actx, self.knl, nbatch,
+                                              self.axis_lens, seed=self.seed,
+                                              precision=self.precision)
+        self.nbatch_allocated = nbatch
+
+    def get_inputs(self, nbatch: int) -> Tuple[Any, ...]:
+        """
+        Returns the arguments to the kernel for *nbatch* batch members, i.e.
+        the first *nbatch* members of every batched operand, without copying
+        them. Grows the pool to *nbatch* batch members first if it holds
+        fewer.
+        """
+        if nbatch > self.max_nbatch:
+            raise ValueError(f"Pool holds inputs for up to {self.max_nbatch}"
+                             f" batch members, requested {nbatch}.")
+
+        if nbatch > self.nbatch_allocated:
+            self._grow(nbatch)
+
+        assert self._args is not None
+        return tuple(arg[:nbatch] if operand.is_batched else arg
+                     for operand, arg in zip(self.knl.operands, self._args,
+                                             strict=True))
+
+
+@dc.dataclass(frozen=True)
+class DGKernel:
+    """
+    .. attribute:: name
+    .. attribute:: subscript
+
+        The einsum subscript computed for every batch member.
+
+    .. attribute:: operands
+
+        A :class:`tuple` of :class:`Operand` in the order in which they are
+        passed to :attr:`compute`.
+
+    .. attribute:: index_axes
+
+        A mapping from the indices of :attr:`subscript` to the axis names
+        whose lengths they iterate over.
+
+    .. attribute:: batched_inputs
+
+        Positions of the inputs of :attr:`subscript` that differ across the
+        batch members. The remaining inputs are shared by all of them.
+
+    .. attribute:: compute
+
+        A callable with the signature ``compute(actx, *args)`` returning an
+        object array of the *nbatch* results. The arguments are already tagged
+        as per :attr:`operands`.
+
+    .. attribute:: compute_stacked
+
+        A callable with the signature ``compute_stacked(actx, *args)``
+        returning an object array of the *nbatch* results, where each
+        batched operand is passed as a single array with the batch members
+        stacked along its leading axis. This lets the kernel be evaluated as
+        one contraction per batch rather than *nbatch* of them, and is used
+        on :class:`~feinsum_evaluation.numpy_actx.NumpyReferenceArrayContext`.
+        If *None*, :attr:`compute` is used instead.
+
+    .. attribute:: input_generator
+
+        A callable with the signature
+        ``input_generator(actx, knl, nbatch, axis_lens, *, seed, precision)``
+        returning the arguments to the kernel in the
+        :class:`~feinsum_evaluation.precision.Precision` *precision*,
+        deterministically in *seed*.
+
+    .. attribute:: extra_flops
+
+        A callable with the signature ``extra_flops(axis_lens)`` returning
+        the number of floating point operations performed by a batch member
+        outside of the einsum, for ex. to compute one of its operands.
+
+    .. attribute:: layout
+
+        The :class:`~feinsum_evaluation.layouts.Layout` the arguments and the
+        outputs of the kernel are stored in. :attr:`compute` and
+        :attr:`compute_stacked` are always passed the arguments with their
+        axes as declared in :attr:`operands`, and the conversion from and to
+        the stored layout is traced along with them.
+
+    .. automethod:: with_layout
+    """
+    name: str
+    subscript: str
+    operands: Tuple[Operand, ...]
+    index_axes: Mapping[str, str]
+    batched_inputs: FrozenSet[int]
+    compute: Callable[..., np.ndarray]
+    compute_stacked: Optional[Callable[..., np.ndarray]] = None
+    input_generator: Callable[..., Tuple[Any, ...]] = generate_random_inputs
+    extra_flops: Callable[[Mapping[str, int]], int] = lambda axis_lens: 0
+    layout: Layout = LAYOUTS[DEFAULT_LAYOUT]
+
+    def with_layout(self, layout: Layout) -> "DGKernel":
+        """
+        Returns a copy of the kernel with its arguments and outputs stored
+        in *layout*.
+        """
+        return dc.replace(self, layout=layout)
+
+    @property
+    def axes(self) -> FrozenSet[str]:
+        return frozenset(axis
+                         for operand in self.operands
+                         for axis in operand.axes)
+
+    @property
+    def uses_nj(self) -> bool:
+        return "facedof" in self.axes
+
+    @property
+    def uses_gathers(self) -> bool:
+        """
+        *True* if the kernel gathers its operands through index arrays, which
+        only the array contexts in
+        :data:`~feinsum_evaluation.utils.GATHER_ACTX_NAMES` support.
+        """
+        return any(operand.dtype is not None
+                   and np.issubdtype(operand.dtype, np.integer)
+                   for operand in self.operands)
+
+    def get_operand_shape(self, operand: Operand,
+                          axis_lens: Mapping[str, int]) -> Tuple[int, ...]:
+        return tuple(axis_lens[axis] for axis in operand.axes)
+
+    def get_input_shapes(self, axis_lens: Mapping[str, int]
+                         ) -> List[Tuple[int, ...]]:
+        """
+        Returns the shapes of the inputs of :attr:`subscript`.
+        """
+        inputs = self.subscript.split("->")[0].split(",")
+        return [tuple(axis_lens[self.index_axes[idx]] for idx in indices)
+                for indices in inputs]
+
+    @property
+    def output_axes(self) -> Tuple[str, ...]:
+        output = self.subscript.split("->")[1]
+        return tuple(self.index_axes[idx] for idx in output)
+
+    def get_output_shape(self,
+                         axis_lens: Mapping[str, int]) -> Tuple[int, ...]:
+        return tuple(axis_lens[axis] for axis in self.output_axes)
+
+    def get_flop_count(self, nbatch: int, axis_lens: Mapping[str, int]) -> int:
+        """
+        Returns the number of floating point operations performed by a call
+        to the kernel with *nbatch* batch members.
+        """
+        index_lens = {idx: axis_lens[axis]
+                      for idx, axis in self.index_axes.items()}
+        return nbatch * (get_einsum_flop_count(self.subscript, index_lens)
+                         + self.extra_flops(axis_lens))
+
+    def get_min_bytes_moved(self, nbatch: int, axis_lens: Mapping[str, int],
+                            precision: Precision = PRECISIONS[
+                                DEFAULT_PRECISION]) -> int:
+        """
+        Returns the number of bytes moved by a call to the kernel with
+        *nbatch* batch members in *precision* if every operand is read exactly
+        once and every output is written exactly once.
+        """
+        return (nbatch * math.prod(self.get_output_shape(axis_lens))
+                * precision.output_dtype.itemsize
+                + _get_operands_nbytes(self, self.operands, nbatch, axis_lens,
+                                       precision))
+
+    def get_working_set_size(self, nbatch: int, axis_lens: Mapping[str, int],
+                             precision: Precision = PRECISIONS[
+                                 DEFAULT_PRECISION]) -> int:
+        """
+        Returns the number of bytes occupied by the operands and the outputs
+        of a call to the kernel with *nbatch* batch members in *precision*.
+        """
+        return self.get_min_bytes_moved(nbatch, axis_lens, precision)
+
+    def compile(self, actx: "ArrayContext",
+                axis_lens: Mapping[str, int]) -> Callable[..., np.ndarray]:
+        """
+        Returns the kernel compiled by *actx* for arguments with axes of
+        *axis_lens*.
+        """
+        return actx.compile(lambda *args: self(actx, *args,
+                                               axis_lens=axis_lens))
+
+    def __call__(self, actx: "ArrayContext", *args: Any,
+                 axis_lens: Mapping[str, int]) -> np.ndarray:
+        """
+        Returns an object array of the outputs of the batch members stored in
+        :attr:`layout` for the arguments *args* stored in :attr:`layout`.
+
+        :arg axis_lens: As returned by :func:`get_axis_lengths`, needed to
+            strip the padding of the stored arguments.
+        """
+        def _from_storage(operand: Operand, ary: Any) -> Any:
+            return self.layout.from_storage(
+                actx, ary, operand.axes,
+                self.get_operand_shape(operand, axis_lens))
+
+        if is_numpy_actx(actx):
+            # eager evaluation on the host: the tags have no consumers
+            compute = (self.compute
+                       if self.compute_stacked is None
+                       else self.compute_stacked)
+            logical_args = [
+                [_from_storage(operand, ary) for ary in arg]
+                if operand.is_batched and self.compute_stacked is None
+                else _from_storage(operand, arg)
+                for operand, arg in zip(self.operands, args, strict=True)]
+        else:
+            from arraycontext import tag_axes
+
+            compute = self.compute
+            logical_args = []
+            for operand, arg in zip(self.operands, args, strict=True):
+                shape = self.get_operand_shape(operand, axis_lens)
+                storage_axes = [operand.axes[iaxis]
+                                for iaxis in self.layout.get_axis_order(
+                                    operand.axes)]
+                dtype = (arg[0] if operand.is_batched else arg).dtype
+                if self.layout.is_padded(operand.axes, shape, dtype):
+                    # the padded axis is longer than the axis it stores
+                    storage_axes = storage_axes[:-1]
+                tags = {iaxis: NamedAxis(axis)
+                        for iaxis, axis in enumerate(storage_axes)}
+                if operand.is_batched:
+                    logical_args.append([
+                        _from_storage(operand, tag_axes(actx, tags, ary))
+                        for ary in arg])
+                else:
+                    logical_args.append(
+                        _from_storage(operand, tag_axes(actx, tags, arg)))
+
+        return make_obj_array([
+            self.layout.to_output_storage(actx, result, self.output_axes)
+            for result in compute(actx, *logical_args)])
+
+
+@dc.dataclass(frozen=True)
+class CompositeKernel:
+    """
+    Several :class:`DGKernel` evaluated back to back on shared arguments, as
+    in the right-hand side of a DG operator. The operands of the parts that
+    are equal, i.e. that have the same name, axes and type, are passed once
+    and shared by the parts.
+
+    Provides the interface of :class:`DGKernel` used by the benchmarks. A
+    call returns the outputs of the batch members of every part, in the order
+    of :attr:`parts`.
+
+    .. attribute:: name
+    .. attribute:: parts
+
+        A :class:`tuple` of the :class:`DGKernel` evaluated by the kernel.
+
+    .. attribute:: compile_separately
+
+        If *True*, each part is compiled as a program of its own. Otherwise,
+        all the parts are traced into a single program, so that the array
+        context may fuse the loops of the parts and their reads of the shared
+        operands.
+
+    .. attribute:: input_generator
+    .. attribute:: layout
+
+        See :class:`DGKernel`.
+
+    .. automethod:: with_layout
+    .. automethod:: get_flop_count
+    .. automethod:: get_min_bytes_moved
+    .. automethod:: get_working_set_size
+    .. automethod:: compile
+    """
+    name: str
+    parts: Tuple[DGKernel, ...]
+    compile_separately: bool = False
+    input_generator: Callable[..., Tuple[Any, ...]] = generate_random_inputs
+    layout: Layout = LAYOUTS[DEFAULT_LAYOUT]
+
+    @property
+    def operands(self) -> Tuple[Operand, ...]:
+        return tuple(dict.fromkeys(operand
+                                   for part in self.parts
+                                   for operand in part.operands))
+
+    @property
+    def axes(self) -> FrozenSet[str]:
+        return frozenset().union(*(part.axes for part in self.parts))
+
+    @property
+    def uses_nj(self) -> bool:
+        return any(part.uses_nj for part in self.parts)
+
+    @property
+    def uses_gathers(self) -> bool:
+        return any(part.uses_gathers for part in self.parts)
+
+    def get_operand_shape(self, operand: Operand,
+                          axis_lens: Mapping[str, int]) -> Tuple[int, ...]:
+        return tuple(axis_lens[axis] for axis in operand.axes)
+
+    def with_layout(self, layout: Layout) -> "CompositeKernel":
+        """
+        Returns a copy of the kernel with the arguments and the outputs of all
+        its parts stored in *layout*.
+        """
+        return dc.replace(self,
+                          parts=tuple(part.with_layout(layout)
+                                      for part in self.parts),
+                          layout=layout)
+
+    def get_flop_count(self, nbatch: int, axis_lens: Mapping[str, int]) -> int:
+        return sum(part.get_flop_count(nbatch, axis_lens)
+                   for part in self.parts)
+
+    def get_min_bytes_moved(self, nbatch: int, axis_lens: Mapping[str, int],
+                            precision: Precision = PRECISIONS[
+                                DEFAULT_PRECISION]) -> int:
+        """
+        Returns the number of bytes moved by a call to the kernel if every
+        compiled program reads each of its operands exactly once and writes
+        each of its outputs exactly once. Hence, if :attr:`compile_separately`
+        is *True*, the shared operands are counted once per part.
+        """
+        if self.compile_separately:
+            return sum(part.get_min_bytes_moved(nbatch, axis_lens, precision)
+                       for part in self.parts)
+        else:
+            return self.get_working_set_size(nbatch, axis_lens, precision)
+
+    def get_working_set_size(self, nbatch: int, axis_lens: Mapping[str, int],
+                             precision: Precision = PRECISIONS[
+                                 DEFAULT_PRECISION]) -> int:
+        """
+        See :meth:`DGKernel.get_working_set_size`.
+        """
+        return (sum(nbatch * math.prod(part.get_output_shape(axis_lens))
+                    * precision.output_dtype.itemsize
+                    for part in self.parts)
+                + _get_operands_nbytes(self, self.operands, nbatch, axis_lens,
+                                       precision))
+
+    def _get_part_args(self, part: DGKernel,
+                       args: Sequence[Any]) -> Tuple[Any, ...]:
+        operand_to_arg = dict(zip(self.operands, args, strict=True))
+        return tuple(operand_to_arg[operand] for operand in part.operands)
+
+    def __call__(self, actx: "ArrayContext", *args: Any,
+                 axis_lens: Mapping[str, int]) -> np.ndarray:
+        return make_obj_array([
+            result
+            for part in self.parts
+            for result in part(actx, *self._get_part_args(part, args),
+                               axis_lens=axis_lens)])
+
+    def compile(self, actx: "ArrayContext",
+                axis_lens: Mapping[str, int]) -> Callable[..., np.ndarray]:
+        """
+        See :meth:`DGKernel.compile`.
+        """
+        if not self.compile_separately:
+            return actx.compile(lambda *args: self(actx, *args,
+                                                   axis_lens=axis_lens))
+
+        compiled_parts = [(part, part.compile(actx, axis_lens))
+                          for part in self.parts]
+
+        def _call_parts(*args: Any) -> np.ndarray:
+            return make_obj_array([
+                result
+                for part, compiled_part in compiled_parts
+                for result in compiled_part(*self._get_part_args(part, args))])
+
+        return _call_parts
+
+
+AnyKernel = Union[DGKernel, CompositeKernel]
+
+
+#: Mapping from the #volume-dofs per element to the number of elements the
+#: kernels are benchmarked with by default, see :func:`get_nel`.
+NELS: Dict[int, int] = {
+    4: 200_000,
+    10: 200_000,
+    20: 100_000,
+    35: 80_000,
+}
+
+
+def get_nel(ni: int) -> int:
+    try:
+        return NELS[ni]
+    except KeyError:
+        raise NotImplementedError(
+            f"No default element count for ni={ni}, expected one of"
+            f" {', '.join(map(str, NELS))}.") from None
+
+
+def get_axis_lengths(*, ni: int, nj: Optional[int], nel: int) -> Dict[str, int]:
+    """
+    Returns a mapping from the axis names used in :attr:`Operand.axes` to
+    their lengths.
+    """
+    axis_lens = {
+        "element": nel,
+        "dof": ni,
+        "voldof": ni,
+        "face": NFACES,
+        "ambient_dim": DIM,
+        "topo_dim": DIM,
+    }
+    if nj is not None:
+        axis_lens["facedof"] = nj
+
+    return axis_lens
+
+
+# {{{ kernels
+
+def _ifj_fe_fej_to_ei(actx: "ArrayContext",
+                      flux_terms_p: Tuple["ArrayT", ...],
+                      flux_terms_n: Tuple["ArrayT", ...],
+                      ref_mat: "ArrayT",
+                      jac: "ArrayT") -> np.ndarray:
+    sub_results = [
+        actx.einsum("ifj,fe,fej->ei",
+                    ref_mat, jac, 0.5 * (flux_n + flux_p))
+        for flux_p, flux_n in zip(flux_terms_p, flux_terms_n, strict=True)
+    ]
+
+    return make_obj_array(sub_results)
+
+
+def _xre_rij_ej_to_xei(actx: "ArrayContext",
+                       us: Tuple["ArrayT", ...],
+                       diff_mat: "ArrayT",
+                       jac: "ArrayT") -> np.ndarray:
+    sub_results = [actx.einsum("xre,rij,ej->xei",
+                               jac, diff_mat, u)
+                   for u in us]
+
+    return make_obj_array(sub_results)
+
+
+def _xre_rij_xej_to_ei(actx: "ArrayContext",
+                       us: Tuple["ArrayT", ...],
+                       vs: Tuple["ArrayT", ...],
+                       ws: Tuple["ArrayT", ...],
+                       diff_mat: "ArrayT",
+                       jac: "ArrayT") -> np.ndarray:
+    sub_results = [actx.einsum("xre,rij,xej->ei",
+                               jac, diff_mat, actx.np.stack([u, v, w]))
+                   for u, v, w in zip(us, vs, ws, strict=True)]
+
+    return make_obj_array(sub_results)
+
+
+def _gather_faces(u: "ArrayT",
+                  elements: "ArrayT",
+                  dofs: "ArrayT") -> "ArrayT":
+    # u[elements[f, e], dofs[f, e, j]], with *dofs* possibly shared by the
+    # elements
+    nfaces, nel = elements.shape
+    if dofs.ndim == 2:
+        dofs = dofs.reshape(nfaces, 1, dofs.shape[1])
+    return u[elements.reshape(nfaces, nel, 1), dofs]
+
+
+def _gather_ifj_fe_fej_to_ei(actx: "ArrayContext",
+                             us: Tuple["ArrayT", ...],
+                             int_elements: "ArrayT",
+                             int_dofs: "ArrayT",
+                             ext_elements: "ArrayT",
+                             ext_dofs: "ArrayT",
+                             ref_mat: "ArrayT",
+                             jac: "ArrayT") -> np.ndarray:
+    sub_results = [
+        actx.einsum("ifj,fe,fej->ei",
+                    ref_mat, jac,
+                    0.5 * (_gather_faces(u, int_elements, int_dofs)
+                           + _gather_faces(u, ext_elements, ext_dofs)))
+        for u in us
+    ]
+
+    return make_obj_array(sub_results)
+
+
+def _unstack(result: Any) -> np.ndarray:
+    return make_obj_array(list(result))
+
+
+def _ifj_fe_fej_to_ei_stacked(actx: "ArrayContext",
+                              flux_terms_p: "ArrayT",
+                              flux_terms_n: "ArrayT",
+                              ref_mat: "ArrayT",
+                              jac: "ArrayT") -> np.ndarray:
+    return _unstack(actx.einsum("ifj,fe,bfej->bei",
+                                ref_mat, jac,
+                                0.5 * (flux_terms_n + flux_terms_p)))
+
+
+def _xre_rij_ej_to_xei_stacked(actx: "ArrayContext",
+                               us: "ArrayT",
+                               diff_mat: "ArrayT",
+                               jac: "ArrayT") -> np.ndarray:
+    return _unstack(actx.einsum("xre,rij,bej->bxei", jac, diff_mat, us))
+
+
+def _xre_rij_xej_to_ei_stacked(actx: "ArrayContext",
+                               us: "ArrayT",
+                               vs: "ArrayT",
+                               ws: "ArrayT",
+                               diff_mat: "ArrayT",
+                               jac: "ArrayT") -> np.ndarray:
+    return _unstack(actx.einsum("xre,rij,bxej->bei",
+                                jac, diff_mat,
+                                actx.np.stack([us, vs, ws], axis=1)))
+
+
+def _gather_ifj_fe_fej_to_ei_stacked(actx: "ArrayContext",
+                                     us: "ArrayT",
+                                     int_elements: "ArrayT",
+                                     int_dofs: "ArrayT",
+                                     ext_elements: "ArrayT",
+                                     ext_dofs: "ArrayT",
+                                     ref_mat: "ArrayT",
+                                     jac: "ArrayT") -> np.ndarray:
+    nfaces, nel = int_elements.shape
+    int_traces = us[:, int_elements.reshape(nfaces, nel, 1),
+                    int_dofs.reshape(nfaces, 1, -1)]
+    ext_traces = us[:, ext_elements.reshape(nfaces, nel, 1), ext_dofs]
+    return _unstack(actx.einsum("ifj,fe,bfej->bei",
+                                ref_mat, jac,
+                                0.5 * (int_traces + ext_traces)))
+
+
+_FACE_FLUX_AXES = ("face", "element", "facedof")
+_VOL_DOF_AXES = ("element", "dof")
+_DIFF_MAT_AXES = ("ambient_dim", "dof", "dof")
+_VOL_JAC_AXES = ("topo_dim", "ambient_dim", "element")
+_VOL_INDEX_AXES = {"x": "ambient_dim", "r": "topo_dim", "e": "element",
+                   "i": "dof", "j": "dof"}
+
+
+KERNELS: Dict[str, DGKernel] = {
+    knl.name: knl
+    for knl in [
+        # Face mass
+        DGKernel(
+            name="ifj_fe_fej_to_ei",
+            subscript="ifj,fe,fej->ei",
+            operands=(Operand("flux_terms_p", _FACE_FLUX_AXES, is_batched=True),
+                      Operand("flux_terms_n", _FACE_FLUX_AXES, is_batched=True),
+                      Operand("ref_mat", ("voldof", "face", "facedof")),
+                      Operand("jac", ("face", "element"))),
+            index_axes={"i": "voldof", "f": "face", "j": "facedof",
+                        "e": "element"},
+            batched_inputs=frozenset({2}),
+            compute=_ifj_fe_fej_to_ei,
+            compute_stacked=_ifj_fe_fej_to_ei_stacked,
+            # 0.5 * (flux_n + flux_p)
+            extra_flops=lambda axis_lens: 2 * math.prod(
+                axis_lens[axis] for axis in _FACE_FLUX_AXES)),
+        # Face mass of the interior and exterior traces of volume fields,
+        # gathered via a synthetic connectivity whose elements are numbered
+        # along a space-filling curve or randomly
+        *(DGKernel(
+            name=f"gather_ifj_fe_fej_to_ei_{ordering}",
+            subscript="ifj,fe,fej->ei",
+            operands=(Operand("us", _VOL_DOF_AXES, is_batched=True),
+                      Operand("int_elements", ("face", "element"),
+                              dtype=INDEX_DTYPE),
+                      Operand("int_dofs", ("face", "facedof"),
+                              dtype=INDEX_DTYPE),
+                      Operand("ext_elements", ("face", "element"),
+                              dtype=INDEX_DTYPE),
+                      Operand("ext_dofs", _FACE_FLUX_AXES, dtype=INDEX_DTYPE),
+                      Operand("ref_mat", ("voldof", "face", "facedof")),
+                      Operand("jac", ("face", "element"))),
+            index_axes={"i": "voldof", "f": "face", "j": "facedof",
+                        "e": "element"},
+            batched_inputs=frozenset({2}),
+            compute=_gather_ifj_fe_fej_to_ei,
+            compute_stacked=_gather_ifj_fe_fej_to_ei_stacked,
+            input_generator=partial(generate_face_gather_inputs,
+                                    ordering=ordering),
+            # 0.5 * (u_int + u_ext)
+            extra_flops=lambda axis_lens: 2 * math.prod(
+                axis_lens[axis] for axis in _FACE_FLUX_AXES))
+          for ordering in ELEMENT_ORDERINGS),
+        # Local gradient
+        DGKernel(
+            name="xre_rij_ej_to_xei",
+            subscript="xre,rij,ej->xei",
+            operands=(Operand("us", _VOL_DOF_AXES, is_batched=True),
+                      Operand("diff_mat", _DIFF_MAT_AXES),
+                      Operand("jac", _VOL_JAC_AXES)),
+            index_axes=_VOL_INDEX_AXES,
+            batched_inputs=frozenset({2}),
+            compute=_xre_rij_ej_to_xei,
+            compute_stacked=_xre_rij_ej_to_xei_stacked),
+        # Local divergence
+        DGKernel(
+            name="xre_rij_xej_to_ei",
+            subscript="xre,rij,xej->ei",
+            operands=(Operand("us", _VOL_DOF_AXES, is_batched=True),
+                      Operand("vs", _VOL_DOF_AXES, is_batched=True),
+                      Operand("ws", _VOL_DOF_AXES, is_batched=True),
+                      Operand("diff_mat", _DIFF_MAT_AXES),
+                      Operand("jac", _VOL_JAC_AXES)),
+            index_axes=_VOL_INDEX_AXES,
+            batched_inputs=frozenset({2}),
+            compute=_xre_rij_xej_to_ei,
+            compute_stacked=_xre_rij_xej_to_ei_stacked),
+    ]
+}
+
+
+# suffix of the composite kernels whose parts are compiled separately
+SEPARATE_SUFFIX = "_separate"
+
+
+def _make_rhs_kernels(name: str, parts: Sequence[str],
+                      **kwargs: Any) -> List[CompositeKernel]:
+    # the variant compiled as one program and the one compiled per part
+    return [CompositeKernel(name=f"{name}{suffix}",
+                            parts=tuple(KERNELS[part] for part in parts),
+                            compile_separately=compile_separately,
+                            **kwargs)
+            for suffix, compile_separately in [("", False),
+                                               (SEPARATE_SUFFIX, True)]]
+
+
+COMPOSITE_KERNELS: Dict[str, CompositeKernel] = {
+    knl.name: knl
+    for knl in [
+        # Right-hand side: the gradient and the divergence of the solution
+        # along with the lift of its face traces, sharing the solution, the
+        # differentiation matrices and the volume Jacobian
+        *_make_rhs_kernels(
+            "grad_div_face_lift",
+            ["xre_rij_ej_to_xei", "xre_rij_xej_to_ei",
+             "gather_ifj_fe_fej_to_ei_sfc"],
+            input_generator=partial(generate_face_gather_inputs,
+                                    ordering="sfc")),
+    ]
+}
+
+
+def get_kernel(name: str) -> AnyKernel:
+    """
+    Returns the kernel of :data:`KERNELS` or :data:`COMPOSITE_KERNELS` named
+    *name*.
+    """
+    if name in KERNELS:
+        return KERNELS[name]
+    return COMPOSITE_KERNELS[name]
+
+# }}}
+
+# vim: fdm=marker
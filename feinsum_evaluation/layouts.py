@@ -0,0 +1,154 @@
+"""
+The data layouts the operands of the DG-kernels are stored in.
+
+A layout permutes the axes of every operand holding the element axis, so
+that the element axis is stored outermost (element-major, i.e. an array of
+structures per element) or innermost (dof-major, i.e. a structure of arrays
+over the elements), and optionally pads their innermost axis. The kernels
+evaluate the same einsums over every layout, see
+:attr:`~feinsum_evaluation.kernels.DGKernel.layout`.
+
+.. autoclass:: Layout
+.. autodata:: LAYOUTS
+"""
+import dataclasses as dc
+import math
+import numpy as np
+
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+ELEMENT_AXIS = "element"
+
+
+@dc.dataclass(frozen=True)
+class Layout:
+    """
+    .. attribute:: name
+
+        Name of the layout on the command line, for ex. ``"dof-major"``.
+
+    .. attribute:: element_major
+
+        If *True*, the element axis of every operand is stored outermost, if
+        *False* innermost. The remaining axes are stored in the order in
+        which they are declared in
+        :attr:`~feinsum_evaluation.kernels.Operand.axes`. If *None*, all the
+        axes are stored as declared.
+
+    .. attribute:: alignment
+
+        Number of bytes the innermost axis of every input holding the element
+        axis is padded to a multiple of, so that the stride of the outer axes
+        is aligned whatever the input's dtype. The padding is never read.
+        The inputs without an element axis, for ex. the reference matrices,
+        are never padded.
+
+    .. automethod:: get_axis_order
+    .. automethod:: get_storage_shape
+    .. automethod:: is_padded
+    .. automethod:: to_storage
+    .. automethod:: from_storage
+    .. automethod:: to_output_storage
+    """
+    name: str
+    element_major: Optional[bool]
+    alignment: int = 1
+
+    def get_axis_order(self, axes: Sequence[str]) -> Tuple[int, ...]:
+        """
+        Returns the positions in *axes* of the stored axes, outermost first.
+        """
+        order = list(range(len(axes)))
+        if self.element_major is None or ELEMENT_AXIS not in axes:
+            return tuple(order)
+
+        iel_axis = axes.index(ELEMENT_AXIS)
+        order.remove(iel_axis)
+        return ((iel_axis, *order)
+                if self.element_major
+                else (*order, iel_axis))
+
+    def get_storage_shape(self, axes: Sequence[str],
+                          shape: Tuple[int, ...],
+                          dtype: Any) -> Tuple[int, ...]:
+        """
+        Returns the shape of an input of *shape* with *axes* and entries of
+        *dtype* as stored.
+        """
+        storage_shape = [shape[iaxis] for iaxis in self.get_axis_order(axes)]
+        if storage_shape and ELEMENT_AXIS in axes:
+            itemsize = np.dtype(dtype).itemsize
+            # entries per aligned chunk of the innermost axis
+            alignment = self.alignment // math.gcd(self.alignment, itemsize)
+            storage_shape[-1] = -(-storage_shape[-1] // alignment) * alignment
+        return tuple(storage_shape)
+
+    def is_padded(self, axes: Sequence[str], shape: Tuple[int, ...],
+                  dtype: Any) -> bool:
+        """
+        Returns *True* if the innermost axis of an input of *shape* with
+        *axes* and entries of *dtype* is padded when stored.
+        """
+        return self.get_storage_shape(axes, shape, dtype) != tuple(
+            shape[iaxis] for iaxis in self.get_axis_order(axes))
+
+    def to_storage(self, ary: np.ndarray, axes: Sequence[str]) -> np.ndarray:
+        """
+        Returns the host array *ary* with *axes* as stored.
+        """
+        permuted = ary.transpose(self.get_axis_order(axes))
+        result = np.zeros(self.get_storage_shape(axes, ary.shape, ary.dtype),
+                          dtype=ary.dtype)
+        result[tuple(slice(0, n) for n in permuted.shape)] = permuted
+        return result
+
+    def from_storage(self, actx: "ArrayContext", ary: Any,
+                     axes: Sequence[str], shape: Tuple[int, ...]) -> Any:
+        """
+        Returns the stored input *ary* of *actx* with *axes* of logical
+        *shape* as an array with the axes in the declared order, without
+        copying it. *ary* may have leading axes, for ex. a batch axis, which
+        are left in place.
+        """
+        order = self.get_axis_order(axes)
+        nleading = ary.ndim - len(axes)
+        if self.is_padded(axes, shape, ary.dtype):
+            ary = ary[(*(slice(None),) * (ary.ndim - 1),
+                       slice(0, shape[order[-1]]))]
+        if order != tuple(range(len(axes))):
+            ary = actx.np.transpose(
+                ary, (*range(nleading),
+                      *(nleading + int(iaxis) for iaxis in np.argsort(order))))
+        return ary
+
+    def to_output_storage(self, actx: "ArrayContext", ary: Any,
+                          axes: Sequence[str]) -> Any:
+        """
+        Returns the output *ary* of *actx* with *axes* in the declared order
+        with its axes as stored. The outputs are not padded.
+        """
+        order = self.get_axis_order(axes)
+        if order == tuple(range(len(axes))):
+            return ary
+        return actx.np.transpose(ary, order)
+
+
+DEFAULT_LAYOUT = "declared"
+
+#: Mapping from the names of the layouts to :class:`Layout`.
+LAYOUTS: Dict[str, Layout] = {
+    layout.name: layout
+    for layout in [
+        Layout("declared", element_major=None),
+        Layout("element-major", element_major=True),
+        Layout("dof-major", element_major=False),
+        # a cache line
+        Layout("element-major-padded", element_major=True, alignment=64),
+    ]
+}
+
+# vim: fdm=marker
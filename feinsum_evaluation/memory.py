@@ -0,0 +1,181 @@
+"""
+Accounting of the host and device memory used by the benchmarked kernels.
+
+.. autoclass:: CountingAllocator
+.. autoclass:: MemoryUsage
+.. autofunction:: measure_memory_usage
+.. autofunction:: find_memory_regressions
+"""
+import dataclasses as dc
+import json
+import resource
+
+from typing import (TYPE_CHECKING, Any, Callable, Dict, List, Mapping,
+                    Optional, Tuple)
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+class CountingAllocator:
+    """
+    Wraps a :class:`pyopencl.tools.MemoryPool` to count the allocations made
+    through it and to track the peak number of bytes in use.
+
+    .. attribute:: pool
+    .. attribute:: nallocations
+    .. attribute:: allocated_bytes
+
+        Number of bytes requested by the allocations, whether or not the pool
+        recycled them.
+
+    .. attribute:: peak_active_bytes
+    """
+    def __init__(self, pool: Any) -> None:
+        self.pool = pool
+        self.nallocations = 0
+        self.allocated_bytes = 0
+        self.peak_active_bytes = pool.active_bytes
+
+    def __call__(self, nbytes: int) -> Any:
+        buf = self.pool(nbytes)
+        self.nallocations += 1
+        self.allocated_bytes += nbytes
+        self.peak_active_bytes = max(self.peak_active_bytes,
+                                     self.pool.active_bytes)
+        return buf
+
+    def reset(self) -> None:
+        self.nallocations = 0
+        self.allocated_bytes = 0
+        self.peak_active_bytes = self.pool.active_bytes
+
+
+@dc.dataclass(frozen=True)
+class MemoryUsage:
+    """
+    Memory used while calling a compiled kernel. An attribute is *None* if the
+    array context does not expose it.
+
+    .. attribute:: peak_host_bytes
+
+        Peak resident set size of the process.
+
+    .. attribute:: peak_device_bytes
+
+        Peak number of bytes in use on the device, including the kernel's
+        inputs. The inputs of all the batch sizes of a sweep share one
+        :class:`~feinsum_evaluation.kernels.InputPool`, hence these are the
+        inputs for the largest batch size run so far. Only known for the
+        array contexts allocating through a :class:`CountingAllocator`. JAX
+        only reports the peak over the lifetime of the process, which
+        includes the earlier cells of the sweep, and is hence not reported.
+
+    .. attribute:: nallocations_per_call
+
+        Number of allocations requested from the memory pool per call.
+
+    .. attribute:: pool_held_bytes
+
+        Number of bytes held by the memory pool for reuse after the calls,
+        i.e. allocated from the device but not in use.
+    """
+    peak_host_bytes: Optional[int]
+    peak_device_bytes: Optional[int]
+    nallocations_per_call: Optional[float]
+    pool_held_bytes: Optional[int]
+
+
+# {{{ host peak RSS
+
+def _reset_host_peak_rss() -> None:
+    # Writing "5" to clear_refs resets the peak RSS (VmHWM) on Linux.
+    try:
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+    except OSError:
+        pass
+
+
+def _get_host_peak_rss() -> int:
+    try:
+        with open("/proc/self/status") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # peak over the lifetime of the process (in KiB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+# }}}
+
+
+def measure_memory_usage(actx: "ArrayContext",
+                         f: Callable[..., Any],
+                         args: Tuple[Any, ...],
+                         *,
+                         synchronize: Optional[Callable[[Any], None]] = None,
+                         ncalls: int = 5) -> MemoryUsage:
+    """
+    Returns the :class:`MemoryUsage` of calling ``f(*args)`` *ncalls* times.
+    *f* is expected to have been called before to exclude the compilation
+    costs.
+    """
+    allocator = getattr(actx, "allocator", None)
+    if isinstance(allocator, CountingAllocator):
+        allocator.reset()
+
+    _reset_host_peak_rss()
+
+    for _ in range(ncalls):
+        result = f(*args)
+        if synchronize is not None:
+            synchronize(result)
+
+    peak_host_bytes = _get_host_peak_rss()
+    del result
+
+    if isinstance(allocator, CountingAllocator):
+        return MemoryUsage(
+            peak_host_bytes=peak_host_bytes,
+            peak_device_bytes=allocator.peak_active_bytes,
+            nallocations_per_call=allocator.nallocations / ncalls,
+            pool_held_bytes=(allocator.pool.managed_bytes
+                             - allocator.pool.active_bytes))
+    else:
+        return MemoryUsage(peak_host_bytes=peak_host_bytes,
+                           peak_device_bytes=None,
+                           nallocations_per_call=None,
+                           pool_held_bytes=None)
+
+
+# {{{ regression check
+
+def load_memory_baseline(filename: str) -> Dict[str, int]:
+    with open(filename) as fp:
+        return json.load(fp)
+
+
+def save_memory_baseline(filename: str,
+                         peak_device_bytes: Mapping[str, int]) -> None:
+    with open(filename, "w") as fp:
+        json.dump(dict(peak_device_bytes), fp, indent=2, sort_keys=True)
+
+
+def find_memory_regressions(peak_device_bytes: Mapping[str, int],
+                            baseline: Mapping[str, int],
+                            tolerance: float) -> List[Tuple[str, int, int]]:
+    """
+    Returns ``(key, baseline_bytes, bytes)`` for every entry of
+    *peak_device_bytes* that exceeds its entry in *baseline* by more than the
+    relative *tolerance*.
+    """
+    return [(key, baseline[key], nbytes)
+            for key, nbytes in peak_device_bytes.items()
+            if key in baseline and nbytes > (1 + tolerance) * baseline[key]]
+
+# }}}
+
+# vim: fdm=marker
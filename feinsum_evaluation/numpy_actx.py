@@ -0,0 +1,44 @@
+"""
+A NumPy-backed array context that measures the vectorized-CPU baseline of
+the DG-kernels and computes the reference results the other array contexts
+are checked against.
+
+.. autoclass:: NumpyReferenceArrayContext
+"""
+import numpy as np
+
+from typing import Any, Dict, Hashable, List, Union
+
+from arraycontext import NumpyArrayContext
+
+
+class NumpyReferenceArrayContext(NumpyArrayContext):
+    """
+    Evaluates einsums via :func:`numpy.einsum` along the contraction path
+    found by :func:`numpy.einsum_path`, so that the pairwise contractions
+    are dispatched to BLAS via :func:`numpy.tensordot` wherever the
+    subscripts allow it. The paths are cached per subscript and operand
+    shapes to keep the search out of the timed calls.
+
+    The DG-kernels evaluate all the batch members at once on this array
+    context, as contractions over the batched operands stacked along a
+    leading axis, see
+    :attr:`feinsum_evaluation.kernels.DGKernel.compute_stacked`.
+    """
+    def __init__(self, *, optimize: Union[bool, str] = "optimal") -> None:
+        super().__init__()
+        self.optimize = optimize
+        self._einsum_paths: Dict[Hashable, List[Any]] = {}
+
+    def clone(self) -> "NumpyReferenceArrayContext":
+        return type(self)(optimize=self.optimize)
+
+    def einsum(self, spec, *args, arg_names=None, tagged=()):
+        key = (spec, tuple(arg.shape for arg in args))
+        try:
+            path = self._einsum_paths[key]
+        except KeyError:
+            path, _ = np.einsum_path(spec, *args, optimize=self.optimize)
+            self._einsum_paths[key] = path
+
+        return np.einsum(spec, *args, optimize=path)
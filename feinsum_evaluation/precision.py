@@ -0,0 +1,67 @@
+"""
+The floating point precisions the benchmarks are run in.
+
+.. autoclass:: Precision
+.. autodata:: PRECISIONS
+"""
+import dataclasses as dc
+import numpy as np
+
+from typing import Any, Dict
+
+
+@dc.dataclass(frozen=True)
+class Precision:
+    """
+    .. attribute:: name
+
+        Name of the precision on the command line, for ex. ``"float32"``.
+
+    .. attribute:: storage_dtype
+
+        dtype of the operands that differ across the batch members, which
+        make up most of the data moved by a batched einsum.
+
+    .. attribute:: compute_dtype
+
+        dtype of the operands shared by the batch members, i.e. of the
+        reference operators and geometric factors. The einsums promote the
+        remaining operands to it and hence accumulate in it.
+
+    .. attribute:: rtol
+
+        Largest relative error, in the max-norm, expected of a result
+        computed in this precision relative to one computed in float64 from
+        the unrounded inputs.
+    """
+    name: str
+    storage_dtype: Any
+    compute_dtype: Any
+    rtol: float
+
+    def get_dtype(self, is_batched: bool) -> "np.dtype[Any]":
+        """
+        Returns the dtype of an operand that differs across the batch members
+        if *is_batched* is *True*, else of one that is shared by them.
+        """
+        return np.dtype(self.storage_dtype if is_batched else self.compute_dtype)
+
+    @property
+    def output_dtype(self) -> "np.dtype[Any]":
+        return np.result_type(self.storage_dtype, self.compute_dtype)
+
+
+DEFAULT_PRECISION = "float64"
+
+#: Mapping from the names of the precisions to :class:`Precision`.
+PRECISIONS: Dict[str, Precision] = {
+    precision.name: precision
+    for precision in [
+        Precision("float64", np.float64, np.float64, rtol=1e-10),
+        Precision("float32", np.float32, np.float32, rtol=1e-5),
+        # float32 storage, float64 accumulation
+        Precision("mixed", np.float32, np.float64, rtol=1e-6),
+    ]
+}
+
+# vim: fdm=marker
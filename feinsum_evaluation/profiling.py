@@ -0,0 +1,195 @@
+"""
+Per-stage profiling of the compilation pipeline of the :mod:`pytato` based
+array contexts.
+
+.. autoclass:: StageRecord
+.. autoclass:: CompileProfiler
+.. autofunction:: get_ir_size
+.. autofunction:: get_device_code_digest
+"""
+import dataclasses as dc
+import json
+import os
+
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple
+
+from feinsum_evaluation.timing import CompileTraceRecorder
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+@dc.dataclass(frozen=True)
+class StageRecord:
+    """
+    .. attribute:: duration
+
+        Wall time (in seconds) spent in the stage.
+
+    .. attribute:: ir_size_before
+    .. attribute:: ir_size_after
+
+        Size of the IR entering/leaving the stage as per :func:`get_ir_size`.
+    """
+    name: str
+    duration: float
+    ir_size_before: Optional[int]
+    ir_size_after: Optional[int]
+
+
+def _get_loopy_translation_unit(ir: Any) -> Any:
+    import loopy as lp
+
+    if isinstance(ir, lp.TranslationUnit):
+        return ir
+
+    # pytato's bound programs wrap the translation unit
+    t_unit = getattr(ir, "program", None)
+    if isinstance(t_unit, lp.TranslationUnit):
+        return t_unit
+
+    return None
+
+
+def get_ir_size(ir: Any) -> Optional[int]:
+    """
+    Returns the number of instructions in a :mod:`loopy` program, the number
+    of nodes in a :mod:`pytato` DAG and *None* for any other IR.
+    """
+    import loopy as lp
+    import pytato as pt
+
+    t_unit = _get_loopy_translation_unit(ir)
+    if t_unit is not None:
+        return sum(len(clbl.subkernel.instructions)
+                   for clbl in t_unit.callables_table.values()
+                   if isinstance(clbl, lp.CallableKernel))
+    elif isinstance(ir, (pt.Array, pt.DictOfNamedArrays)):
+        return pt.analysis.get_num_nodes(ir)
+    else:
+        return None
+
+
+def get_device_code_digest(post_stage_irs: Sequence[Any]) -> Optional[str]:
+    """
+    Returns a digest of the device code generated from the last :mod:`loopy`
+    program among *post_stage_irs*, see
+    :attr:`~feinsum_evaluation.timing.CompileTraceRecorder.post_stage_irs`,
+    or *None* if there is none, for ex. for array contexts without a
+    compilation pipeline.
+    """
+    t_unit = None
+    for ir in post_stage_irs:
+        t_unit = _get_loopy_translation_unit(ir) or t_unit
+
+    if t_unit is None:
+        return None
+
+    import hashlib
+    import loopy as lp
+
+    device_code = lp.generate_code_v2(t_unit).device_code()
+    return hashlib.sha256(device_code.encode()).hexdigest()
+
+
+class CompileProfiler(CompileTraceRecorder):
+    """
+    A :class:`~feinsum_evaluation.timing.CompileTraceRecorder` that also
+    retains the IR at each stage of the compilation pipeline so that
+    :meth:`save` can dump the stage timings, IR sizes, generated kernels and
+    the :mod:`loopy` operation and memory access statistics of a run.
+
+    The IRs are processed only in :meth:`save` to keep the profiling overhead
+    out of the timed compilation stages.
+
+    .. attribute:: profile_dir
+    """
+    def __init__(self, profile_dir: str) -> None:
+        super().__init__()
+        self.profile_dir = profile_dir
+        self.irs: List[Tuple[str, Any]] = []
+
+    def clear(self) -> None:
+        super().clear()
+        self.irs.clear()
+
+    def __call__(self, what: Any, stage: str, ir: Any) -> None:
+        super().__call__(what, stage, ir)
+        self.irs.append((stage, ir))
+
+    def get_stage_records(self) -> List[StageRecord]:
+        records = []
+        entered = {}
+        for (stage, timestamp), (_, ir) in zip(self.events, self.irs,
+                                               strict=True):
+            if stage.startswith("pre_"):
+                entered[stage[4:]] = (timestamp, get_ir_size(ir))
+            elif stage.startswith("post_") and stage[5:] in entered:
+                t_start, ir_size_before = entered.pop(stage[5:])
+                records.append(StageRecord(name=stage[5:],
+                                           duration=(timestamp - t_start) * 1e-9,
+                                           ir_size_before=ir_size_before,
+                                           ir_size_after=get_ir_size(ir)))
+
+        return records
+
+    def save(self, run_name: str, actx: "ArrayContext") -> str:
+        """
+        Dumps the profile of the compilation recorded since the last
+        :meth:`clear` to ``<profile_dir>/<run_name>`` and returns the path of
+        that directory.
+
+        For OpenCL array contexts the final generated kernel is also built
+        again with an empty binary cache to report the time taken by the
+        OpenCL compiler as the ``"opencl_build"`` stage.
+        """
+        run_dir = os.path.join(self.profile_dir, run_name.replace(":", "_"))
+        os.makedirs(run_dir, exist_ok=True)
+
+        records = self.get_stage_records()
+
+        t_unit = None
+        for stage, ir in self.irs:
+            if stage.startswith("post_"):
+                t_unit = _get_loopy_translation_unit(ir) or t_unit
+
+        if t_unit is not None:
+            import loopy as lp
+
+            device_code = lp.generate_code_v2(t_unit).device_code()
+            with open(os.path.join(run_dir, "kernel.cl"), "w") as fp:
+                fp.write(device_code)
+            with open(os.path.join(run_dir, "kernel.loopy.txt"), "w") as fp:
+                fp.write(str(t_unit))
+            with open(os.path.join(run_dir, "op_map.txt"), "w") as fp:
+                fp.write(str(lp.get_op_map(t_unit, subgroup_size="guess")))
+            with open(os.path.join(run_dir, "mem_access_map.txt"), "w") as fp:
+                fp.write(str(lp.get_mem_access_map(t_unit,
+                                                   subgroup_size="guess")))
+
+            queue = getattr(actx, "queue", None)
+            if queue is not None:
+                records.append(StageRecord(
+                    name="opencl_build",
+                    duration=_time_opencl_build(queue.context, device_code),
+                    ir_size_before=None, ir_size_after=None))
+
+        with open(os.path.join(run_dir, "stages.json"), "w") as fp:
+            json.dump([dc.asdict(record) for record in records], fp, indent=2)
+
+        return run_dir
+
+
+def _time_opencl_build(cl_ctx: Any, device_code: str) -> float:
+    import tempfile
+    import pyopencl as cl
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        t_start = perf_counter_ns()
+        cl.Program(cl_ctx, device_code).build(cache_dir=cache_dir)
+        t_end = perf_counter_ns()
+
+    return (t_end - t_start) * 1e-9
+
+# vim: fdm=marker
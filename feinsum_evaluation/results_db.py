@@ -0,0 +1,553 @@
+"""
+A persistent store of the benchmark results in a SQLite database so that
+runs, for ex. nightly ones, can be compared against each other.
+
+Every run records the environment it was run in (package versions, git
+revisions, host) and, for every cell, all the timing samples along with the
+device and driver it ran on.
+
+.. autoclass:: ResultRecord
+.. autoclass:: RunInfo
+.. autofunction:: get_environment
+.. autofunction:: get_device_info
+.. autoclass:: ResultsDatabase
+.. autoclass:: Comparison
+.. autofunction:: compare_records
+.. autofunction:: main
+"""
+import argparse
+import dataclasses as dc
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import numpy as np
+
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+from tabulate import tabulate
+
+from feinsum_evaluation.timing import get_slowdown_pvalue
+from feinsum_evaluation.utils import is_opencl_actx, is_jax_actx, is_numpy_actx
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+DEFAULT_RESULTS_DB = "feinsum-evaluation-results.sqlite"
+
+# packages whose versions affect the generated code or its timing
+_RECORDED_PACKAGES = ("feinsum", "loopy", "pytato", "arraycontext", "pyopencl",
+                      "pymbolic", "islpy", "pytools", "numpy", "jax", "jaxlib")
+
+
+@dc.dataclass(frozen=True)
+class ResultRecord:
+    """
+    A single stored measurement.
+
+    .. attribute:: key
+
+        Identifies the measurement across runs.
+
+    .. attribute:: suite
+
+        Name of the benchmark suite the measurement belongs to, for ex.
+        ``"dg"`` or ``"canonicalization"``.
+
+    .. attribute:: samples
+
+        All the timing samples (in seconds), including the outliers.
+
+    .. attribute:: record
+
+        JSON-serializable mapping with the complete measurement.
+    """
+    key: str
+    suite: str
+    kernel: str
+    actx: Optional[str]
+    nbatch: Optional[int]
+    ni: Optional[int]
+    nj: Optional[int]
+    nel: Optional[int]
+    device: Optional[str]
+    driver_version: Optional[str]
+    median: float
+    samples: Tuple[float, ...]
+    peak_device_bytes: Optional[int]
+    record: Dict[str, Any]
+
+
+@dc.dataclass(frozen=True)
+class RunInfo:
+    id: int
+    timestamp: str
+    suite: str
+    git_hash: Optional[str]
+    hostname: str
+    argv: Tuple[str, ...]
+    environment: Dict[str, Any]
+    nresults: int
+
+
+# {{{ environment capture
+
+def _get_git_hash(package_dir: str) -> Optional[str]:
+    """
+    Returns the revision of the git checkout whose root contains the package
+    at *package_dir*, suffixed by ``"-dirty"`` if it has uncommitted changes.
+    Returns *None* if the package is not in a git checkout, for ex. if it was
+    installed into a site-packages directory.
+    """
+    path = os.path.abspath(package_dir)
+    try:
+        toplevel = subprocess.run(
+            ["git", "rev-parse", "--show-toplevel"], cwd=path,
+            capture_output=True, text=True, check=True).stdout.strip()
+        if os.path.realpath(toplevel) != os.path.realpath(os.path.dirname(path)):
+            return None
+        git_hash = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=path, capture_output=True,
+            text=True, check=True).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=path, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return f"{git_hash}-dirty" if status.strip() else git_hash
+
+
+def _get_package_path(name: str) -> Optional[str]:
+    import importlib.util
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    if spec is None or spec.origin is None:
+        return None
+    return os.path.dirname(spec.origin)
+
+
+def get_environment() -> Dict[str, Any]:
+    """
+    Returns a JSON-serializable description of the host, the Python
+    interpreter and the versions of the packages that affect the generated
+    code. Packages imported from git checkouts, as is common for development
+    installs, are also recorded with their revisions.
+    """
+    from importlib.metadata import PackageNotFoundError, version
+
+    packages = {}
+    git_hashes = {"feinsum_evaluation": _get_git_hash(os.path.dirname(__file__))}
+    for name in _RECORDED_PACKAGES:
+        try:
+            packages[name] = version(name)
+        except PackageNotFoundError:
+            continue
+        path = _get_package_path(name)
+        if path is not None:
+            git_hash = _get_git_hash(path)
+            if git_hash is not None:
+                git_hashes[name] = git_hash
+
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "python": sys.version,
+        "packages": packages,
+        "git": {name: git_hash
+                for name, git_hash in git_hashes.items()
+                if git_hash is not None},
+    }
+
+
+def _get_host_cpu_name() -> str:
+    try:
+        with open("/proc/cpuinfo") as fp:
+            for line in fp:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+
+    return platform.processor() or platform.machine()
+
+
+def _get_numpy_blas() -> str:
+    try:
+        blas = np.show_config(mode="dicts")["Build Dependencies"]["blas"]
+        return f"{blas['name']} {blas.get('version', '')}".strip()
+    except (TypeError, KeyError):
+        # NumPy < 1.25 only prints its configuration
+        return "unknown BLAS"
+
+
+def get_device_info(actx: "ArrayContext") -> Tuple[str, str]:
+    """
+    Returns the name and the driver version of the device on which *actx*
+    executes.
+    """
+    if is_opencl_actx(actx):
+        device = actx.queue.device
+        return (f"{device.name.strip()} ({device.platform.name.strip()})",
+                device.driver_version)
+    elif is_jax_actx(actx):
+        import jax
+        device = jax.devices()[0]
+        client = getattr(device, "client", None)
+        return (f"{device.device_kind} ({device.platform})",
+                getattr(client, "platform_version", jax.__version__))
+    elif is_numpy_actx(actx):
+        return (f"{_get_host_cpu_name()} (numpy)",
+                f"numpy {np.__version__}, {_get_numpy_blas()}")
+    else:
+        raise NotImplementedError(type(actx))
+
+# }}}
+
+
+# {{{ database
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    suite TEXT NOT NULL,
+    git_hash TEXT,
+    hostname TEXT NOT NULL,
+    argv TEXT NOT NULL,
+    environment TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    key TEXT NOT NULL,
+    suite TEXT NOT NULL,
+    kernel TEXT NOT NULL,
+    actx TEXT,
+    nbatch INTEGER,
+    ni INTEGER,
+    nj INTEGER,
+    nel INTEGER,
+    device TEXT,
+    driver_version TEXT,
+    median REAL NOT NULL,
+    samples TEXT NOT NULL,
+    peak_device_bytes INTEGER,
+    record TEXT NOT NULL,
+    PRIMARY KEY (run_id, key)
+);
+"""
+
+_RESULT_COLUMNS = tuple(field.name for field in dc.fields(ResultRecord))
+
+
+def _json_default(obj: Any) -> Any:
+    # numpy scalars and arrays
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON"
+                    " serializable")
+
+
+def _get_row(record: ResultRecord) -> Tuple[Any, ...]:
+    return tuple(
+        (json.dumps(list(record.samples), default=_json_default)
+         if name == "samples"
+         else json.dumps(record.record, default=_json_default)
+         if name == "record"
+         else getattr(record, name))
+        for name in _RESULT_COLUMNS)
+
+
+class ResultsDatabase:
+    """
+    Runs and their :class:`ResultRecord` stored in a SQLite database.
+    Can be used as a context manager that closes the connection on exit.
+    """
+    def __init__(self, filename: str = DEFAULT_RESULTS_DB) -> None:
+        self.filename = filename
+        self._conn = sqlite3.connect(filename)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "ResultsDatabase":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def add_run(self, suite: str, records: Sequence[ResultRecord], *,
+                argv: Sequence[str],
+                environment: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Stores *records* as a new run and returns the id of the run.
+        """
+        if environment is None:
+            environment = get_environment()
+
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (timestamp, suite, git_hash, hostname, argv,"
+                " environment) VALUES (?, ?, ?, ?, ?, ?)",
+                (datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                 suite,
+                 environment["git"].get("feinsum_evaluation"),
+                 environment["hostname"],
+                 json.dumps(list(argv)),
+                 json.dumps(environment)))
+            run_id = cursor.lastrowid
+
+            self._conn.executemany(
+                f"INSERT INTO results (run_id, {', '.join(_RESULT_COLUMNS)})"
+                f" VALUES (?, {', '.join('?' * len(_RESULT_COLUMNS))})",
+                [(run_id, *_get_row(record)) for record in records])
+
+        return run_id
+
+    def get_runs(self) -> List[RunInfo]:
+        rows = self._conn.execute(
+            "SELECT runs.id, timestamp, runs.suite, git_hash, hostname, argv,"
+            " environment, COUNT(results.key)"
+            " FROM runs LEFT JOIN results ON runs.id = results.run_id"
+            " GROUP BY runs.id ORDER BY runs.id").fetchall()
+        return [RunInfo(id=run_id, timestamp=timestamp, suite=suite,
+                        git_hash=git_hash, hostname=hostname,
+                        argv=tuple(json.loads(argv)),
+                        environment=json.loads(environment),
+                        nresults=nresults)
+                for (run_id, timestamp, suite, git_hash, hostname, argv,
+                     environment, nresults) in rows]
+
+    def get_latest_run_id(self, suite: Optional[str] = None) -> int:
+        if suite is None:
+            row = self._conn.execute("SELECT MAX(id) FROM runs").fetchone()
+        else:
+            row = self._conn.execute("SELECT MAX(id) FROM runs WHERE suite = ?",
+                                     (suite,)).fetchone()
+        if row[0] is None:
+            raise ValueError(f"No runs recorded in '{self.filename}'.")
+        return row[0]
+
+    def get_records(self, run_id: int) -> Dict[str, ResultRecord]:
+        """
+        Returns a mapping from the keys of the records of run *run_id* to
+        the records.
+        """
+        rows = self._conn.execute(
+            f"SELECT {', '.join(_RESULT_COLUMNS)} FROM results"
+            " WHERE run_id = ? ORDER BY rowid", (run_id,)).fetchall()
+        if not rows and not self._conn.execute(
+                "SELECT 1 FROM runs WHERE id = ?", (run_id,)).fetchone():
+            raise ValueError(f"No run with id {run_id} in '{self.filename}'.")
+
+        records = {}
+        for row in rows:
+            fields = dict(zip(_RESULT_COLUMNS, row))
+            fields["samples"] = tuple(json.loads(fields["samples"]))
+            fields["record"] = json.loads(fields["record"])
+            records[fields["key"]] = ResultRecord(**fields)
+
+        return records
+
+# }}}
+
+
+# {{{ comparison
+
+@dc.dataclass(frozen=True)
+class Comparison:
+    """
+    Comparison of a :class:`ResultRecord` against its baseline.
+
+    .. attribute:: pvalue
+
+        p-value of the hypothesis that the timing samples are larger than
+        the ones of the baseline, see
+        :func:`~feinsum_evaluation.timing.get_slowdown_pvalue`.
+    """
+    key: str
+    baseline: ResultRecord
+    current: ResultRecord
+    pvalue: float
+
+    @property
+    def relative_change(self) -> float:
+        return self.current.median / self.baseline.median - 1
+
+    @property
+    def relative_memory_change(self) -> Optional[float]:
+        if (self.baseline.peak_device_bytes is None
+                or self.current.peak_device_bytes is None):
+            return None
+        return (self.current.peak_device_bytes
+                / self.baseline.peak_device_bytes - 1)
+
+    @property
+    def same_device(self) -> bool:
+        return (self.baseline.device == self.current.device
+                and self.baseline.driver_version == self.current.driver_version)
+
+    def is_slowdown(self, *, alpha: float, threshold: float) -> bool:
+        """
+        Returns *True* if the slowdown is statistically significant at level
+        *alpha* and the median slowed down by more than the relative
+        *threshold*.
+        """
+        return self.pvalue < alpha and self.relative_change > threshold
+
+    def is_memory_regression(self, *, tolerance: float) -> bool:
+        change = self.relative_memory_change
+        return change is not None and change > tolerance
+
+
+def compare_records(baseline: Dict[str, ResultRecord],
+                    current: Dict[str, ResultRecord]) -> List[Comparison]:
+    """
+    Returns the :class:`Comparison` of every record in *current* that has a
+    baseline record with the same key.
+    """
+    return [Comparison(key=key,
+                       baseline=baseline[key],
+                       current=record,
+                       pvalue=get_slowdown_pvalue(baseline[key].samples,
+                                                  record.samples))
+            for key, record in current.items()
+            if key in baseline]
+
+
+def print_comparisons(comparisons: Sequence[Comparison], *,
+                      alpha: float, threshold: float,
+                      memory_tolerance: float,
+                      show_all: bool = False) -> None:
+    table = []
+    for comparison in comparisons:
+        flags = []
+        if comparison.is_slowdown(alpha=alpha, threshold=threshold):
+            flags.append("SLOWDOWN")
+        if comparison.is_memory_regression(tolerance=memory_tolerance):
+            flags.append("MEMORY")
+        if not comparison.same_device:
+            flags.append("device changed")
+
+        if not (flags or show_all):
+            continue
+
+        memory_change = comparison.relative_memory_change
+        table.append([comparison.key,
+                      f"{comparison.baseline.median:.4g}",
+                      f"{comparison.current.median:.4g}",
+                      f"{100*comparison.relative_change:+.1f}%",
+                      f"{comparison.pvalue:.2g}",
+                      ("-"
+                       if memory_change is None
+                       else f"{100*memory_change:+.1f}%"),
+                      ", ".join(flags)])
+
+    if table:
+        print(tabulate(table,
+                       headers=["cell", "baseline median", "median", "change",
+                                "p-value", "peak memory change", ""]))
+    else:
+        print("No regressions.")
+
+
+def has_regressions(comparisons: Sequence[Comparison], *,
+                    alpha: float, threshold: float,
+                    memory_tolerance: float) -> bool:
+    return any(comparison.is_slowdown(alpha=alpha, threshold=threshold)
+               or comparison.is_memory_regression(tolerance=memory_tolerance)
+               for comparison in comparisons)
+
+# }}}
+
+
+# {{{ command line
+
+COMMANDS = ("runs", "compare")
+
+
+def add_slowdown_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--alpha", type=float, default=0.01,
+                        help=("significance level of the test for slowdowns."
+                              " Defaults to 0.01."))
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help=("smallest relative increase of the median that is"
+                              " reported as a slowdown. Defaults to 0.05."))
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="feinsum_evaluation",
+        description="Inspect and compare the stored benchmark runs",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    runs_parser = subparsers.add_parser("runs", help="list the stored runs")
+    compare_parser = subparsers.add_parser(
+        "compare",
+        help=("compare a run against a baseline run and exit with a non-zero"
+              " status if any cell regressed"))
+
+    for subparser in (runs_parser, compare_parser):
+        subparser.add_argument("--db", metavar="FILE", type=str,
+                               default=DEFAULT_RESULTS_DB,
+                               help=("results database. Defaults to"
+                                     f" '{DEFAULT_RESULTS_DB}'."))
+
+    compare_parser.add_argument("baseline", type=int,
+                                help="id of the baseline run")
+    compare_parser.add_argument("run", type=int, nargs="?", default=None,
+                                help=("id of the run to compare. Defaults to the"
+                                      " latest run."))
+    compare_parser.add_argument("--all", action="store_true",
+                                help="also list the cells that did not regress.")
+    add_slowdown_arguments(compare_parser)
+    compare_parser.add_argument("--memory-tolerance", type=float, default=0.05,
+                                help=("relative increase in the peak device"
+                                      " memory that is tolerated. Defaults to"
+                                      " 0.05."))
+
+    return parser
+
+
+def main(argv: Sequence[str]) -> None:
+    args = get_parser().parse_args(argv)
+
+    with ResultsDatabase(args.db) as db:
+        if args.command == "runs":
+            print(tabulate(
+                [[run.id, run.timestamp, run.suite, run.hostname,
+                  run.git_hash or "-", run.nresults, " ".join(run.argv)]
+                 for run in db.get_runs()],
+                headers=["id", "timestamp", "suite", "host", "git", "#results",
+                         "arguments"]))
+        elif args.command == "compare":
+            run_id = (db.get_latest_run_id()
+                      if args.run is None
+                      else args.run)
+            comparisons = compare_records(db.get_records(args.baseline),
+                                          db.get_records(run_id))
+            print(f"Run {run_id} vs baseline run {args.baseline}"
+                  f" ({len(comparisons)} common cells):")
+            print_comparisons(comparisons, alpha=args.alpha,
+                              threshold=args.threshold,
+                              memory_tolerance=args.memory_tolerance,
+                              show_all=args.all)
+            if has_regressions(comparisons, alpha=args.alpha,
+                               threshold=args.threshold,
+                               memory_tolerance=args.memory_tolerance):
+                sys.exit(1)
+        else:
+            raise NotImplementedError(args.command)
+
+# }}}
+
+# vim: fdm=marker
@@ -0,0 +1,234 @@
+"""
+Probes for the roofline of the device an array context executes on.
+
+.. autoclass:: MachineRoofline
+.. autofunction:: measure_roofline
+"""
+import dataclasses as dc
+import numpy as np
+
+from typing import TYPE_CHECKING, Any, Callable, Tuple
+
+from feinsum_evaluation.timing import time_callable
+from feinsum_evaluation.utils import is_opencl_actx, is_jax_actx, is_numpy_actx
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+@dc.dataclass(frozen=True)
+class MachineRoofline:
+    """
+    .. attribute:: peak_flop_rate
+
+        Achieved floating point operations per second of the compute peak
+        probe.
+
+    .. attribute:: peak_bandwidth
+
+        Achieved bytes per second of the STREAM-triad probe.
+    """
+    peak_flop_rate: float
+    peak_bandwidth: float
+
+    @property
+    def ridge_point(self) -> float:
+        """
+        Arithmetic intensity (in FLOPs/byte) at which a kernel transitions from
+        being bandwidth bound to being compute bound.
+        """
+        return self.peak_flop_rate / self.peak_bandwidth
+
+    def get_attainable_flop_rate(self, arithmetic_intensity: float) -> float:
+        return min(self.peak_flop_rate,
+                   arithmetic_intensity * self.peak_bandwidth)
+
+
+def _get_rate(f: Callable[..., Any], args: Tuple[Any, ...],
+              synchronize: Callable[[Any], None], work: float) -> float:
+    timing = time_callable(f, args, synchronize=synchronize, max_time=2)
+    return work / timing.median
+
+
+# {{{ OpenCL probes
+
+# Independent chains of FMAs so that the probe is bound by the FMA throughput
+# and not by the latency of a single chain.
+_FMA_PEAK_NCHAINS = 8
+_FMA_PEAK_NITERS = 256
+_FMA_PEAK_KERNEL = """
+#if __OPENCL_C_VERSION__ < 120
+#pragma OPENCL EXTENSION cl_khr_fp64: enable
+#endif
+
+__kernel void fma_peak(__global %(ctype)s *out, %(ctype)s a, %(ctype)s b)
+{
+    const %(ctype)s x = get_global_id(0);
+    %(decls)s
+
+    for (int i = 0; i < %(niters)d; ++i)
+    {
+        %(fmas)s
+    }
+
+    out[get_global_id(0)] = %(sum)s;
+}
+"""
+
+
+def _get_fma_peak_kernel_source(ctype: str) -> str:
+    return _FMA_PEAK_KERNEL % {
+        "ctype": ctype,
+        "decls": "\n    ".join(f"{ctype} x{i} = x + {i};"
+                               for i in range(_FMA_PEAK_NCHAINS)),
+        "niters": _FMA_PEAK_NITERS,
+        "fmas": "\n        ".join(f"x{i} = fma(x{i}, a, b);"
+                                  for i in range(_FMA_PEAK_NCHAINS)),
+        "sum": " + ".join(f"x{i}" for i in range(_FMA_PEAK_NCHAINS)),
+    }
+
+
+def _measure_cl_roofline(queue: Any, nelements: int,
+                         dtype: "np.dtype[Any]") -> MachineRoofline:
+    import pyopencl as cl
+    import pyopencl.array as cla
+    from pyopencl.elementwise import ElementwiseKernel
+    from pyopencl.tools import dtype_to_ctype
+
+    def synchronize(result: Any) -> None:
+        queue.finish()
+
+    ctype = dtype_to_ctype(dtype)
+
+    # {{{ compute peak
+
+    nwork_items = 1 << 20
+    out = cla.empty(queue, nwork_items, dtype)
+    fma_peak = cl.Program(queue.context,
+                          _get_fma_peak_kernel_source(ctype)).build().fma_peak
+
+    peak_flop_rate = _get_rate(
+        lambda: fma_peak(queue, (nwork_items,), None, out.data,
+                         dtype.type(0.999), dtype.type(1e-3)),
+        (), synchronize,
+        2 * _FMA_PEAK_NCHAINS * _FMA_PEAK_NITERS * nwork_items)
+
+    # }}}
+
+    # {{{ bandwidth
+
+    a = cla.empty(queue, nelements, dtype)
+    b = cla.to_device(queue, np.random.rand(nelements).astype(dtype))
+    c = cla.to_device(queue, np.random.rand(nelements).astype(dtype))
+    triad = ElementwiseKernel(queue.context,
+                              f"{ctype} *a, {ctype} *b, {ctype} *c, {ctype} s",
+                              "a[i] = b[i] + s*c[i]",
+                              f"stream_triad_{ctype}")
+
+    peak_bandwidth = _get_rate(
+        lambda: triad(a, b, c, dtype.type(3.0)),
+        (), synchronize,
+        3 * a.nbytes)
+
+    # }}}
+
+    return MachineRoofline(peak_flop_rate=peak_flop_rate,
+                           peak_bandwidth=peak_bandwidth)
+
+# }}}
+
+
+# {{{ JAX probes
+
+def _measure_jax_roofline(nelements: int,
+                          dtype: "np.dtype[Any]") -> MachineRoofline:
+    import jax
+    import jax.numpy as jnp
+
+    def synchronize(result: Any) -> None:
+        result.block_until_ready()
+
+    # {{{ compute peak
+
+    n = 4096
+    a = jnp.asarray(np.random.rand(n, n).astype(dtype))
+    b = jnp.asarray(np.random.rand(n, n).astype(dtype))
+    peak_flop_rate = _get_rate(jax.jit(jnp.matmul), (a, b), synchronize,
+                               2 * n**3)
+
+    # }}}
+
+    # {{{ bandwidth
+
+    b = jnp.asarray(np.random.rand(nelements).astype(dtype))
+    c = jnp.asarray(np.random.rand(nelements).astype(dtype))
+    peak_bandwidth = _get_rate(jax.jit(lambda b, c: b + 3.0 * c), (b, c),
+                               synchronize, 3 * b.nbytes)
+
+    # }}}
+
+    return MachineRoofline(peak_flop_rate=peak_flop_rate,
+                           peak_bandwidth=peak_bandwidth)
+
+# }}}
+
+
+# {{{ NumPy probes
+
+def _measure_numpy_roofline(nelements: int,
+                            dtype: "np.dtype[Any]") -> MachineRoofline:
+    def synchronize(result: Any) -> None:
+        pass
+
+    # {{{ compute peak
+
+    n = 4096
+    a = np.random.rand(n, n).astype(dtype)
+    b = np.random.rand(n, n).astype(dtype)
+    out = np.empty((n, n), dtype=dtype)
+    peak_flop_rate = _get_rate(lambda: np.matmul(a, b, out=out), (),
+                               synchronize, 2 * n**3)
+
+    # }}}
+
+    # {{{ bandwidth
+
+    # NumPy has no fused triad and the two passes of "a = b; a += s*c" would
+    # move 5 arrays, hence the bandwidth is probed with a copy.
+    b = np.random.rand(nelements).astype(dtype)
+    a = np.empty_like(b)
+    peak_bandwidth = _get_rate(lambda: np.copyto(a, b), (), synchronize,
+                               2 * a.nbytes)
+
+    # }}}
+
+    return MachineRoofline(peak_flop_rate=peak_flop_rate,
+                           peak_bandwidth=peak_bandwidth)
+
+# }}}
+
+
+def measure_roofline(actx: "ArrayContext",
+                     nelements: int = 1 << 25,
+                     dtype: Any = np.float64) -> MachineRoofline:
+    """
+    Returns the :class:`MachineRoofline` of the device on which *actx*
+    executes for floating point operations in *dtype*.
+
+    For OpenCL array contexts the compute peak is probed with a kernel of
+    independent FMA chains, since an untuned OpenCL GEMM is far from the
+    device's peak. For JAX and NumPy array contexts, it is probed with a
+    GEMM. The bandwidth is probed with a STREAM triad (a copy for NumPy)
+    over arrays of *nelements* entries of *dtype*.
+    """
+    dtype = np.dtype(dtype)
+    if is_opencl_actx(actx):
+        return _measure_cl_roofline(actx.queue, nelements, dtype)
+    elif is_jax_actx(actx):
+        return _measure_jax_roofline(nelements, dtype)
+    elif is_numpy_actx(actx):
+        return _measure_numpy_roofline(nelements, dtype)
+    else:
+        raise NotImplementedError(type(actx))
+
+# vim: fdm=marker
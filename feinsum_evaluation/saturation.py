@@ -0,0 +1,60 @@
+"""
+Detection of the batch size beyond which batching more einsums into a single
+call stops improving the throughput per einsum.
+
+.. autofunction:: get_geometric_batches
+.. autofunction:: is_saturated
+.. autofunction:: get_saturation_batch
+"""
+import math
+
+from typing import List, Sequence
+
+
+# number of consecutive batch sizes that must fail to improve the throughput
+# before the sweep is stopped, so that a single noisy cell does not end it
+SATURATION_PATIENCE = 2
+
+
+def get_geometric_batches(max_nbatch: int, factor: float = 2) -> List[int]:
+    """
+    Returns the batch sizes growing geometrically by *factor* from 1 to
+    *max_nbatch*. *max_nbatch* is always included.
+    """
+    batches = []
+    nbatch = 1
+    while nbatch < max_nbatch:
+        if not batches or nbatch > batches[-1]:
+            batches.append(nbatch)
+        nbatch = math.ceil(nbatch * factor)
+
+    return batches + [max_nbatch]
+
+
+def is_saturated(throughputs: Sequence[float], tolerance: float) -> bool:
+    """
+    Returns *True* if none of the last :data:`SATURATION_PATIENCE`
+    throughputs of a sweep over increasing batch sizes improves on the best
+    of the preceding ones by more than *tolerance*, relative.
+    """
+    if len(throughputs) <= SATURATION_PATIENCE:
+        return False
+
+    best = max(throughputs[:-SATURATION_PATIENCE])
+    return all(throughput <= (1 + tolerance) * best
+               for throughput in throughputs[-SATURATION_PATIENCE:])
+
+
+def get_saturation_batch(batches: Sequence[int],
+                         throughputs: Sequence[float],
+                         tolerance: float) -> int:
+    """
+    Returns the smallest of *batches* whose throughput is within *tolerance*,
+    relative, of the best throughput.
+    """
+    best = max(throughputs)
+    return min(nbatch
+               for nbatch, throughput in zip(batches, throughputs, strict=True)
+               if throughput >= (1 - tolerance) * best)
+
+# vim: fdm=marker
@@ -0,0 +1,168 @@
+"""
+Helpers to size the benchmarked problems from a memory budget rather than
+from a table of element counts tuned for a single device.
+
+.. autofunction:: parse_nbytes
+.. autofunction:: get_working_set_size
+.. autofunction:: get_nel_for_memory_budget
+.. autofunction:: get_weak_scaling_nels
+.. autofunction:: get_host_memory_size
+.. autofunction:: get_cache_sizes
+.. autofunction:: get_memory_level
+"""
+import math
+import os
+import re
+
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from feinsum_evaluation.kernels import AnyKernel, get_axis_lengths
+from feinsum_evaluation.utils import is_opencl_actx, is_jax_actx, is_numpy_actx
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+_SIZE_SUFFIXES = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_nbytes(value: str) -> int:
+    """
+    Parses sizes like ``"512M"``, ``"2GiB"`` or ``"1048576"`` into a number
+    of bytes. The suffixes are powers of 1024.
+    """
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([KMGT]?)(i?B)?\s*", value,
+                         re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Cannot parse '{value}' as a number of bytes.")
+    return int(float(match.group(1)) * _SIZE_SUFFIXES[match.group(2).upper()])
+
+
+def get_working_set_size(knl: AnyKernel, nbatch: int, ni: int,
+                         nj: Optional[int], nel: int) -> int:
+    """
+    Returns the number of bytes occupied by the operands and results of a call
+    to *knl*.
+    """
+    return knl.get_working_set_size(nbatch,
+                                    get_axis_lengths(ni=ni, nj=nj, nel=nel))
+
+
+def get_nel_for_memory_budget(knl: AnyKernel, nbatch: int, ni: int,
+                              nj: Optional[int], memory_budget: int) -> int:
+    """
+    Returns the largest number of elements for which the working set of a
+    call to *knl* fits in *memory_budget* bytes.
+    """
+    # the working set is affine in the number of elements
+    fixed_size = get_working_set_size(knl, nbatch, ni, nj, nel=0)
+    per_element_size = get_working_set_size(knl, nbatch, ni, nj,
+                                            nel=1) - fixed_size
+    nel = (memory_budget - fixed_size) // per_element_size
+    if nel < 1:
+        raise ValueError(f"Memory budget of {memory_budget} bytes is too small"
+                         f" for a single element of '{knl.name}' with"
+                         f" {nbatch} batches.")
+    return nel
+
+
+def get_weak_scaling_nels(knl: AnyKernel, nbatch: int, ni: int,
+                          nj: Optional[int], *,
+                          min_working_set_size: int,
+                          max_working_set_size: int,
+                          factor: float = 2) -> List[int]:
+    """
+    Returns the element counts for which the working set of *knl* grows
+    geometrically by *factor* from *min_working_set_size* to
+    *max_working_set_size* bytes. The largest element count that fits in
+    *max_working_set_size* is always included.
+    """
+    nels = []
+    working_set_size = min_working_set_size
+    while working_set_size < max_working_set_size:
+        nel = get_nel_for_memory_budget(knl, nbatch, ni, nj, working_set_size)
+        if not nels or nel > nels[-1]:
+            nels.append(nel)
+        working_set_size = math.ceil(working_set_size * factor)
+
+    nel = get_nel_for_memory_budget(knl, nbatch, ni, nj, max_working_set_size)
+    if not nels or nel > nels[-1]:
+        nels.append(nel)
+
+    return nels
+
+
+def get_host_memory_size() -> Optional[int]:
+    """
+    Returns the number of bytes of the host's physical memory, or *None* if
+    the platform does not expose it.
+    """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _get_host_cache_sizes() -> List[Tuple[str, int]]:
+    # Linux exposes the CPU's cache hierarchy through sysfs.
+    cache_dir = "/sys/devices/system/cpu/cpu0/cache"
+    cache_sizes = {}
+    if not os.path.isdir(cache_dir):
+        return []
+
+    for index in sorted(os.listdir(cache_dir)):
+        if not index.startswith("index"):
+            continue
+        try:
+            with open(os.path.join(cache_dir, index, "type")) as fp:
+                cache_type = fp.read().strip()
+            with open(os.path.join(cache_dir, index, "level")) as fp:
+                level = int(fp.read())
+            with open(os.path.join(cache_dir, index, "size")) as fp:
+                size = parse_nbytes(fp.read())
+        except (OSError, ValueError):
+            continue
+
+        if cache_type in ("Data", "Unified"):
+            cache_sizes[f"L{level}"] = size
+
+    return sorted(cache_sizes.items(), key=lambda k: k[1])
+
+
+def get_cache_sizes(actx: "ArrayContext") -> List[Tuple[str, int]]:
+    """
+    Returns ``(level, size_in_bytes)`` of the caches of the device on which
+    *actx* executes, in increasing order of size. Returns an empty list if
+    the cache hierarchy is unknown.
+    """
+    if is_opencl_actx(actx):
+        import pyopencl as cl
+        device = actx.queue.device
+        if device.type & cl.device_type.CPU:
+            return _get_host_cache_sizes()
+        else:
+            return [("L2", device.global_mem_cache_size)]
+    elif is_jax_actx(actx):
+        import jax
+        if jax.devices()[0].platform == "cpu":
+            return _get_host_cache_sizes()
+        else:
+            return []
+    elif is_numpy_actx(actx):
+        return _get_host_cache_sizes()
+    else:
+        raise NotImplementedError(type(actx))
+
+
+def get_memory_level(nbytes: int,
+                     cache_sizes: Sequence[Tuple[str, int]]) -> str:
+    """
+    Returns the smallest level of the memory hierarchy that can hold
+    *nbytes*.
+    """
+    for level, size in cache_sizes:
+        if nbytes <= size:
+            return level
+    return "DRAM"
+
+# vim: fdm=marker
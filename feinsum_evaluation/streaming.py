@@ -0,0 +1,792 @@
+"""
+Out-of-core evaluation of the DG-kernels over meshes larger than the device
+memory.
+
+The inputs of the mesh are held on the host, see :func:`get_host_nbytes`.
+They are generated on the host chunk by chunk so that generating them needs
+no memory beyond the mesh itself. The element axis is split into
+chunks, which are streamed through the device: the transfer of a chunk's
+inputs to the device, the compiled kernel on the chunk and the transfer of
+its outputs back to the host are enqueued on three separate command queues,
+and :data:`NCHUNK_SLOTS` chunks are in flight at once, so that the
+transfers of a chunk overlap with the computation of its neighbors. The
+operands without an element axis, for ex. the reference matrices, are
+transferred once and stay resident.
+
+Only the kernels whose operands do not index elements, see
+:func:`is_element_local`, on the OpenCL array contexts, see
+:data:`STREAMING_ACTX_NAMES`, are supported.
+
+.. autodata:: STREAMING_ACTX_NAMES
+.. autofunction:: is_element_local
+.. autofunction:: get_chunk_nel
+.. autofunction:: get_host_nbytes
+.. autoclass:: StreamingResult
+.. autofunction:: run_streaming
+.. autofunction:: main
+"""
+import argparse
+import dataclasses as dc
+import math
+import sys
+import numpy as np
+
+from time import perf_counter_ns
+from tabulate import tabulate
+from typing import (TYPE_CHECKING, Any, Callable, Dict, List, Mapping,
+                    Optional, Sequence, Tuple)
+
+from pytools.obj_array import make_obj_array
+
+from feinsum_evaluation.kernels import (KERNELS, DGKernel, Operand,
+                                        generate_random_inputs,
+                                        generate_random_input_slice,
+                                        get_axis_lengths)
+from feinsum_evaluation.layouts import ELEMENT_AXIS
+from feinsum_evaluation.precision import PRECISIONS, DEFAULT_PRECISION
+from feinsum_evaluation.sizing import (parse_nbytes, get_nel_for_memory_budget,
+                                       get_host_memory_size)
+from feinsum_evaluation.driver import get_problem_sizes
+from feinsum_evaluation.utils import (ACTX_CLASS_PATHS, get_actx_class,
+                                      instantiate_actx_t,
+                                      parse_comma_separated,
+                                      parse_comma_separated_ints)
+from feinsum_evaluation.workers import (TaskFailure, run_isolated,
+                                        drop_failures)
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+# seed of the inputs on the host, shared by all array contexts
+INPUT_SEED = 0
+
+#: Names of the array contexts the kernels can be streamed on, i.e. the
+#: ones whose arrays live in OpenCL buffers.
+STREAMING_ACTX_NAMES = frozenset({"pyopencl", "pytato:batched_einsum"})
+
+# Number of chunks in flight at once, i.e. double buffering: while a chunk
+# is computed, the inputs of the next one are transferred to the device and
+# the outputs of the previous one to the host.
+NCHUNK_SLOTS = 2
+
+# the meshes are streamed in float64
+PRECISION = PRECISIONS[DEFAULT_PRECISION]
+
+# fraction of the host's physical memory the mesh may occupy unless a host
+# memory budget is given
+HOST_MEMORY_FRACTION = 0.75
+
+
+# {{{ chunking
+
+def is_element_local(knl: DGKernel) -> bool:
+    """
+    Returns *True* if every output entry of *knl* on an element only
+    depends on the inputs on the same element, i.e. if none of its operands
+    is an index array, so that *knl* can be evaluated chunk by chunk.
+    """
+    return all(operand.dtype is None for operand in knl.operands)
+
+
+def get_chunk_nel(knl: DGKernel, nbatch: int, ni: int, nj: Optional[int], *,
+                  device_memory: int,
+                  max_alloc_size: int,
+                  memory_fraction: float = 0.5) -> int:
+    """
+    Returns the largest number of elements per chunk for which the
+    :data:`NCHUNK_SLOTS` chunks in flight use at most *memory_fraction* of
+    *device_memory* bytes and no array of a chunk exceeds *max_alloc_size*
+    bytes. The remaining memory is left to the temporaries of the compiled
+    kernel.
+    """
+    chunk_nel = get_nel_for_memory_budget(
+        knl, nbatch, ni, nj,
+        int(memory_fraction * device_memory) // NCHUNK_SLOTS)
+
+    axis_lens = get_axis_lengths(ni=ni, nj=nj, nel=1)
+    per_element_sizes = [
+        math.prod(knl.get_operand_shape(operand, axis_lens))
+        * operand.get_dtype(PRECISION).itemsize
+        for operand in knl.operands
+        if ELEMENT_AXIS in operand.axes]
+    per_element_sizes.append(math.prod(knl.get_output_shape(axis_lens))
+                             * PRECISION.output_dtype.itemsize)
+
+    return max(min(chunk_nel, max_alloc_size // max(per_element_sizes)), 1)
+
+
+def get_host_nbytes(knl: DGKernel, nbatch: int, ni: int, nj: Optional[int],
+                    nel: int, chunk_nel: int) -> int:
+    """
+    Returns the number of bytes of host memory taken by streaming *knl* over
+    a mesh of *nel* elements in chunks of *chunk_nel* elements, i.e. by the
+    inputs and outputs of the mesh and the page-locked staging buffers of
+    the :data:`NCHUNK_SLOTS` chunks in flight.
+    """
+    return (knl.get_working_set_size(
+                nbatch, get_axis_lengths(ni=ni, nj=nj, nel=nel), PRECISION)
+            + NCHUNK_SLOTS * knl.get_working_set_size(
+                nbatch, get_axis_lengths(ni=ni, nj=nj, nel=chunk_nel),
+                PRECISION))
+
+
+def _get_chunk_slice(axes: Sequence[str], start: int,
+                     stop: int) -> Tuple[slice, ...]:
+    return ((slice(None),) * list(axes).index(ELEMENT_AXIS)
+            + (slice(start, stop),))
+
+
+def _generate_host_args(knl: DGKernel, nbatch: int,
+                        axis_lens: Mapping[str, int],
+                        chunk_nel: int) -> Tuple[np.ndarray, ...]:
+    # Same as generate_random_inputs on the NumPy array context, i.e. with
+    # the batch members stacked along a leading axis, but generated chunk by
+    # chunk into the arrays, so that the temporaries of the generation are
+    # bounded by a chunk rather than by the mesh.
+    host_args = []
+    for ioperand, operand in enumerate(knl.operands):
+        dtype = operand.get_dtype(PRECISION)
+        shape = knl.layout.get_storage_shape(
+            operand.axes, knl.get_operand_shape(operand, axis_lens), dtype)
+        ary = np.empty((nbatch, *shape) if operand.is_batched else shape,
+                       dtype=dtype)
+        members = ([ary[ibatch] for ibatch in range(nbatch)]
+                   if operand.is_batched
+                   else [ary])
+        if ELEMENT_AXIS in operand.axes:
+            nel = axis_lens[ELEMENT_AXIS]
+            chunk_slices = [_get_chunk_slice(operand.axes, start,
+                                             min(start + chunk_nel, nel))
+                            for start in range(0, nel, chunk_nel)]
+        else:
+            chunk_slices = [()]
+        for ibatch, member in enumerate(members):
+            for chunk_slice in chunk_slices:
+                member[chunk_slice] = generate_random_input_slice(
+                    knl, ioperand, ibatch, axis_lens, chunk_slice,
+                    seed=INPUT_SEED, precision=PRECISION)
+        host_args.append(ary)
+
+    return tuple(host_args)
+
+# }}}
+
+
+# {{{ pipeline
+
+def _map_pinned(queue: Any, nbytes: int) -> Tuple[Any, np.ndarray]:
+    # Page-locked host memory, which the device can copy from and to
+    # asynchronously. The buffer must outlive the mapped array.
+    import pyopencl as cl
+    buf = cl.Buffer(queue.context,
+                    cl.mem_flags.READ_WRITE | cl.mem_flags.ALLOC_HOST_PTR,
+                    max(nbytes, 1))
+    mapped, _ = cl.enqueue_map_buffer(
+        queue, buf, cl.map_flags.READ | cl.map_flags.WRITE,
+        0, (max(nbytes, 1),), np.uint8, is_blocking=True)
+    return buf, mapped
+
+
+def _as_shaped(mapped: np.ndarray, shape: Tuple[int, ...],
+               dtype: "np.dtype[Any]") -> np.ndarray:
+    nbytes = math.prod(shape) * dtype.itemsize
+    return mapped[:nbytes].view(dtype).reshape(shape)
+
+
+@dc.dataclass
+class _ChunkSlot:
+    # pinned host staging and device buffers of one chunk in flight, sized
+    # for the largest chunk
+    input_staging: List[Tuple[Any, np.ndarray]]
+    input_buffers: List[Any]
+    output_staging: List[Tuple[Any, np.ndarray]]
+    h2d_events: List[Any] = dc.field(default_factory=list)
+    compute_event: Any = None
+    d2h_events: List[Any] = dc.field(default_factory=list)
+    # device outputs of the last computed chunk
+    outputs: Any = None
+    # chunk whose outputs are being read back, and its device outputs, which
+    # are kept alive until then
+    istaged_chunk: Optional[int] = None
+    staged_outputs: Any = None
+
+
+@dc.dataclass(frozen=True)
+class _PhaseTimes:
+    h2d_time: float
+    compute_time: float
+    d2h_time: float
+    total_time: float
+
+
+class _ChunkPipeline:
+    def __init__(self, actx: "ArrayContext", knl: DGKernel, nbatch: int,
+                 ni: int, nj: Optional[int], nel: int, chunk_nel: int,
+                 host_args: Sequence[np.ndarray]) -> None:
+        import pyopencl as cl
+        import pyopencl.array as cla
+
+        self.actx = actx
+        self.knl = knl
+        self.nbatch = nbatch
+        self.ni = ni
+        self.nj = nj
+        self.nel = nel
+        self.chunk_nel = chunk_nel
+        self.host_args = host_args
+
+        queue = actx.queue
+        self.h2d_queue = cl.CommandQueue(queue.context, queue.device)
+        self.d2h_queue = cl.CommandQueue(queue.context, queue.device)
+
+        self.streamed_operands = [
+            (ioperand, operand)
+            for ioperand, operand in enumerate(knl.operands)
+            if ELEMENT_AXIS in operand.axes]
+        # the operands without an element axis are transferred once
+        self.resident_args = {
+            ioperand: (make_obj_array([actx.from_numpy(ary)
+                                       for ary in host_args[ioperand]])
+                       if operand.is_batched
+                       else actx.from_numpy(host_args[ioperand]))
+            for ioperand, operand in enumerate(knl.operands)
+            if ELEMENT_AXIS not in operand.axes}
+
+        chunk_axis_lens = get_axis_lengths(ni=ni, nj=nj, nel=chunk_nel)
+        output_nbytes = (math.prod(knl.get_output_shape(chunk_axis_lens))
+                         * PRECISION.output_dtype.itemsize)
+        self.slots = []
+        for _ in range(NCHUNK_SLOTS):
+            input_staging = []
+            input_buffers = []
+            for _, operand in self.streamed_operands:
+                nbytes = (math.prod(knl.get_operand_shape(operand,
+                                                          chunk_axis_lens))
+                          * operand.get_dtype(PRECISION).itemsize)
+                for _ in range(nbatch if operand.is_batched else 1):
+                    input_staging.append(_map_pinned(queue, nbytes))
+                    input_buffers.append(cla.empty(queue, nbytes, np.uint8,
+                                                   allocator=actx.allocator))
+            self.slots.append(_ChunkSlot(
+                input_staging=input_staging,
+                input_buffers=input_buffers,
+                output_staging=[_map_pinned(queue, output_nbytes)
+                                for _ in range(nbatch)]))
+
+        self.host_outputs = [
+            np.empty(knl.get_output_shape(get_axis_lengths(ni=ni, nj=nj,
+                                                           nel=nel)),
+                     dtype=PRECISION.output_dtype)
+            for _ in range(nbatch)]
+        self._compiled: Dict[int, Callable[..., Any]] = {}
+
+    @property
+    def nchunks(self) -> int:
+        return -(-self.nel // self.chunk_nel)
+
+    def _get_chunk_bounds(self, ichunk: int) -> Tuple[int, int]:
+        start = ichunk * self.chunk_nel
+        return start, min(start + self.chunk_nel, self.nel)
+
+    def _get_compiled(self, nel: int) -> Callable[..., Any]:
+        # the last chunk may be shorter and is compiled separately
+        try:
+            return self._compiled[nel]
+        except KeyError:
+            compiled = self.knl.compile(
+                self.actx, get_axis_lengths(ni=self.ni, nj=self.nj, nel=nel))
+            self._compiled[nel] = compiled
+            return compiled
+
+    def _get_host_chunks(self, operand: Operand, host_arg: np.ndarray,
+                         start: int, stop: int) -> List[np.ndarray]:
+        if operand.is_batched:
+            # stacked along a leading axis, see generate_random_inputs
+            return [host_arg[(ibatch,)
+                             + _get_chunk_slice(operand.axes, start, stop)]
+                    for ibatch in range(self.nbatch)]
+        else:
+            return [host_arg[_get_chunk_slice(operand.axes, start, stop)]]
+
+    def enqueue_h2d(self, ichunk: int, *, wait: bool = False) -> None:
+        import pyopencl as cl
+
+        slot = self.slots[ichunk % NCHUNK_SLOTS]
+        start, stop = self._get_chunk_bounds(ichunk)
+        # the staging buffers are refilled once their previous chunk has
+        # been sent
+        if slot.h2d_events:
+            cl.wait_for_events(slot.h2d_events)
+
+        compute_events = ([]
+                          if slot.compute_event is None
+                          else [slot.compute_event])
+        host_chunks = [
+            chunk
+            for ioperand, operand in self.streamed_operands
+            for chunk in self._get_host_chunks(operand,
+                                               self.host_args[ioperand],
+                                               start, stop)]
+        slot.h2d_events = []
+        for host_chunk, (_, mapped), buf in zip(host_chunks,
+                                                slot.input_staging,
+                                                slot.input_buffers,
+                                                strict=True):
+            staged = _as_shaped(mapped, host_chunk.shape, host_chunk.dtype)
+            np.copyto(staged, host_chunk)
+            # the device buffers are overwritten once the computation on
+            # their previous chunk has completed
+            slot.h2d_events.append(cl.enqueue_copy(
+                self.h2d_queue, buf.base_data, staged,
+                device_offset=buf.offset,
+                wait_for=compute_events, is_blocking=False))
+
+        if wait and slot.h2d_events:
+            cl.wait_for_events(slot.h2d_events)
+
+    def enqueue_compute(self, ichunk: int, *, wait: bool = False) -> None:
+        import pyopencl as cl
+        import pyopencl.array as cla
+
+        actx = self.actx
+        slot = self.slots[ichunk % NCHUNK_SLOTS]
+        start, stop = self._get_chunk_bounds(ichunk)
+        chunk_axis_lens = get_axis_lengths(ni=self.ni, nj=self.nj,
+                                           nel=stop - start)
+
+        ibuf = 0
+        args: Dict[int, Any] = dict(self.resident_args)
+        for ioperand, operand in self.streamed_operands:
+            shape = self.knl.get_operand_shape(operand, chunk_axis_lens)
+            dtype = operand.get_dtype(PRECISION)
+            arrays = []
+            for _ in range(self.nbatch if operand.is_batched else 1):
+                arrays.append(actx.thaw(cla.Array(
+                    actx.queue, shape, dtype,
+                    data=slot.input_buffers[ibuf].base_data,
+                    offset=slot.input_buffers[ibuf].offset)))
+                ibuf += 1
+            args[ioperand] = (make_obj_array(arrays)
+                              if operand.is_batched
+                              else arrays[0])
+
+        # orders the kernel after the transfer of its inputs
+        cl.enqueue_barrier(actx.queue, wait_for=slot.h2d_events)
+        slot.outputs = self._get_compiled(stop - start)(
+            *(args[ioperand] for ioperand in range(len(self.knl.operands))))
+        slot.compute_event = cl.enqueue_marker(actx.queue)
+
+        if wait:
+            slot.compute_event.wait()
+
+    def _unstage_outputs(self, slot: _ChunkSlot) -> None:
+        import pyopencl as cl
+
+        if slot.istaged_chunk is None:
+            return
+
+        cl.wait_for_events(slot.d2h_events)
+        start, stop = self._get_chunk_bounds(slot.istaged_chunk)
+        output_slice = _get_chunk_slice(self.knl.output_axes, start, stop)
+        for host_output, (_, mapped) in zip(self.host_outputs,
+                                            slot.output_staging, strict=True):
+            chunk = host_output[output_slice]
+            chunk[...] = _as_shaped(mapped, chunk.shape, chunk.dtype)
+
+        # releases the device outputs to the memory pool
+        slot.istaged_chunk = None
+        slot.staged_outputs = None
+
+    def enqueue_d2h(self, ichunk: int, *, wait: bool = False) -> None:
+        import pyopencl as cl
+        import pyopencl.array as cla
+
+        slot = self.slots[ichunk % NCHUNK_SLOTS]
+        # the staging buffers are refilled once their previous chunk has
+        # been received
+        self._unstage_outputs(slot)
+
+        slot.d2h_events = []
+        for output, (_, mapped) in zip(slot.outputs, slot.output_staging,
+                                       strict=True):
+            if not isinstance(output, cla.Array):
+                # thawed by a lazy array context
+                output = output.data
+            if not output.flags.c_contiguous:
+                raise ValueError("Streaming requires C-contiguous outputs.")
+            staged = _as_shaped(mapped, output.shape, output.dtype)
+            slot.d2h_events.append(cl.enqueue_copy(
+                self.d2h_queue, staged, output.base_data,
+                device_offset=output.offset,
+                wait_for=[slot.compute_event], is_blocking=False))
+        slot.istaged_chunk = ichunk
+        slot.staged_outputs, slot.outputs = slot.outputs, None
+
+        if wait:
+            self._unstage_outputs(slot)
+
+    def finish(self) -> None:
+        for slot in self.slots:
+            self._unstage_outputs(slot)
+
+    def run_streamed(self, ichunks: Sequence[int]) -> float:
+        """
+        Returns the time (in seconds) to stream the consecutive chunks
+        *ichunks* through the device, with the transfers of every chunk
+        overlapping the computation of its neighbors.
+        """
+        t_start = perf_counter_ns()
+        self.enqueue_h2d(ichunks[0])
+        for i, ichunk in enumerate(ichunks):
+            if i + 1 < len(ichunks):
+                self.enqueue_h2d(ichunks[i + 1])
+            self.enqueue_compute(ichunk)
+            self.enqueue_d2h(ichunk)
+        self.finish()
+
+        return (perf_counter_ns() - t_start) * 1e-9
+
+    def run_serialized(self) -> _PhaseTimes:
+        """
+        Returns the times of the phases of processing every chunk one phase
+        at a time, i.e. without any overlap.
+        """
+        h2d_time = compute_time = d2h_time = 0.
+        t_start = perf_counter_ns()
+        for ichunk in range(self.nchunks):
+            t_phase = perf_counter_ns()
+            self.enqueue_h2d(ichunk, wait=True)
+            t_h2d = perf_counter_ns()
+            self.enqueue_compute(ichunk, wait=True)
+            t_compute = perf_counter_ns()
+            self.enqueue_d2h(ichunk, wait=True)
+            t_d2h = perf_counter_ns()
+
+            h2d_time += (t_h2d - t_phase) * 1e-9
+            compute_time += (t_compute - t_h2d) * 1e-9
+            d2h_time += (t_d2h - t_compute) * 1e-9
+
+        return _PhaseTimes(h2d_time=h2d_time,
+                           compute_time=compute_time,
+                           d2h_time=d2h_time,
+                           total_time=(perf_counter_ns() - t_start) * 1e-9)
+
+# }}}
+
+
+@dc.dataclass(frozen=True)
+class StreamingResult:
+    """
+    Performance of streaming a mesh through the device, see
+    :func:`run_streaming`.
+
+    .. attribute:: actx
+    .. attribute:: kernel
+    .. attribute:: nbatch
+    .. attribute:: ni
+    .. attribute:: nj
+    .. attribute:: nel
+    .. attribute:: chunk_nel
+
+        Number of elements per chunk.
+
+    .. attribute:: device_memory_ratio
+
+        Ratio of the working set of the kernel on the entire mesh to the
+        device's global memory.
+
+    .. attribute:: h2d_time
+    .. attribute:: compute_time
+    .. attribute:: d2h_time
+
+        Time (in seconds) spent transferring the inputs to the device,
+        computing and transferring the outputs to the host, over all the
+        chunks, when processing them one phase at a time. The transfers
+        include staging on the host.
+
+    .. attribute:: serialized_time
+
+        Time (in seconds) to process all the chunks one phase at a time.
+
+    .. attribute:: streamed_time
+
+        Time (in seconds) to stream all the chunks, with the transfers
+        overlapping the computations.
+    """
+    actx: str
+    kernel: str
+    nbatch: int
+    ni: int
+    nj: Optional[int]
+    nel: int
+    chunk_nel: int
+    device_memory_ratio: float
+    h2d_time: float
+    compute_time: float
+    d2h_time: float
+    serialized_time: float
+    streamed_time: float
+
+    @property
+    def nchunks(self) -> int:
+        return -(-self.nel // self.chunk_nel)
+
+    @property
+    def transfer_time(self) -> float:
+        return self.h2d_time + self.d2h_time
+
+    @property
+    def hidden_transfer_fraction(self) -> float:
+        """
+        Fraction of the transfer time hidden behind the computation: 1 if
+        streaming takes no longer than computing, 0 if it takes as long as
+        processing the chunks one phase at a time.
+        """
+        if self.transfer_time == 0:
+            return 1.
+        saved_time = (self.h2d_time + self.compute_time + self.d2h_time
+                      - self.streamed_time)
+        return min(max(saved_time / self.transfer_time, 0.), 1.)
+
+    @property
+    def dof_updates_per_second(self) -> float:
+        return self.nbatch * self.nel * self.ni / self.streamed_time
+
+
+def run_streaming(actx: "ArrayContext", actx_name: str, knl: DGKernel,
+                  nbatch: int, ni: int, nj: Optional[int], *,
+                  nel: Optional[int] = None,
+                  device_memory_ratio: float = 4,
+                  chunk_nel: Optional[int] = None,
+                  memory_fraction: float = 0.5,
+                  host_memory_budget: Optional[int] = None
+                  ) -> StreamingResult:
+    """
+    Returns the :class:`StreamingResult` of evaluating *knl* over a mesh
+    held on the host, chunk by chunk.
+
+    :arg nel: The number of elements of the mesh. If *None*, the mesh is
+        sized so that the working set of *knl* is *device_memory_ratio* times
+        the device's global memory.
+    :arg chunk_nel: The number of elements per chunk. If *None*, chosen by
+        :func:`get_chunk_nel` with *memory_fraction*.
+    :arg host_memory_budget: The number of bytes of host memory the mesh may
+        occupy, see :func:`get_host_nbytes`. If *None*,
+        :data:`HOST_MEMORY_FRACTION` of the host's physical memory. Raises a
+        :class:`ValueError` before allocating the mesh if it would not fit.
+    """
+    if not is_element_local(knl):
+        raise ValueError(f"Kernel '{knl.name}' gathers across elements and"
+                         " cannot be streamed.")
+    if knl.input_generator is not generate_random_inputs:
+        raise ValueError(f"Inputs of kernel '{knl.name}' cannot be generated"
+                         " chunk by chunk.")
+
+    device = actx.queue.device
+    if nel is None:
+        nel = get_nel_for_memory_budget(
+            knl, nbatch, ni, nj,
+            int(device_memory_ratio * device.global_mem_size))
+    if chunk_nel is None:
+        chunk_nel = get_chunk_nel(knl, nbatch, ni, nj,
+                                  device_memory=device.global_mem_size,
+                                  max_alloc_size=device.max_mem_alloc_size,
+                                  memory_fraction=memory_fraction)
+    chunk_nel = min(chunk_nel, nel)
+
+    if host_memory_budget is None:
+        host_memory_size = get_host_memory_size()
+        if host_memory_size is not None:
+            host_memory_budget = int(HOST_MEMORY_FRACTION * host_memory_size)
+    host_nbytes = get_host_nbytes(knl, nbatch, ni, nj, nel, chunk_nel)
+    if host_memory_budget is not None and host_nbytes > host_memory_budget:
+        raise ValueError(f"Streaming '{knl.name}' over {nel} elements with"
+                         f" {nbatch} batches needs {host_nbytes} bytes of host"
+                         f" memory, exceeding the budget of"
+                         f" {host_memory_budget} bytes. Reduce the mesh size"
+                         " or raise the host memory budget.")
+
+    # identical to the inputs generated on the devices, see
+    # feinsum_evaluation.device_rng
+    host_args = _generate_host_args(knl, nbatch,
+                                    get_axis_lengths(ni=ni, nj=nj, nel=nel),
+                                    chunk_nel)
+
+    pipeline = _ChunkPipeline(actx, knl, nbatch, ni, nj, nel, chunk_nel,
+                              host_args)
+
+    # compiles the kernels of the full and the last chunk
+    for ichunk in sorted({0, pipeline.nchunks - 1}):
+        pipeline.run_streamed([ichunk])
+
+    phase_times = pipeline.run_serialized()
+    streamed_time = pipeline.run_streamed(range(pipeline.nchunks))
+
+    working_set_size = knl.get_working_set_size(
+        nbatch, get_axis_lengths(ni=ni, nj=nj, nel=nel))
+    return StreamingResult(
+        actx=actx_name, kernel=knl.name, nbatch=nbatch, ni=ni, nj=nj,
+        nel=nel, chunk_nel=chunk_nel,
+        device_memory_ratio=working_set_size / device.global_mem_size,
+        h2d_time=phase_times.h2d_time,
+        compute_time=phase_times.compute_time,
+        d2h_time=phase_times.d2h_time,
+        serialized_time=phase_times.total_time,
+        streamed_time=streamed_time)
+
+
+# {{{ command line
+
+@dc.dataclass(frozen=True)
+class _StreamingTask:
+    actx_name: str
+    kernel_names: Tuple[str, ...]
+    batches: Tuple[int, ...]
+    nis: Tuple[int, ...]
+    njs: Tuple[int, ...]
+    nel: Optional[int]
+    device_memory_ratio: float
+    chunk_nel: Optional[int]
+    memory_fraction: float
+    host_memory_budget: Optional[int]
+
+
+def _run_streaming_task(task: _StreamingTask) -> List[StreamingResult]:
+    # runs in a worker process, see main
+    actx = instantiate_actx_t(get_actx_class(task.actx_name))
+
+    results = []
+    for kernel_name in task.kernel_names:
+        knl = KERNELS[kernel_name]
+        for ni, nj in get_problem_sizes(knl, task.nis, task.njs):
+            for nbatch in task.batches:
+                results.append(run_streaming(
+                    actx, task.actx_name, knl, nbatch, ni, nj,
+                    nel=task.nel,
+                    device_memory_ratio=task.device_memory_ratio,
+                    chunk_nel=task.chunk_nel,
+                    memory_fraction=task.memory_fraction,
+                    host_memory_budget=task.host_memory_budget))
+
+    return results
+
+
+def print_streaming_results(results: Sequence[StreamingResult]) -> None:
+    table = [[result.actx, result.kernel, result.nbatch, result.ni,
+              "N/A" if result.nj is None else result.nj,
+              result.nel, f"{result.device_memory_ratio:.1f}x",
+              result.chunk_nel, result.nchunks,
+              f"{result.h2d_time:.3f}",
+              f"{result.compute_time:.3f}",
+              f"{result.d2h_time:.3f}",
+              f"{result.serialized_time:.3f}",
+              f"{result.streamed_time:.3f}",
+              f"{100 * result.hidden_transfer_fraction:.0f}%",
+              f"{result.dof_updates_per_second * 1e-9:.3f}"]
+             for result in results]
+    print(tabulate(table,
+                   headers=["actx", "kernel", "nbatch", "ni", "nj", "nel",
+                            "Device memory", "Chunk nel", "#Chunks",
+                            "H2D (s)", "Compute (s)", "D2H (s)",
+                            "Serialized (s)", "Streamed (s)",
+                            "Transfer hidden", "GDOF-updates/s"]))
+
+
+def main(argv: Sequence[str]) -> None:
+    streamable_kernel_names = [name
+                               for name, knl in KERNELS.items()
+                               if is_element_local(knl)]
+
+    parser = argparse.ArgumentParser(
+        prog="feinsum_evaluation streaming",
+        description=("Stream the DG-kernels over meshes larger than the"
+                     " device memory chunk by chunk, and report how much of"
+                     " the transfers is hidden behind the computation"),
+    )
+    parser.add_argument("--kernels", metavar="K", type=str,
+                        default=",".join(streamable_kernel_names),
+                        help=("comma separated names of the kernels, among"
+                              f" {', '.join(streamable_kernel_names)}."))
+    streaming_actx_names = ", ".join(sorted(STREAMING_ACTX_NAMES))
+    parser.add_argument("--actxs", metavar="A", type=str, required=True,
+                        help=("comma separated names of the array contexts,"
+                              f" among {streaming_actx_names}."))
+    parser.add_argument("--batches", metavar="B", type=str, default="1",
+                        help="comma separated #batches.")
+    parser.add_argument("--ni", metavar="NI", type=str, required=True,
+                        help="comma separated #volume-dofs per element.")
+    parser.add_argument("--nj", metavar="NJ", type=str, default="",
+                        help="comma separated #face-dofs per face.")
+    parser.add_argument("--nel", metavar="NEL", type=int, default=None,
+                        help=("number of elements of the mesh. Overrides"
+                              " '--device-memory-ratio'."))
+    parser.add_argument("--device-memory-ratio", metavar="R", type=float,
+                        default=4,
+                        help=("size the mesh so that the working set of a"
+                              " kernel is R times the device memory."))
+    parser.add_argument("--chunk-nel", metavar="NEL", type=int, default=None,
+                        help=("number of elements per chunk. Chosen from the"
+                              " device memory by default."))
+    parser.add_argument("--memory-fraction", metavar="F", type=float,
+                        default=0.5,
+                        help=("fraction of the device memory used by the"
+                              " chunks in flight when choosing the chunk"
+                              " size."))
+    parser.add_argument("--host-memory-budget", metavar="SIZE", type=str,
+                        default=None,
+                        help=("largest host memory taken by a mesh, for ex."
+                              " '64G'. A mesh that does not fit fails before"
+                              " it is allocated. Defaults to"
+                              f" {100 * HOST_MEMORY_FRACTION:.0f}% of the"
+                              " physical memory."))
+
+    args = parser.parse_args(argv)
+
+    kernel_names = parse_comma_separated(args.kernels)
+    for kernel_name in kernel_names:
+        if kernel_name not in streamable_kernel_names:
+            parser.error(f"kernel '{kernel_name}' cannot be streamed, expected"
+                         f" one of {', '.join(streamable_kernel_names)}.")
+    actx_names = parse_comma_separated(args.actxs)
+    for actx_name in actx_names:
+        if actx_name not in ACTX_CLASS_PATHS:
+            parser.error(f"unknown array context '{actx_name}', expected one of"
+                         f" {', '.join(ACTX_CLASS_PATHS)}.")
+        if actx_name not in STREAMING_ACTX_NAMES:
+            parser.error(f"array context '{actx_name}' does not support"
+                         " streaming.")
+    if not 0 < args.memory_fraction <= 1:
+        parser.error("'--memory-fraction' must be in (0, 1].")
+
+    tasks = [_StreamingTask(
+                actx_name=actx_name,
+                kernel_names=tuple(kernel_names),
+                batches=tuple(parse_comma_separated_ints(args.batches)),
+                nis=tuple(parse_comma_separated_ints(args.ni)),
+                njs=tuple(parse_comma_separated_ints(args.nj)),
+                nel=args.nel,
+                device_memory_ratio=args.device_memory_ratio,
+                chunk_nel=args.chunk_nel,
+                memory_fraction=args.memory_fraction,
+                host_memory_budget=(
+                    None
+                    if args.host_memory_budget is None
+                    else parse_nbytes(args.host_memory_budget)))
+             for actx_name in actx_names]
+
+    # every array context is run in a fresh worker process, as in the
+    # DG-kernel suite
+    outcomes = run_isolated(_run_streaming_task, tasks)
+    results = [result
+               for task_results in drop_failures(
+                   outcomes, describe=lambda task: f"'{task.actx_name}'")
+               for result in task_results]
+    print_streaming_results(results)
+
+    if any(isinstance(outcome, TaskFailure) for outcome in outcomes):
+        sys.exit(1)
+
+# }}}
+
+# vim: fdm=marker
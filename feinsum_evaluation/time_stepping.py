@@ -0,0 +1,479 @@
+"""
+Benchmarks the DG-kernels in the setting of a solver: as the right-hand side
+of a low-storage fourth-order Runge-Kutta integrator, whose every stage feeds
+the state computed by the previous stage back as the input of the next one.
+As opposed to the isolated calls of the DG-kernel suite, this exposes the
+costs of allocating the outputs of every call and of dispatching the
+programs of a step, and hence measures the throughput a simulation would
+see.
+
+The right-hand side of the solution :math:`u` is the divergence of its
+gradient minus its lift from the faces, i.e. the composition of the
+kernels ``xre_rij_ej_to_xei``, ``xre_rij_xej_to_ei`` and
+``gather_ifj_fe_fej_to_ei_sfc`` of :data:`~feinsum_evaluation.kernels.KERNELS`.
+
+.. autoclass:: TimeSteppingResult
+.. autofunction:: run_time_stepping
+.. autofunction:: main
+"""
+import argparse
+import dataclasses as dc
+import itertools
+import sys
+import numpy as np
+
+from functools import partial
+from time import perf_counter_ns
+from tabulate import tabulate
+from typing import (TYPE_CHECKING, Any, Callable, List, Mapping, Optional,
+                    Sequence, Tuple)
+
+from pytools.obj_array import make_obj_array
+
+from feinsum_evaluation.kernels import (KERNELS, NELS, CompositeKernel,
+                                        InputPool, generate_face_gather_inputs,
+                                        get_nel, get_axis_lengths)
+from feinsum_evaluation.memory import CountingAllocator
+from feinsum_evaluation.timing import TimingStatistics, compute_statistics
+from feinsum_evaluation.utils import (ACTX_CLASS_PATHS, GATHER_ACTX_NAMES,
+                                      get_actx_class, instantiate_actx_t,
+                                      is_numpy_actx, synchronize,
+                                      parse_comma_separated,
+                                      parse_comma_separated_ints)
+from feinsum_evaluation.workers import (TaskFailure, run_isolated,
+                                        drop_failures)
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+# seed of the initial state and of the operators, shared by all array
+# contexts
+INPUT_SEED = 0
+
+
+# {{{ low-storage RK4
+
+# Carpenter, Kennedy, "Fourth-order 2N-storage Runge-Kutta schemes", NASA
+# TM-109112 (1994), solution 3
+LSRK4_A = (
+    0.0,
+    -567301805773/1357537059087,
+    -2404267990393/2016746695238,
+    -3550918686646/2091501179385,
+    -1275806237668/842570457699,
+)
+LSRK4_B = (
+    1432997174477/9575080441755,
+    5161836677717/13612068292357,
+    1720146321549/2090206949498,
+    3134564353537/4481467310338,
+    2277821191437/14882151754819,
+)
+
+# }}}
+
+
+# {{{ right-hand side
+
+_GRAD_KNL = KERNELS["xre_rij_ej_to_xei"]
+_DIV_KNL = KERNELS["xre_rij_xej_to_ei"]
+_LIFT_KNL = KERNELS["gather_ifj_fe_fej_to_ei_sfc"]
+
+# Generates the solution and the operators of the right-hand side. The
+# operands of the divergence are the ones of the gradient.
+_RHS_KNL = CompositeKernel(
+    name="lsrk4_rhs",
+    parts=(_GRAD_KNL, _LIFT_KNL),
+    input_generator=partial(generate_face_gather_inputs, ordering="sfc"))
+
+
+def _batch(actx: "ArrayContext", arys: Sequence[Any]) -> Any:
+    # the batched operands on the NumPy array context are stacked, see
+    # DGKernel.compute_stacked
+    if is_numpy_actx(actx):
+        return np.stack(arys)
+    else:
+        return make_obj_array(list(arys))
+
+
+def _evaluate_rhs(actx: "ArrayContext",
+                  u: Any,
+                  *operators: Any,
+                  axis_lens: Mapping[str, int]) -> Any:
+    shared_operands = [operand
+                       for operand in _RHS_KNL.operands
+                       if not operand.is_batched]
+    operand_to_arg = dict(zip(shared_operands, operators, strict=True))
+
+    def _get_args(knl: Any, **batched_args: Any) -> List[Any]:
+        return [batched_args[operand.name]
+                if operand.is_batched
+                else operand_to_arg[operand]
+                for operand in knl.operands]
+
+    grads = _GRAD_KNL(actx, *_get_args(_GRAD_KNL, us=u), axis_lens=axis_lens)
+    divs = _DIV_KNL(actx,
+                    *_get_args(_DIV_KNL,
+                               us=_batch(actx, [grad[0] for grad in grads]),
+                               vs=_batch(actx, [grad[1] for grad in grads]),
+                               ws=_batch(actx, [grad[2] for grad in grads])),
+                    axis_lens=axis_lens)
+    lifts = _LIFT_KNL(actx, *_get_args(_LIFT_KNL, us=u), axis_lens=axis_lens)
+
+    return _batch(actx, [div - lift
+                         for div, lift in zip(divs, lifts, strict=True)])
+
+
+def _lsrk4_stage(actx: "ArrayContext",
+                 u: Any, k: Any,
+                 *operators: Any,
+                 a: float, b: float, dt: float,
+                 axis_lens: Mapping[str, int]) -> np.ndarray:
+    k = a * k + dt * _evaluate_rhs(actx, u, *operators, axis_lens=axis_lens)
+    return make_obj_array([u + b * k, k])
+
+
+def _get_max_abs(ary: Any) -> float:
+    if isinstance(ary, np.ndarray) and ary.dtype == object:
+        # propagates NaNs
+        return float(np.max([_get_max_abs(subary) for subary in ary]))
+    return float(np.max(np.abs(ary)))
+
+
+def _estimate_spectral_radius(actx: "ArrayContext",
+                              rhs: Callable[..., Any],
+                              u: Any,
+                              operators: Sequence[Any], *,
+                              niterations: int = 5) -> float:
+    # power iteration, normalized on the host
+    v = actx.to_numpy(u)
+    v_norm = _get_max_abs(v)
+    radius = 0.
+    for _ in range(niterations):
+        w = actx.to_numpy(rhs(actx.from_numpy(v / v_norm), *operators))
+        radius = _get_max_abs(w)
+        v, v_norm = w, radius
+
+    return radius
+
+# }}}
+
+
+@dc.dataclass(frozen=True)
+class TimeSteppingResult:
+    """
+    Steady-state performance of the low-storage RK4 integrator on an array
+    context.
+
+    .. attribute:: actx
+    .. attribute:: nbatch
+
+        Number of solution components integrated at once, i.e. the batch size
+        of the kernels of the right-hand side.
+
+    .. attribute:: ni
+    .. attribute:: nj
+    .. attribute:: nel
+    .. attribute:: nsteps
+
+        Number of steps taken, including the warm-up steps.
+
+    .. attribute:: dt
+
+        Time step, inversely proportional to the estimated spectral radius of
+        the right-hand side, so that the solution grows by at most a factor
+        of about :math:`e^{\\mathrm{CFL}}` per step and remains finite.
+
+    .. attribute:: first_step_time
+
+        Time (in seconds) of the first step, including the compilation of
+        the stages.
+
+    .. attribute:: step_timing
+
+        :class:`~feinsum_evaluation.timing.TimingStatistics` of the time per
+        step after the warm-up steps.
+
+    .. attribute:: nallocations_per_step
+
+        Number of allocations requested from the memory pool per step after
+        the warm-up steps.
+
+    .. attribute:: allocated_bytes_per_step
+
+        Number of bytes requested from the memory pool per step after the
+        warm-up steps.
+
+    .. attribute:: pool_growth_bytes
+
+        Number of bytes the memory pool allocated from the device after the
+        warm-up steps. Zero if the buffers of the steady state are recycled
+        by the pool.
+
+    .. attribute:: peak_device_bytes
+
+        Peak number of bytes in use on the device after the warm-up steps.
+
+    .. attribute:: is_finite
+
+        Whether all the entries of the final solution are finite.
+
+    The allocator statistics are *None* if the array context does not
+    allocate through a :class:`~feinsum_evaluation.memory.CountingAllocator`.
+    """
+    actx: str
+    nbatch: int
+    ni: int
+    nj: int
+    nel: int
+    nsteps: int
+    dt: float
+    first_step_time: float
+    step_timing: TimingStatistics
+    nallocations_per_step: Optional[float]
+    allocated_bytes_per_step: Optional[float]
+    pool_growth_bytes: Optional[int]
+    peak_device_bytes: Optional[int]
+    is_finite: bool
+
+    @property
+    def step_time(self) -> float:
+        """
+        Median time (in seconds) per step.
+        """
+        return self.step_timing.median
+
+    @property
+    def dof_updates_per_second(self) -> float:
+        return self.nbatch * self.nel * self.ni / self.step_time
+
+
+def run_time_stepping(actx: "ArrayContext", actx_name: str,
+                      inputs: InputPool,
+                      nbatch: int, ni: int, nj: int, nel: int, *,
+                      nsteps: int,
+                      nwarmup_steps: int,
+                      cfl: float) -> TimeSteppingResult:
+    """
+    Returns the :class:`TimeSteppingResult` of *nsteps* steps of the
+    low-storage RK4 integrator, whose initial state and operators are taken
+    from *inputs*. Every stage is a program of its own, compiled during the
+    first step. The first *nwarmup_steps* steps are excluded from the
+    statistics.
+    """
+    if nwarmup_steps < 1:
+        raise ValueError("At least one warm-up step is required to exclude"
+                         " the compilation of the stages.")
+    if nsteps <= nwarmup_steps:
+        raise ValueError(f"nsteps must exceed nwarmup_steps={nwarmup_steps},"
+                         f" got {nsteps}.")
+
+    axis_lens = get_axis_lengths(ni=ni, nj=nj, nel=nel)
+    args = inputs.get_inputs(nbatch)
+    u, = [arg
+          for operand, arg in zip(_RHS_KNL.operands, args, strict=True)
+          if operand.is_batched]
+    operators = [arg
+                 for operand, arg in zip(_RHS_KNL.operands, args, strict=True)
+                 if not operand.is_batched]
+
+    rhs = actx.compile(partial(_evaluate_rhs, actx, axis_lens=axis_lens))
+    dt = cfl / _estimate_spectral_radius(actx, rhs, u, operators)
+    stages = [actx.compile(partial(_lsrk4_stage, actx,
+                                   a=a, b=b, dt=dt, axis_lens=axis_lens))
+              for a, b in zip(LSRK4_A, LSRK4_B, strict=True)]
+
+    allocator = getattr(actx, "allocator", None)
+    if not isinstance(allocator, CountingAllocator):
+        allocator = None
+
+    # the first stage ignores the initial value of k, as its coefficient is 0
+    k = u
+    step_times = []
+    for istep in range(nsteps):
+        if istep == nwarmup_steps and allocator is not None:
+            allocator.reset()
+            managed_bytes = allocator.pool.managed_bytes
+
+        t_start = perf_counter_ns()
+        for stage in stages:
+            u, k = stage(u, k, *operators)
+        synchronize(actx, u)
+        step_times.append((perf_counter_ns() - t_start) * 1e-9)
+
+    nsteady_steps = nsteps - nwarmup_steps
+    if allocator is not None:
+        nallocations_per_step = allocator.nallocations / nsteady_steps
+        allocated_bytes_per_step = allocator.allocated_bytes / nsteady_steps
+        pool_growth_bytes = allocator.pool.managed_bytes - managed_bytes
+        peak_device_bytes = allocator.peak_active_bytes
+    else:
+        nallocations_per_step = allocated_bytes_per_step = None
+        pool_growth_bytes = peak_device_bytes = None
+
+    return TimeSteppingResult(
+        actx=actx_name, nbatch=nbatch, ni=ni, nj=nj, nel=nel,
+        nsteps=nsteps, dt=dt,
+        first_step_time=step_times[0],
+        step_timing=compute_statistics(step_times[nwarmup_steps:]),
+        nallocations_per_step=nallocations_per_step,
+        allocated_bytes_per_step=allocated_bytes_per_step,
+        pool_growth_bytes=pool_growth_bytes,
+        peak_device_bytes=peak_device_bytes,
+        is_finite=bool(np.isfinite(_get_max_abs(actx.to_numpy(u)))))
+
+
+# {{{ command line
+
+@dc.dataclass(frozen=True)
+class _TimeSteppingTask:
+    actx_name: str
+    batches: Tuple[int, ...]
+    nis: Tuple[int, ...]
+    njs: Tuple[int, ...]
+    nel: Optional[int]
+    nsteps: int
+    nwarmup_steps: int
+    cfl: float
+
+
+def _run_time_stepping_task(task: _TimeSteppingTask
+                            ) -> List[TimeSteppingResult]:
+    # runs in a worker process, see main
+    actx = instantiate_actx_t(get_actx_class(task.actx_name))
+    max_nbatch = max(task.batches)
+
+    results = []
+    for ni in task.nis:
+        for nj in task.njs:
+            nel = get_nel(ni) if task.nel is None else task.nel
+            # the initial states of the smaller batches are prefixes of the
+            # one of the largest batch
+            inputs = InputPool(actx, _RHS_KNL, max_nbatch,
+                               get_axis_lengths(ni=ni, nj=nj, nel=nel),
+                               seed=INPUT_SEED)
+            for nbatch in task.batches:
+                results.append(run_time_stepping(
+                    actx, task.actx_name, inputs, nbatch, ni, nj, nel,
+                    nsteps=task.nsteps,
+                    nwarmup_steps=task.nwarmup_steps,
+                    cfl=task.cfl))
+
+            # release the inputs before allocating the next ones
+            del inputs
+
+    return results
+
+
+def _format_mib(nbytes: Optional[float]) -> str:
+    return "N/A" if nbytes is None else f"{nbytes / (1 << 20):.1f}"
+
+
+def print_time_stepping_results(results: Sequence[TimeSteppingResult]) -> None:
+    table = [[result.actx, result.nbatch, result.ni, result.nj, result.nel,
+              f"{result.first_step_time:.3f}",
+              f"{result.step_time * 1e3:.3f}",
+              f"{100 * result.step_timing.rel_ci_width:.1f}%",
+              f"{result.dof_updates_per_second * 1e-9:.3f}",
+              ("N/A"
+               if result.nallocations_per_step is None
+               else f"{result.nallocations_per_step:.1f}"),
+              _format_mib(result.allocated_bytes_per_step),
+              _format_mib(result.pool_growth_bytes),
+              "" if result.is_finite else "non-finite"]
+             for result in results]
+    print(tabulate(table,
+                   headers=["actx", "nbatch", "ni", "nj", "nel",
+                            "First step (s)", "Step (ms)", "CI width",
+                            "GDOF-updates/s", "Allocs/step", "MiB/step",
+                            "Pool growth (MiB)", ""]))
+
+
+def main(argv: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="feinsum_evaluation time-stepping",
+        description=("Time the DG-kernels as the right-hand side of a"
+                     " low-storage RK4 integrator and report the"
+                     " steady-state time per step, the churn of the memory"
+                     " pool and the DOF-updates per second"),
+    )
+    gather_actx_names = ", ".join(sorted(GATHER_ACTX_NAMES))
+    parser.add_argument("--actxs", metavar="A", type=str, required=True,
+                        help=("comma separated names of the array contexts,"
+                              f" among {gather_actx_names}."))
+    parser.add_argument("--batches", metavar="B", type=str, default="1",
+                        help=("comma separated numbers of solution components"
+                              " integrated at once."))
+    parser.add_argument("--ni", metavar="NI", type=str, required=True,
+                        help=("comma separated #volume-dofs per element, among"
+                              f" {', '.join(map(str, NELS))} unless '--nel' is"
+                              " passed."))
+    parser.add_argument("--nj", metavar="NJ", type=str, required=True,
+                        help="comma separated #face-dofs per face.")
+    parser.add_argument("--nel", metavar="NEL", type=int, default=None,
+                        help=("number of elements. Defaults to the element"
+                              " count of the DG-kernel suite."))
+    parser.add_argument("--steps", metavar="N", type=int, default=50,
+                        help="number of time steps, including the warm-up.")
+    parser.add_argument("--warmup-steps", metavar="N", type=int, default=2,
+                        help=("number of initial steps excluded from the"
+                              " statistics. The first one compiles the"
+                              " stages."))
+    parser.add_argument("--cfl", metavar="C", type=float, default=0.5,
+                        help=("time step times the estimated spectral radius"
+                              " of the right-hand side."))
+
+    args = parser.parse_args(argv)
+
+    actx_names = parse_comma_separated(args.actxs)
+    for actx_name in actx_names:
+        if actx_name not in ACTX_CLASS_PATHS:
+            parser.error(f"unknown array context '{actx_name}', expected one of"
+                         f" {', '.join(ACTX_CLASS_PATHS)}.")
+        if actx_name not in GATHER_ACTX_NAMES:
+            # the face lift gathers through the connectivity
+            parser.error(f"array context '{actx_name}' does not support the"
+                         f" face gathers, expected one of {gather_actx_names}.")
+    nis = parse_comma_separated_ints(args.ni)
+    njs = parse_comma_separated_ints(args.nj)
+    if args.nel is None:
+        for ni in nis:
+            if ni not in NELS:
+                parser.error(f"no default element count for ni={ni}, expected"
+                             f" one of {', '.join(map(str, NELS))} or"
+                             " '--nel'.")
+    for ni, nj in itertools.product(nis, njs):
+        if nj > ni:
+            parser.error(f"the face gathers require nj <= ni, got nj={nj},"
+                         f" ni={ni}.")
+    if not 1 <= args.warmup_steps < args.steps:
+        parser.error("'--warmup-steps' must be at least 1 and less than"
+                     " '--steps'.")
+
+    tasks = [_TimeSteppingTask(
+                actx_name=actx_name,
+                batches=tuple(parse_comma_separated_ints(args.batches)),
+                nis=tuple(nis),
+                njs=tuple(njs),
+                nel=args.nel,
+                nsteps=args.steps,
+                nwarmup_steps=args.warmup_steps,
+                cfl=args.cfl)
+             for actx_name in actx_names]
+
+    # every array context is run in a fresh worker process, as in the
+    # DG-kernel suite
+    outcomes = run_isolated(_run_time_stepping_task, tasks)
+    results = [result
+               for task_results in drop_failures(
+                   outcomes, describe=lambda task: f"'{task.actx_name}'")
+               for result in task_results]
+    print_time_stepping_results(results)
+
+    if any(isinstance(outcome, TaskFailure) for outcome in outcomes):
+        sys.exit(1)
+
+# }}}
+
+# vim: fdm=marker
@@ -0,0 +1,365 @@
+"""
+Timing engine used by the benchmarks.
+
+Every call to the benchmarked function is timed individually with
+:func:`time.perf_counter_ns` and is followed by a device synchronization, so
+that the recorded samples measure execution and not enqueueing. Sampling
+continues until the confidence interval of the median is narrower than the
+requested fraction of the median or the time budget is exhausted.
+
+.. autoclass:: TimingStatistics
+.. autofunction:: compute_statistics
+.. autofunction:: time_callable
+.. autofunction:: get_slowdown_pvalue
+
+.. autoclass:: CompileTraceRecorder
+.. autoclass:: FirstCallTiming
+.. autofunction:: time_first_call
+.. autofunction:: get_break_even_iterations
+"""
+import dataclasses as dc
+import gc
+import math
+import numpy as np
+
+from statistics import NormalDist
+from time import perf_counter_ns
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+@dc.dataclass(frozen=True)
+class TimingStatistics:
+    """
+    Summary of the timing samples (in seconds) of a benchmarked function.
+
+    .. attribute:: samples
+
+        All the recorded samples, including the ones rejected as outliers.
+
+    .. attribute:: n_outliers
+
+        Number of samples outside Tukey's fences
+        (:math:`[Q_1 - 1.5\\,IQR, Q_3 + 1.5\\,IQR]`). The remaining statistics
+        are computed after rejecting these samples.
+
+    .. attribute:: ci_low
+    .. attribute:: ci_high
+
+        Distribution-free confidence interval of the median at
+        :attr:`confidence`.
+    """
+    samples: Tuple[float, ...]
+    n_outliers: int
+    mean: float
+    median: float
+    min: float
+    q1: float
+    q3: float
+    ci_low: float
+    ci_high: float
+    confidence: float
+
+    @property
+    def iqr(self) -> float:
+        return self.q3 - self.q1
+
+    @property
+    def rel_ci_width(self) -> float:
+        return (self.ci_high - self.ci_low) / self.median
+
+
+def _get_median_ci(sorted_samples: np.ndarray,
+                   confidence: float) -> Tuple[float, float]:
+    # Uses the normal approximation to the binomial distribution of the
+    # rank of the median.
+    n = len(sorted_samples)
+    z = NormalDist().inv_cdf(0.5 * (1 + confidence))
+    half_width = 0.5 * z * math.sqrt(n)
+    lo = max(math.floor(0.5 * n - half_width), 0)
+    hi = min(math.ceil(0.5 * n + half_width), n - 1)
+    return float(sorted_samples[lo]), float(sorted_samples[hi])
+
+
+def compute_statistics(samples: Sequence[float],
+                       confidence: float = 0.95) -> TimingStatistics:
+    all_samples = np.asarray(samples, dtype=np.float64)
+    if len(all_samples) == 0:
+        raise ValueError("Cannot compute statistics of zero samples.")
+
+    q1, q3 = np.percentile(all_samples, [25, 75])
+    iqr = q3 - q1
+    is_inlier = ((all_samples >= q1 - 1.5 * iqr)
+                 & (all_samples <= q3 + 1.5 * iqr))
+    inliers = np.sort(all_samples[is_inlier])
+    q1, q3 = np.percentile(inliers, [25, 75])
+    ci_low, ci_high = _get_median_ci(inliers, confidence)
+
+    return TimingStatistics(samples=tuple(float(k) for k in all_samples),
+                            n_outliers=int(len(all_samples) - len(inliers)),
+                            mean=float(np.mean(inliers)),
+                            median=float(np.median(inliers)),
+                            min=float(inliers[0]),
+                            q1=float(q1),
+                            q3=float(q3),
+                            ci_low=ci_low,
+                            ci_high=ci_high,
+                            confidence=confidence)
+
+
+def _get_ranks(values: np.ndarray) -> np.ndarray:
+    # ranks starting at 1 with ties assigned their average rank
+    order = np.argsort(values, kind="stable")
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    _, inverse, counts = np.unique(values, return_inverse=True,
+                                   return_counts=True)
+    rank_sums = np.bincount(inverse, weights=ranks)
+    return (rank_sums / counts)[inverse]
+
+
+def get_slowdown_pvalue(baseline_samples: Sequence[float],
+                        samples: Sequence[float]) -> float:
+    """
+    Returns the p-value of the one-sided Mann-Whitney U test of the
+    hypothesis that *samples* tend to be larger than *baseline_samples*,
+    using the normal approximation of the U statistic.
+    """
+    n1 = len(baseline_samples)
+    n2 = len(samples)
+    if n1 == 0 or n2 == 0:
+        raise ValueError("Cannot compare against zero samples.")
+
+    ranks = _get_ranks(np.concatenate([np.asarray(baseline_samples,
+                                                  dtype=np.float64),
+                                       np.asarray(samples, dtype=np.float64)]))
+    u = ranks[n1:].sum() - n2 * (n2 + 1) / 2
+    mu = n1 * n2 / 2
+    sigma = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    return 1 - NormalDist().cdf((u - mu) / sigma)
+
+
+def time_callable(f: Callable[..., Any],
+                  args: Tuple[Any, ...],
+                  *,
+                  synchronize: Optional[Callable[[Any], None]] = None,
+                  rel_ci_width: float = 0.01,
+                  confidence: float = 0.95,
+                  min_samples: int = 10,
+                  max_samples: int = 1000,
+                  max_time: float = 5,
+                  max_warmup_samples: int = 20,
+                  max_warmup_time: float = 2) -> TimingStatistics:
+    """
+    Returns the :class:`TimingStatistics` of calling ``f(*args)``.
+
+    :arg synchronize: Called with the result of *f* to wait for the
+        computation to complete on the device. It is included in the timed
+        region of each sample.
+    :arg rel_ci_width: Sampling stops once the width of the confidence
+        interval of the median relative to the median drops below this value.
+    :arg max_time: Budget (in seconds) for the timed samples. Sampling stops
+        once the budget is exhausted, even if *rel_ci_width* is not met.
+    """
+    if synchronize is None:
+        def synchronize(result: Any) -> None:
+            pass
+
+    # {{{ warmup rounds
+
+    i_warmup = 0
+    t_warmup = 0
+
+    while i_warmup < max_warmup_samples and t_warmup < max_warmup_time:
+        t_start = perf_counter_ns()
+        synchronize(f(*args))
+        t_end = perf_counter_ns()
+        t_warmup += (t_end - t_start) * 1e-9
+        i_warmup += 1
+
+    # }}}
+
+    # {{{ actual timing rounds
+
+    samples = []
+    t_actual = 0
+    # check for convergence at geometrically growing sample counts to keep
+    # the statistics out of the sampling loop's critical path.
+    next_check = min_samples
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while len(samples) < max_samples:
+            t_start = perf_counter_ns()
+            synchronize(f(*args))
+            t_end = perf_counter_ns()
+
+            samples.append((t_end - t_start) * 1e-9)
+            t_actual += samples[-1]
+
+            if t_actual >= max_time and len(samples) >= min_samples:
+                break
+
+            if len(samples) == next_check:
+                stats = compute_statistics(samples, confidence)
+                if stats.rel_ci_width <= rel_ci_width:
+                    break
+                next_check = min(int(1.25 * next_check) + 1, max_samples)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # }}}
+
+    return compute_statistics(samples, confidence)
+
+
+# {{{ compile latency
+
+class CompileTraceRecorder:
+    """
+    A *compile_trace_callback* for the :mod:`pytato` based array contexts
+    that records the time at which each stage of the compilation pipeline is
+    entered and left. The pipeline invokes the callback as
+    ``callback(what, stage, ir)`` with *stage* being ``"pre_<name>"`` or
+    ``"post_<name>"``.
+
+    .. attribute:: events
+
+        A :class:`list` of ``(stage, timestamp_in_ns)``.
+
+    .. attribute:: post_stage_irs
+
+        A :class:`list` of the IRs with which the ``"post_<name>"`` stages
+        were left, see
+        :func:`~feinsum_evaluation.profiling.get_device_code_digest`.
+    """
+    def __init__(self) -> None:
+        self.events: List[Tuple[str, int]] = []
+        self.post_stage_irs: List[Any] = []
+
+    def clear(self) -> None:
+        self.events.clear()
+        self.post_stage_irs.clear()
+
+    def __call__(self, what: Any, stage: str, ir: Any) -> None:
+        self.events.append((stage, perf_counter_ns()))
+        if stage.startswith("post_"):
+            self.post_stage_irs.append(ir)
+
+
+@dc.dataclass(frozen=True)
+class FirstCallTiming:
+    """
+    Breakdown of the time (in seconds) taken by the first call to a function
+    returned by :meth:`arraycontext.ArrayContext.compile`.
+
+    .. attribute:: total
+
+        Wall time of the first call, including device synchronization.
+
+    .. attribute:: trace
+
+        Time from the start of the call to the first compilation stage,
+        i.e. the time taken to trace the function into an IR.
+
+    .. attribute:: stages
+
+        A :class:`tuple` of ``(name, duration)`` for each compilation stage
+        reported to the :class:`CompileTraceRecorder`.
+
+    .. attribute:: first_execution
+
+        Time from the end of the last compilation stage to the end of the
+        call. This includes the device code generation (OpenCL build, XLA
+        compilation) along with the first execution. For array contexts
+        without a compilation pipeline, this is same as :attr:`total`.
+    """
+    total: float
+    trace: float
+    stages: Tuple[Tuple[str, float], ...]
+    first_execution: float
+
+    def _get_stages_time(self, keywords: Tuple[str, ...]) -> float:
+        return sum(duration
+                   for name, duration in self.stages
+                   if any(keyword in name for keyword in keywords))
+
+    @property
+    def transform(self) -> float:
+        return self._get_stages_time(("transform",))
+
+    @property
+    def codegen(self) -> float:
+        return self._get_stages_time(("generate", "codegen"))
+
+    def get_compile_overhead(self, steady_state: float) -> float:
+        """
+        Returns the time taken by the first call in excess of a call in the
+        steady state.
+        """
+        return max(self.total - steady_state, 0)
+
+
+def time_first_call(f: Callable[..., Any],
+                    args: Tuple[Any, ...],
+                    recorder: CompileTraceRecorder,
+                    *,
+                    synchronize: Optional[Callable[[Any], None]] = None,
+                    ) -> FirstCallTiming:
+    """
+    Times the first call ``f(*args)`` and splits it into phases as per the
+    events collected by *recorder*. *recorder* must be the compile trace
+    callback of the array context that compiled *f*. The events of the call
+    are retained by *recorder* until it is cleared.
+    """
+    recorder.clear()
+
+    t_start = perf_counter_ns()
+    result = f(*args)
+    if synchronize is not None:
+        synchronize(result)
+    t_end = perf_counter_ns()
+
+    events = list(recorder.events)
+
+    stages = []
+    entered = {}
+    for stage, timestamp in events:
+        if stage.startswith("pre_"):
+            entered[stage[4:]] = timestamp
+        elif stage.startswith("post_") and stage[5:] in entered:
+            stages.append((stage[5:],
+                           (timestamp - entered.pop(stage[5:])) * 1e-9))
+
+    if events:
+        trace = (events[0][1] - t_start) * 1e-9
+        first_execution = (t_end - events[-1][1]) * 1e-9
+    else:
+        trace = 0
+        first_execution = (t_end - t_start) * 1e-9
+
+    return FirstCallTiming(total=(t_end - t_start) * 1e-9,
+                           trace=trace,
+                           stages=tuple(stages),
+                           first_execution=first_execution)
+
+
+def get_break_even_iterations(compile_time: float, time_per_call: float,
+                              ref_compile_time: float,
+                              ref_time_per_call: float) -> Optional[float]:
+    """
+    Returns the number of calls after which the total time (compilation
+    included) of a function becomes smaller than that of a reference
+    function. Returns *None* if it never does.
+    """
+    if compile_time <= ref_compile_time and time_per_call <= ref_time_per_call:
+        return 0
+    if time_per_call >= ref_time_per_call:
+        return None
+    return (compile_time - ref_compile_time) / (ref_time_per_call - time_per_call)
+
+# }}}
+
+# vim: fdm=marker
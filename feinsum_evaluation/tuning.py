@@ -0,0 +1,186 @@
+"""
+Builds a per-machine :mod:`feinsum` database of transformations tuned on the
+local OpenCL device for the batched einsums of the DG-kernels, to be passed
+to the benchmarks via ``--feinsum-db``.
+
+.. autofunction:: get_default_tuning_db
+.. autofunction:: get_batched_einsum
+.. autofunction:: tune_kernels
+.. autofunction:: main
+"""
+import argparse
+import itertools
+import os
+import platform
+import numpy as np
+
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from feinsum_evaluation.kernels import (KERNELS, NELS, DGKernel, get_nel,
+                                        get_axis_lengths)
+from feinsum_evaluation.precision import (PRECISIONS, DEFAULT_PRECISION,
+                                          Precision)
+from feinsum_evaluation.driver import get_problem_sizes
+from feinsum_evaluation.utils import (parse_comma_separated,
+                                      parse_comma_separated_ints)
+
+if TYPE_CHECKING:
+    import feinsum as f
+
+
+def get_default_tuning_db() -> str:
+    """
+    Returns the path of the tuning database of this machine.
+    """
+    data_dir = os.environ.get("XDG_DATA_HOME",
+                              os.path.join(os.path.expanduser("~"), ".local",
+                                           "share"))
+    return os.path.join(data_dir, "feinsum_evaluation",
+                        f"feinsum-{platform.node()}.db")
+
+
+def get_transform_space(knl: DGKernel) -> str:
+    """
+    Returns the path of the module implementing the space of transformations
+    searched for *knl*, see :func:`feinsum.tuning.autotune`. The spaces are
+    named after the einsums, which are shared by some of the kernels, for ex.
+    the face gathers and the face mass.
+    """
+    inputs, output = knl.subscript.split("->")
+    return f"feinsum.tuning.impls.{'_'.join(inputs.split(','))}_to_{output}"
+
+
+def get_batched_einsum(knl: DGKernel, nbatch: int, ni: int,
+                       nj: Optional[int],
+                       precision: Precision = PRECISIONS[DEFAULT_PRECISION],
+                       ) -> "f.FusedEinsum":
+    """
+    Returns the batched einsum that is handed to :mod:`feinsum` by
+    :class:`~feinsum_evaluation.batched_einsum_actx.BatchedEinsumPytatoPyOpenCLArrayContext`
+    for a call to *knl* with *nbatch* batch members with inputs in
+    *precision*. As in :mod:`feinsum`'s database, the number of elements is
+    left unbounded.
+    """
+    import feinsum as f
+
+    shapes = knl.get_input_shapes(get_axis_lengths(ni=ni, nj=nj, nel=np.inf))
+    shared = {iinput: f.array(shape, precision.get_dtype(is_batched=False))
+              for iinput, shape in enumerate(shapes)
+              if iinput not in knl.batched_inputs}
+
+    return f.batched_einsum(
+        knl.subscript,
+        [[shared[iinput] if iinput in shared
+          else f.array(shape, precision.get_dtype(is_batched=True))
+          for iinput, shape in enumerate(shapes)]
+         for _ in range(nbatch)])
+
+
+def get_tuning_problems(kernel_names: Sequence[str],
+                        batches: Sequence[int],
+                        nis: Sequence[int],
+                        njs: Sequence[int]
+                        ) -> List[Tuple[DGKernel, int, int, Optional[int]]]:
+    return [(KERNELS[kernel_name], nbatch, ni, nj)
+            for kernel_name in kernel_names
+            for ni, nj in get_problem_sizes(KERNELS[kernel_name], nis, njs)
+            for nbatch in batches]
+
+
+def tune_kernels(kernel_names: Sequence[str],
+                 batches: Sequence[int],
+                 nis: Sequence[int],
+                 njs: Sequence[int], *,
+                 db_path: str,
+                 stop_after: Optional[int] = None,
+                 dtypes: Sequence[str] = (DEFAULT_PRECISION,)) -> None:
+    """
+    Searches the transformation space of every ``(kernel, ni, nj, nbatch)``
+    in every precision of *dtypes* on the device of
+    :func:`pyopencl.create_some_context` and records the best
+    transformations in the :mod:`feinsum` database *db_path*.
+
+    :arg stop_after: If not *None*, the number of points of the
+        transformation space sampled per einsum.
+    """
+    import pyopencl as cl
+    from feinsum.tuning import autotune
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    cl_ctx = cl.create_some_context()
+
+    for (knl, nbatch, ni, nj), dtype in itertools.product(
+            get_tuning_problems(kernel_names, batches, nis, njs), dtypes):
+        print(f"Tuning {knl.name} (ni={ni}, nj={nj}, dtype={dtype}) with"
+              f" {nbatch} batches on {cl_ctx.devices[0].name.strip()}")
+        autotune(get_batched_einsum(knl, nbatch, ni, nj,
+                                    precision=PRECISIONS[dtype]),
+                 get_transform_space(knl),
+                 cl_ctx,
+                 db_path=db_path,
+                 long_dim_length=get_nel(ni),
+                 stop_after=stop_after)
+
+
+def main(argv: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="feinsum_evaluation tune",
+        description=("Tune feinsum's transformations of the DG-kernels on the"
+                     " local OpenCL device"),
+    )
+    parser.add_argument("--kernels", metavar="K", type=str,
+                        default=",".join(KERNELS),
+                        help=("comma separated names of the kernels to tune."
+                              " Defaults to all the registered kernels."))
+    parser.add_argument("--batches", metavar="N", type=str, required=True,
+                        help="comma separated #batches to tune for.")
+    parser.add_argument("--ni", metavar="NI", type=str, required=True,
+                        help=("comma separated loop-lengths of `i`, among"
+                              f" {', '.join(map(str, NELS))}."))
+    parser.add_argument("--nj", metavar="NJ", type=str, default="",
+                        help=("comma separated loop-lengths of `j`. Only"
+                              " required by kernels with face-dofs."))
+    parser.add_argument("--db", metavar="FILE", type=str,
+                        default=get_default_tuning_db(),
+                        help=("feinsum database to record the tuned"
+                              " transformations in. Defaults to"
+                              f" '{get_default_tuning_db()}'."))
+    parser.add_argument("--stop-after", metavar="N", type=int, default=None,
+                        help=("number of transformations to try per einsum."
+                              " Defaults to searching the entire space."))
+    parser.add_argument("--dtype", metavar="D", type=str,
+                        default=DEFAULT_PRECISION,
+                        help=("comma separated precisions to tune for:"
+                              f" {', '.join(PRECISIONS)}. Defaults to"
+                              f" '{DEFAULT_PRECISION}'."))
+
+    args = parser.parse_args(argv)
+
+    kernel_names = parse_comma_separated(args.kernels)
+    for kernel_name in kernel_names:
+        if kernel_name not in KERNELS:
+            parser.error(f"unknown kernel '{kernel_name}', expected one of"
+                         f" {', '.join(KERNELS)}.")
+    dtypes = parse_comma_separated(args.dtype)
+    for dtype in dtypes:
+        if dtype not in PRECISIONS:
+            parser.error(f"unknown dtype '{dtype}', expected one of"
+                         f" {', '.join(PRECISIONS)}.")
+    # the einsums are tuned for the element counts of the benchmarks
+    nis = parse_comma_separated_ints(args.ni)
+    for ni in nis:
+        if ni not in NELS:
+            parser.error(f"no element count for ni={ni}, expected one of"
+                         f" {', '.join(map(str, NELS))}.")
+
+    tune_kernels(kernel_names,
+                 parse_comma_separated_ints(args.batches),
+                 nis,
+                 parse_comma_separated_ints(args.nj),
+                 db_path=args.db,
+                 stop_after=args.stop_after,
+                 dtypes=dtypes)
+    print(f"Tuned transformations recorded in '{args.db}'. Pass"
+          f" '--feinsum-db {args.db}' to the benchmarks to use them.")
+
+# vim: fdm=marker
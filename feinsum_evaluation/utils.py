@@ -1,119 +1,185 @@
-from arraycontext import (
-    ArrayContext, PyOpenCLArrayContext,
-    PytatoPyOpenCLArrayContext,
-    EagerJAXArrayContext, PytatoJAXArrayContext,
-    BatchedEinsumPytatoPyOpenCLArrayContext as BaseBatchedEinsumPytatoPyOpenCLArrayContext  # noqa: E501
-)
-from feinsum_evaluation.metadata import NamedAxis
-from typing import Any, Callable, Optional, Type, Tuple
-from time import time
-from pytools.tag import Tag
-
-
-def _fused_loop_name_prefix_getter(tag: Tag) -> str:
-    if isinstance(tag, NamedAxis):
-        return f"i{tag.name}"
-    else:
-        raise NotImplementedError(type(tag))
+import importlib
+
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Type
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+# {{{ array context lookup
+
+# The array contexts are looked up by name and their modules, along with the
+# backends they pull in, are only imported once selected. This keeps the
+# startup of the CLI, '--help' and the commands that do not run kernels from
+# paying for the import of every backend.
+ACTX_CLASS_PATHS = {
+    "pyopencl": "arraycontext:PyOpenCLArrayContext",
+    "jax:nojit": "arraycontext:EagerJAXArrayContext",
+    "jax:jit": "arraycontext:PytatoJAXArrayContext",
+    "pytato:batched_einsum": ("feinsum_evaluation.batched_einsum_actx"
+                              ":BatchedEinsumPytatoPyOpenCLArrayContext"),
+    "numpy": "feinsum_evaluation.numpy_actx:NumpyReferenceArrayContext",
+}
+
+# names of the array contexts that transform the batched einsums via feinsum,
+# i.e. the ones that look up the transformations in a feinsum database and
+# whose loop fusion can be turned off
+BATCHED_EINSUM_ACTX_NAMES = frozenset({"pytato:batched_einsum"})
+
+# names of the array contexts that read the operands of a kernel through
+# their strides, i.e. that either trace the conversion from a stored layout
+# into the compiled kernel or evaluate on strided views, see
+# feinsum_evaluation.layouts
+STRIDED_LAYOUT_ACTX_NAMES = frozenset({"jax:jit", "pytato:batched_einsum",
+                                       "numpy"})
+
+
+# names of the array contexts that index an array with several index arrays
+# at once, i.e. that can run the kernels gathering their operands through
+# the face connectivity, see feinsum_evaluation.connectivity. PyOpenCL arrays
+# only support a single index array.
+GATHER_ACTX_NAMES = frozenset({"jax:nojit", "jax:jit", "pytato:batched_einsum",
+                               "numpy"})
+
+
+def get_actx_class(actx_name: str) -> Type["ArrayContext"]:
+    """
+    Imports and returns the type of the array context named *actx_name*, see
+    :data:`ACTX_CLASS_PATHS`.
+    """
+    module_name, class_name = ACTX_CLASS_PATHS[actx_name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+# The predicates below import the array context types they compare against.
+# Since they are only called with an instantiated array context, those types
+# have already been imported by then.
+
+def is_opencl_actx(actx: "ArrayContext") -> bool:
+    from arraycontext import PyOpenCLArrayContext, PytatoPyOpenCLArrayContext
+    return isinstance(actx, (PyOpenCLArrayContext, PytatoPyOpenCLArrayContext))
+
 
+def is_jax_actx(actx: "ArrayContext") -> bool:
+    from arraycontext import EagerJAXArrayContext, PytatoJAXArrayContext
+    return isinstance(actx, (EagerJAXArrayContext, PytatoJAXArrayContext))
 
-class BatchedEinsumPytatoPyOpenCLArrayContext(
-    BaseBatchedEinsumPytatoPyOpenCLArrayContext
-        ):
-    def __init__(
-        self,
-        queue, allocator=None,
+
+def is_numpy_actx(actx: "ArrayContext") -> bool:
+    from feinsum_evaluation.numpy_actx import NumpyReferenceArrayContext
+    return isinstance(actx, NumpyReferenceArrayContext)
+
+# }}}
+
+
+def instantiate_actx_t(
+        actx_t: Type["ArrayContext"],
         *,
         compile_trace_callback: Optional[Callable[[Any, str, Any], None]] = None,
-        feinsum_db: Optional[str] = None,
         log_loopy_statistics: bool = False,
-    ) -> None:
-        import feinsum as fnsm
-
-        super().__init__(
-            queue, allocator,
-            loop_fusion_axis_tag_t=NamedAxis,
-            fallback_to_no_fusion=False,
-            assume_all_indirection_maps_as_non_negative=True,
-            compile_trace_callback=compile_trace_callback,
-            feinsum_db=fnsm.DEFAULT_DB,
-            log_loopy_statistics=log_loopy_statistics,
-            fused_loop_name_prefix_getter=_fused_loop_name_prefix_getter
-        )
-
-
-def get_actx_t_priority(actx_t):
-    # lower priority => gets executed first
-    if issubclass(actx_t, PytatoJAXArrayContext):
-        return 10
+        enable_cl_profiling: bool = False,
+        feinsum_db: Optional[str] = None,
+        fuse_loops: bool = True,
+        assume_non_negative_indices: bool = True,
+) -> "ArrayContext":
+    """
+    :arg compile_trace_callback: Passed on to the array contexts that
+        support it, i.e. the ones that compile via :mod:`pytato`. Ignored
+        otherwise.
+    :arg log_loopy_statistics: Passed on to
+        :class:`~feinsum_evaluation.batched_einsum_actx.BatchedEinsumPytatoPyOpenCLArrayContext`.
+        Ignored otherwise.
+    :arg enable_cl_profiling: If *True*, the command queue of the OpenCL array
+        contexts is created with profiling enabled. Ignored otherwise.
+    :arg feinsum_db: Passed on to
+        :class:`~feinsum_evaluation.batched_einsum_actx.BatchedEinsumPytatoPyOpenCLArrayContext`.
+        Ignored otherwise.
+    :arg fuse_loops: Passed on to
+        :class:`~feinsum_evaluation.batched_einsum_actx.BatchedEinsumPytatoPyOpenCLArrayContext`.
+        Ignored otherwise.
+    :arg assume_non_negative_indices: Passed on to
+        :class:`~feinsum_evaluation.batched_einsum_actx.BatchedEinsumPytatoPyOpenCLArrayContext`.
+        Ignored otherwise.
+    """  # noqa: E501
+    from arraycontext import (PyOpenCLArrayContext, PytatoPyOpenCLArrayContext,
+                              EagerJAXArrayContext, PytatoJAXArrayContext,
+                              BatchedEinsumPytatoPyOpenCLArrayContext)
+    from feinsum_evaluation.numpy_actx import NumpyReferenceArrayContext
+
+    if issubclass(actx_t, (PytatoPyOpenCLArrayContext, PytatoJAXArrayContext)):
+        actx_kwargs = {"compile_trace_callback": compile_trace_callback}
     else:
-        return 1
+        actx_kwargs = {}
 
-
-def instantiate_actx_t(actx_t: Type[ArrayContext]) -> ArrayContext:
-    import gc
-    gc.collect()
+    if issubclass(actx_t, BatchedEinsumPytatoPyOpenCLArrayContext):
+        actx_kwargs["log_loopy_statistics"] = log_loopy_statistics
+        actx_kwargs["feinsum_db"] = feinsum_db
+        actx_kwargs["fuse_loops"] = fuse_loops
+        actx_kwargs["assume_non_negative_indices"] = assume_non_negative_indices
 
     if issubclass(actx_t, (PyOpenCLArrayContext, PytatoPyOpenCLArrayContext)):
         import pyopencl as cl
         import pyopencl.tools as cl_tools
+        from feinsum_evaluation.memory import CountingAllocator
 
         ctx = cl.create_some_context()
-        cq = cl.CommandQueue(ctx)
-        allocator = cl_tools.MemoryPool(cl_tools.ImmediateAllocator(cq))
-        return actx_t(cq, allocator)
+        if enable_cl_profiling:
+            cq = cl.CommandQueue(
+                ctx, properties=cl.command_queue_properties.PROFILING_ENABLE)
+        else:
+            cq = cl.CommandQueue(ctx)
+        allocator = CountingAllocator(
+            cl_tools.MemoryPool(cl_tools.ImmediateAllocator(cq)))
+        return actx_t(cq, allocator, **actx_kwargs)
     elif issubclass(actx_t, (EagerJAXArrayContext, PytatoJAXArrayContext)):
-        import os
-        if os.environ.get("XLA_PYTHON_CLIENT_PREALLOCATE") != "false":
-            raise RuntimeError("environment variable 'XLA_PYTHON_CLIENT_PREALLOCATE'"
-                               " is not set 'false'. This is required so that"
-                               " backends other than JAX can allocate buffers on the"
-                               " device.")
-
         from jax.config import config
         config.update("jax_enable_x64", True)
+        return actx_t(**actx_kwargs)
+    elif issubclass(actx_t, NumpyReferenceArrayContext):
         return actx_t()
     else:
         raise NotImplementedError(actx_t)
 
 
-def get_wallclock_time(f: Callable[[...], Any],
-                       args: Tuple[Any, ...]) -> float:
-    import gc
-
-    # {{{ warmup rounds
-
-    i_warmup = 0
-    t_warmup = 0
-
-    while i_warmup < 20 and t_warmup < 2:
-        t_start = time()
-        f(*args)
-        t_end = time()
-        t_warmup += (t_end - t_start)
-        i_warmup += 1
-
-    # }}}
-
-    # {{{ actual timing rounds
-
-    i_actual = 0
-    t_actual = 0
+def synchronize(actx: "ArrayContext", result: Any) -> None:
+    """
+    Blocks until the computation of *result* on *actx*'s device has
+    completed.
+    """
+    if is_opencl_actx(actx):
+        actx.queue.finish()
+    elif is_jax_actx(actx):
+        import numpy as np
+        if isinstance(result, np.ndarray) and result.dtype == object:
+            arys = result.flat
+        else:
+            arys = [result]
+        for ary in arys:
+            ary.block_until_ready()
+    elif is_numpy_actx(actx):
+        # evaluated eagerly
+        pass
+    else:
+        raise NotImplementedError(type(actx))
 
-    while i_actual < 100 and t_actual < 5:
 
-        t_start = time()
-        for _ in range(40):
-            f(*args)
-        t_end = time()
+# {{{ command line
 
-        gc.collect()
+def parse_comma_separated(value: str) -> List[str]:
+    """
+    Returns the non-empty, stripped entries of the comma separated *value*
+    of a command line option.
+    """
+    return [k.strip() for k in value.split(",") if k.strip()]
 
-        t_actual += (t_end - t_start)
-        i_actual += 40
 
-    # }}}
+def parse_comma_separated_ints(value: str) -> List[int]:
+    """
+    Returns the integers of the comma separated *value* of a command line
+    option.
+    """
+    return [int(k) for k in parse_comma_separated(value)]
 
-    return t_actual / i_actual
+# }}}
 
 # vim: fdm=marker
@@ -0,0 +1,95 @@
+"""
+Checks the outputs of the compiled DG-kernels against the ones computed in
+float64 by :class:`~feinsum_evaluation.numpy_actx.NumpyReferenceArrayContext`
+on the same seeded inputs, so that a fast but wrong transformation cannot
+win the benchmark. The checks are run outside the timed calls.
+
+.. autoclass:: VerificationResult
+.. autofunction:: get_relative_error
+.. autofunction:: verify_kernel
+"""
+import dataclasses as dc
+import numpy as np
+
+from typing import TYPE_CHECKING, Any, Callable, List, Mapping, Tuple
+
+from feinsum_evaluation.kernels import DGKernel
+
+if TYPE_CHECKING:
+    from arraycontext import ArrayContext
+
+
+@dc.dataclass(frozen=True)
+class VerificationResult:
+    """
+    .. attribute:: errors
+
+        The :func:`get_relative_error` of every batch member's output.
+
+    .. attribute:: rtol
+
+        The largest tolerated relative error.
+    """
+    errors: List[float]
+    rtol: float
+
+    @property
+    def max_error(self) -> float:
+        return max(self.errors)
+
+    @property
+    def passed(self) -> bool:
+        return self.max_error <= self.rtol
+
+
+def get_relative_error(result: np.ndarray, reference: np.ndarray) -> float:
+    """
+    Returns the max-norm of the error in *result* relative to the max-norm of
+    *reference*. Shape mismatches and non-finite entries count as an
+    infinite error.
+    """
+    if result.shape != reference.shape or not np.all(np.isfinite(result)):
+        return np.inf
+
+    ref_norm = np.max(np.abs(reference), initial=0)
+    error = np.max(np.abs(result - reference), initial=0)
+    return float(error / ref_norm) if ref_norm else float(error)
+
+
+def _get_reference_outputs(knl: DGKernel, nbatch: int,
+                           axis_lens: Mapping[str, int],
+                           seed: int) -> List[np.ndarray]:
+    from feinsum_evaluation.numpy_actx import NumpyReferenceArrayContext
+
+    ref_actx = NumpyReferenceArrayContext()
+    args = knl.input_generator(ref_actx, knl, nbatch, axis_lens, seed=seed)
+    return list(knl(ref_actx, *args, axis_lens=axis_lens))
+
+
+def verify_kernel(actx: "ArrayContext",
+                  compiled_knl: Callable[..., Any],
+                  knl: DGKernel,
+                  args: Tuple[Any, ...],
+                  nbatch: int,
+                  axis_lens: Mapping[str, int], *,
+                  seed: int,
+                  rtol: float) -> VerificationResult:
+    """
+    Calls *compiled_knl* once on *args*, as generated by the kernel's
+    :attr:`~feinsum_evaluation.kernels.DGKernel.input_generator` with
+    *seed*, and compares every batch member's output against the one
+    computed on
+    :class:`~feinsum_evaluation.numpy_actx.NumpyReferenceArrayContext` from
+    the same seed. The reference is always computed in float64, from the
+    inputs before their rounding to the precision of *args*, so that the
+    errors of a reduced precision include the rounding of its inputs.
+    """
+    reference = _get_reference_outputs(knl, nbatch, axis_lens, seed)
+    results = compiled_knl(*args)
+
+    return VerificationResult(
+        errors=[get_relative_error(np.asarray(actx.to_numpy(result)), ref)
+                for result, ref in zip(results, reference, strict=True)],
+        rtol=rtol)
+
+# vim: fdm=marker
@@ -0,0 +1,204 @@
+"""
+Runs the benchmark tasks in worker processes, so that every task starts from
+a clean runtime and no state, such as device memory held by a backend,
+leaks between array contexts.
+
+.. autofunction:: get_numa_cpu_sets
+.. autoclass:: TaskFailure
+.. autofunction:: run_isolated
+.. autofunction:: drop_failures
+"""
+import dataclasses as dc
+import multiprocessing as mp
+import os
+import re
+import sys
+import traceback
+
+from multiprocessing.connection import wait
+from typing import (Any, Callable, Dict, FrozenSet, List, Optional, Sequence,
+                    Set, Tuple, TypeVar, Union)
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+# {{{ NUMA domains
+
+def _parse_cpu_list(cpu_list: str) -> Set[int]:
+    # for ex. "0-3,8-11"
+    cpus = set()
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, stop = part.split("-")
+            cpus.update(range(int(start), int(stop) + 1))
+        else:
+            cpus.add(int(part))
+
+    return cpus
+
+
+def get_numa_cpu_sets() -> List[FrozenSet[int]]:
+    """
+    Returns the CPUs available to this process grouped by NUMA domain. If
+    the NUMA topology is unknown, all the available CPUs are returned as a
+    single domain.
+    """
+    available = os.sched_getaffinity(0)
+    node_dir = "/sys/devices/system/node"
+    cpu_sets = []
+
+    if os.path.isdir(node_dir):
+        nodes = [node for node in os.listdir(node_dir)
+                 if re.fullmatch(r"node[0-9]+", node)]
+        for node in sorted(nodes, key=lambda node: int(node[4:])):
+            try:
+                with open(os.path.join(node_dir, node, "cpulist")) as fp:
+                    cpus = _parse_cpu_list(fp.read()) & available
+            except (OSError, ValueError):
+                continue
+            if cpus:
+                cpu_sets.append(frozenset(cpus))
+
+    return cpu_sets or [frozenset(available)]
+
+# }}}
+
+
+# {{{ process pool
+
+# JAX preallocates most of the device memory on startup, which fails once
+# several workers share a device
+_XLA_PREALLOCATE_VAR = "XLA_PYTHON_CLIENT_PREALLOCATE"
+
+
+@dc.dataclass(frozen=True)
+class TaskFailure:
+    """
+    Returned by :func:`run_isolated` in place of the result of a call that
+    raised or whose worker process died.
+
+    .. attribute:: arg
+
+        The argument of the failed call.
+
+    .. attribute:: message
+
+        The traceback of the exception raised by the call, or the exit code
+        of the worker.
+    """
+    arg: Any
+    message: str
+
+
+def _worker_main(conn: Any, func: Callable[[Any], Any], arg: Any,
+                 cpus: Optional[FrozenSet[int]]) -> None:
+    if cpus is not None:
+        os.sched_setaffinity(0, cpus)
+        # set before the backends are imported by the call
+        os.environ[_XLA_PREALLOCATE_VAR] = "false"
+
+    try:
+        reply = ("ok", func(arg))
+    except BaseException:
+        reply = ("error", traceback.format_exc())
+
+    conn.send(reply)
+    conn.close()
+
+
+def run_isolated(func: Callable[[T], R],
+                 args: Sequence[T], *,
+                 cpu_sets: Optional[Sequence[FrozenSet[int]]] = None,
+                 ) -> List[Union[R, TaskFailure]]:
+    """
+    Returns ``[func(arg) for arg in args]``, with every call made in a fresh
+    (spawned) worker process whose return value is sent back over a pipe.
+    *func* and *args* must be picklable. A call that fails is returned as a
+    :class:`TaskFailure` and does not affect the remaining calls.
+
+    :arg cpu_sets: If *None*, the calls are made one at a time. Otherwise, up
+        to ``len(cpu_sets)`` calls are made concurrently, each in a process
+        pinned to a distinct set of CPUs, for ex. the ones returned by
+        :func:`get_numa_cpu_sets`. The concurrent workers are run with JAX's
+        preallocation of the device memory disabled.
+    """
+    if (cpu_sets is not None and len(cpu_sets) > 1
+            and os.environ.get(_XLA_PREALLOCATE_VAR, "false") != "false"):
+        raise ValueError(f"'{_XLA_PREALLOCATE_VAR}' must be 'false' when"
+                         " running the workers concurrently, so that they"
+                         " can share a device.")
+
+    ctx = mp.get_context("spawn")
+    nslots = 1 if cpu_sets is None else len(cpu_sets)
+    free_slots = list(range(nslots))
+    pending = list(enumerate(args))
+    running: Dict[Any, Tuple[int, Any, int]] = {}
+    results: List[Any] = [None] * len(args)
+
+    try:
+        while pending or running:
+            while pending and free_slots:
+                islot = free_slots.pop(0)
+                itask, arg = pending.pop(0)
+                recv_conn, send_conn = ctx.Pipe(duplex=False)
+                proc = ctx.Process(
+                    target=_worker_main,
+                    args=(send_conn, func, arg,
+                          None if cpu_sets is None else cpu_sets[islot]))
+                proc.start()
+                # only the worker writes to the pipe, closing our end of it
+                # lets `recv` raise once the worker dies.
+                send_conn.close()
+                running[recv_conn] = (itask, proc, islot)
+
+            for conn in wait(list(running)):
+                itask, proc, islot = running.pop(conn)
+                try:
+                    status, payload = conn.recv()
+                except EOFError:
+                    proc.join()
+                    status, payload = ("error", "worker exited with code"
+                                       f" {proc.exitcode}")
+                conn.close()
+                proc.join()
+                free_slots.append(islot)
+
+                results[itask] = (payload
+                                  if status == "ok"
+                                  else TaskFailure(args[itask], payload))
+    finally:
+        for conn, (_, proc, _) in running.items():
+            proc.terminate()
+            proc.join()
+            conn.close()
+
+    return results
+
+
+def drop_failures(outcomes: Sequence[Union[R, TaskFailure]], *,
+                  describe: Callable[[Any], str] = repr) -> List[R]:
+    """
+    Returns the results of the successful calls among the *outcomes* of
+    :func:`run_isolated`, in order, after printing the failed ones to
+    stderr.
+
+    :arg describe: Returns the name of a failed call's argument in the
+        printed message.
+    """
+    results = []
+    for outcome in outcomes:
+        if isinstance(outcome, TaskFailure):
+            print(f"Task {describe(outcome.arg)} failed in its worker"
+                  f" process:\n{outcome.message}", file=sys.stderr)
+        else:
+            results.append(outcome)
+
+    return results
+
+# }}}
+
+# vim: fdm=marker
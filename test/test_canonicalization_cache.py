@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+f = pytest.importorskip("feinsum")
+
+from feinsum_evaluation.canonicalization_cache import (  # noqa: E402
+    CanonicalizationCache, get_structural_key)
+
+
+def _get_matvec(nrows, dtype=np.float64):
+    return f.einsum("ij,j->i",
+                    f.array((nrows, 4), dtype),
+                    f.array((4,), dtype))
+
+
+def test_structural_key_ignores_names():
+    assert get_structural_key(_get_matvec(3)) == get_structural_key(
+        _get_matvec(3))
+
+
+def test_structural_key_tells_shapes_and_dtypes_apart():
+    assert get_structural_key(_get_matvec(3)) != get_structural_key(
+        _get_matvec(5))
+    assert get_structural_key(_get_matvec(3)) != get_structural_key(
+        _get_matvec(3, np.float32))
+
+
+def test_cache_is_lru():
+    ncalls = []
+
+    def canonicalize(expr):
+        ncalls.append(expr)
+        return expr
+
+    cache = CanonicalizationCache(maxsize=2, canonicalize=canonicalize)
+    for nrows in [3, 3, 5, 7, 3]:
+        cache(_get_matvec(nrows))
+
+    assert cache.nhits == 1
+    assert cache.nmisses == 4
+    assert len(ncalls) == 4
+    assert len(cache) == 2
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from feinsum_evaluation.connectivity import (
+    ELEMENT_ORDERINGS, NFACES, get_element_neighbors,
+    get_face_gather_connectivity, get_lattice_shape)
+
+
+@pytest.mark.parametrize("nel", [4, 12, 13, 64, 97, 1000])
+def test_lattice_holds_all_elements(nel):
+    nx, ny = get_lattice_shape(nel)
+
+    assert nx * (ny - 1) < nel <= nx * ny
+
+
+@pytest.mark.parametrize("ordering", list(ELEMENT_ORDERINGS))
+@pytest.mark.parametrize("nel", [12, 13, 64, 97])
+def test_neighbors_are_glued_symmetrically(ordering, nel):
+    neighbors = get_element_neighbors(nel, ordering)
+    elements = np.arange(nel)
+
+    assert neighbors.shape == (NFACES, nel)
+    assert (neighbors != elements).all()
+    for iface in range(NFACES):
+        np.testing.assert_array_equal(
+            neighbors[iface ^ 1, neighbors[iface]], elements)
+
+
+@pytest.mark.parametrize("ordering", list(ELEMENT_ORDERINGS))
+def test_face_gather_connectivity(ordering):
+    nel, ni, nj = 50, 4, 3
+    conn = get_face_gather_connectivity(nel, ni, nj, ordering=ordering)
+
+    assert conn["int_elements"].shape == (NFACES, nel)
+    assert conn["int_dofs"].shape == (NFACES, nj)
+    assert conn["ext_elements"].shape == (NFACES, nel)
+    assert conn["ext_dofs"].shape == (NFACES, nel, nj)
+    assert ((0 <= conn["int_dofs"]) & (conn["int_dofs"] < ni)).all()
+
+    # the exterior face nodes are a rotation of the nodes of the glued face
+    for iface in range(NFACES):
+        glued_dofs = set(conn["int_dofs"][iface ^ 1])
+        for iel in range(nel):
+            assert set(conn["ext_dofs"][iface, iel]) == glued_dofs
+
+
+def test_face_gather_rejects_nj_larger_than_ni():
+    with pytest.raises(ValueError):
+        get_face_gather_connectivity(10, 3, 4, ordering="sfc")
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from feinsum_evaluation.device_rng import (
+    _generate_uniform_cl, _generate_uniform_numpy, generate_uniform_slice,
+    get_stream_start)
+
+
+def test_splitmix64_reference_value():
+    # first output of the SplitMix64 reference implementation seeded with 0
+    expected = (0xE220A8397B1DCDAF >> 11) * 2.0**-53
+
+    assert _generate_uniform_numpy((1,), 0, np.dtype(np.float64))[0] == expected
+
+
+def test_streams_are_disjoint():
+    starts = [get_stream_start(seed, stream)
+              for seed in range(3) for stream in range(16)]
+
+    assert len(set(starts)) == len(starts)
+    assert np.diff(starts).min() == 2**40
+
+    with pytest.raises(ValueError):
+        get_stream_start(0, 16)
+    with pytest.raises(ValueError):
+        get_stream_start(-1, 0)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_slice_matches_full_array(dtype):
+    shape = (3, 5, 7)
+    start = get_stream_start(1, 2) + 11
+    full = _generate_uniform_numpy(shape, start, np.dtype(dtype))
+    index = (slice(1, 3), slice(None, None, 2))
+
+    np.testing.assert_array_equal(
+        generate_uniform_slice(shape, index, start=start, dtype=dtype),
+        full[index])
+    assert ((0 <= full) & (full < 1)).all()
+
+
+def test_padding_does_not_change_entries():
+    start = get_stream_start(0, 3)
+    unpadded = _generate_uniform_numpy((2, 3, 5), start, np.dtype(np.float64))
+    padded = _generate_uniform_numpy((2, 3, 8), start, np.dtype(np.float64),
+                                     unpadded_len=5)
+
+    np.testing.assert_array_equal(padded[..., :5], unpadded)
+    assert not padded[..., 5:].any()
+    np.testing.assert_array_equal(
+        generate_uniform_slice((2, 3, 8), (slice(1, 2), slice(None),
+                                           slice(3, 7)),
+                               start=start, unpadded_len=5),
+        padded[1:2, :, 3:7])
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("unpadded_len", [None, 5])
+def test_opencl_matches_numpy(dtype, unpadded_len):
+    cl = pytest.importorskip("pyopencl")
+    try:
+        ctx = cl.create_some_context(interactive=False)
+    except cl.Error:
+        pytest.skip("no OpenCL device")
+    queue = cl.CommandQueue(ctx)
+    if (dtype == np.float64
+            and "cl_khr_fp64" not in queue.device.extensions):
+        pytest.skip("no float64 support")
+
+    shape = (4, 9)
+    start = get_stream_start(3, 1)
+
+    np.testing.assert_array_equal(
+        _generate_uniform_cl(queue, None, shape, start, np.dtype(dtype),
+                             unpadded_len).get(),
+        _generate_uniform_numpy(shape, start, np.dtype(dtype), unpadded_len))
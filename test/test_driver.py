@@ -0,0 +1,130 @@
+import pytest
+
+from feinsum_evaluation.driver import BenchmarkResult, get_nels, print_results
+from feinsum_evaluation.kernels import KERNELS
+from feinsum_evaluation.memory import MemoryUsage
+from feinsum_evaluation.sizing import get_working_set_size
+from feinsum_evaluation.timing import FirstCallTiming, compute_statistics
+
+
+def _make_result(kernel, actx, nbatch, median=1e-3, **kwargs):
+    return BenchmarkResult(
+        kernel=kernel, actx=actx, nbatch=nbatch, ni=4, nj=3, nel=100,
+        timing=compute_statistics([median, 1.01 * median, 0.99 * median]),
+        first_call=FirstCallTiming(total=0.5, trace=0.1, stages=(),
+                                   first_execution=0.4),
+        warm_first_call=None, cold_cache=False,
+        flop_count=10**6, min_bytes_moved=10**5,
+        memory=MemoryUsage(peak_host_bytes=None, peak_device_bytes=1 << 20,
+                           nallocations_per_call=None, pool_held_bytes=None),
+        **kwargs)
+
+
+def test_get_nels_from_memory_budget():
+    knl = KERNELS["xre_rij_ej_to_xei"]
+    nels = get_nels(knl, 4, 10, None, memory_budget=1 << 20,
+                    weak_scaling=True)
+
+    assert nels == sorted(set(nels))
+    assert get_nels(knl, 4, 10, None, memory_budget=1 << 20) == nels[-1:]
+    assert get_working_set_size(knl, 4, 10, None, nels[-1]) <= 1 << 20
+
+
+def test_numpy_sweep():
+    pytest.importorskip("arraycontext")
+    from feinsum_evaluation.driver import run_sweep
+
+    kernel_names = ["xre_rij_ej_to_xei", "ifj_fe_fej_to_ei"]
+    results, failures = run_sweep(kernel_names=kernel_names,
+                                  actx_names=["numpy"],
+                                  batches=[1, 2],
+                                  nis=[4],
+                                  njs=[3],
+                                  rel_ci_width=0.5,
+                                  max_time=0.1,
+                                  memory_budget=1 << 20,
+                                  verify=True)
+
+    assert not failures
+    assert ({(result.kernel, result.nbatch) for result in results}
+            == {(kernel_name, nbatch)
+                for kernel_name in kernel_names
+                for nbatch in [1, 2]})
+    for result in results:
+        assert result.actx == "numpy"
+        assert result.timing.median > 0
+        assert result.warm_first_call is not None
+
+
+def test_numpy_main(capsys):
+    pytest.importorskip("arraycontext")
+    from feinsum_evaluation.driver import main
+
+    main(["--actxs", "numpy", "--kernels", "xre_rij_ej_to_xei",
+          "--batches", "1", "--ni", "4", "--memory-budget", "1M",
+          "--rel-ci-width", "0.5", "--max-time", "0.1", "--no-results-db"])
+
+    assert "xre_rij_ej_to_xei" in capsys.readouterr().out
+
+
+def test_print_results_without_gathers_on_an_actx(capsys):
+    # the gathers are not supported on pyopencl, and the second batch size
+    # of xre_rij_ej_to_xei failed on numpy
+    results = [_make_result("xre_rij_ej_to_xei", "pyopencl", 1),
+               _make_result("xre_rij_ej_to_xei", "pyopencl", 2),
+               _make_result("xre_rij_ej_to_xei", "numpy", 1),
+               _make_result("gather_ifj_fe_fej_to_ei_sfc", "numpy", 1),
+               _make_result("gather_ifj_fe_fej_to_ei_sfc", "numpy", 2)]
+
+    print_results(results, ["pyopencl", "numpy"])
+
+    out = capsys.readouterr().out
+    assert "gather_ifj_fe_fej_to_ei_sfc" in out
+    assert "break-even #calls vs numpy" in out
+    assert "break-even #calls vs pyopencl" in out
+
+
+def test_main_keeps_results_of_succeeded_tasks(monkeypatch, tmp_path, capsys):
+    from feinsum_evaluation import driver
+    from feinsum_evaluation.results_db import ResultsDatabase
+    from feinsum_evaluation.workers import TaskFailure
+
+    # the worker of xre_rij_ej_to_xei on numpy failed
+    results = [_make_result("xre_rij_ej_to_xei", "pyopencl", 1),
+               _make_result("ifj_fe_fej_to_ei", "pyopencl", 1),
+               _make_result("ifj_fe_fej_to_ei", "numpy", 1)]
+    monkeypatch.setattr(driver, "run_sweep", lambda **kwargs: (
+        results, [TaskFailure(arg=None, message="worker died")]))
+
+    results_db = str(tmp_path / "results.sqlite")
+    with pytest.raises(SystemExit) as exc_info:
+        driver.main(["--actxs", "pyopencl,numpy", "--batches", "1",
+                     "--ni", "4", "--nj", "3", "--results-db", results_db])
+
+    assert exc_info.value.code == 1
+    out = capsys.readouterr().out
+    assert "xre_rij_ej_to_xei" in out
+    assert "1 worker processes failed" in out
+    with ResultsDatabase(results_db) as db:
+        assert (set(db.get_records(db.get_latest_run_id()))
+                == {result.key for result in results})
+
+
+def test_best_layout_is_valid(capsys):
+    from feinsum_evaluation.driver import print_layout_results
+    from feinsum_evaluation.verification import VerificationResult
+
+    results = [
+        _make_result("xre_rij_ej_to_xei", "numpy", 1, 3e-3,
+                     layout="declared"),
+        _make_result("xre_rij_ej_to_xei", "numpy", 1, 2e-3,
+                     layout="element-major"),
+        _make_result("xre_rij_ej_to_xei", "numpy", 1, 1e-3,
+                     layout="element-major-padded",
+                     verification=VerificationResult(errors=[0.5],
+                                                      rtol=1e-5))]
+
+    print_layout_results(results)
+
+    [row] = capsys.readouterr().out.splitlines()[-1:]
+    assert row.split()[-2:] == ["element-major", "1.50x"]
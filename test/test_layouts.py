@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from feinsum_evaluation.layouts import LAYOUTS
+
+
+@pytest.mark.parametrize(("dtype", "padded_len"), [(np.float64, 8),
+                                                   (np.float32, 16)])
+def test_padding_is_64_bytes(dtype, padded_len):
+    layout = LAYOUTS["element-major-padded"]
+    shape = layout.get_storage_shape(("element", "dof"), (7, 4), dtype)
+
+    assert shape == (7, padded_len)
+    assert shape[-1] * np.dtype(dtype).itemsize % 64 == 0
+    assert layout.is_padded(("element", "dof"), (7, 4), dtype)
+
+
+def test_operands_without_elements_are_not_padded():
+    layout = LAYOUTS["element-major-padded"]
+    axes = ("topo_dim", "dof", "dof")
+
+    assert layout.get_storage_shape(axes, (3, 4, 4), np.float32) == (3, 4, 4)
+    assert not layout.is_padded(axes, (3, 4, 4), np.float32)
+
+
+@pytest.mark.parametrize("layout_name", list(LAYOUTS))
+def test_to_storage_keeps_entries(layout_name):
+    layout = LAYOUTS[layout_name]
+    axes = ("face", "element", "facedof")
+    ary = np.arange(4 * 5 * 3, dtype=np.float32).reshape(4, 5, 3)
+
+    stored = layout.to_storage(ary, axes)
+    order = layout.get_axis_order(axes)
+    permuted = ary.transpose(order)
+
+    assert stored.shape == layout.get_storage_shape(axes, ary.shape, ary.dtype)
+    np.testing.assert_array_equal(
+        stored[tuple(slice(0, n) for n in permuted.shape)], permuted)
+    # the padding is zero
+    assert stored.sum() == ary.sum()
+
+
+@pytest.mark.parametrize("kernel_name", ["xre_rij_ej_to_xei",
+                                         "ifj_fe_fej_to_ei"])
+def test_padded_inputs_are_identical_in_every_precision(kernel_name):
+    from feinsum_evaluation.kernels import (KERNELS, generate_random_input_slice,
+                                            get_axis_lengths)
+    from feinsum_evaluation.precision import PRECISIONS
+
+    knl = KERNELS[kernel_name].with_layout(LAYOUTS["element-major-padded"])
+    axis_lens = get_axis_lengths(ni=4, nj=3, nel=5)
+
+    for ioperand, operand in enumerate(knl.operands):
+        shape = knl.get_operand_shape(operand, axis_lens)
+        permuted_shape = tuple(shape[iaxis]
+                               for iaxis in knl.layout.get_axis_order(
+                                   operand.axes))
+        logical_index = tuple(slice(0, n) for n in permuted_shape)
+        entries = {
+            dtype: generate_random_input_slice(
+                knl, ioperand, int(operand.is_batched), axis_lens, (),
+                precision=PRECISIONS[dtype])
+            for dtype in ["float64", "float32"]}
+
+        np.testing.assert_array_equal(
+            entries["float32"][logical_index],
+            entries["float64"][logical_index].astype(np.float32))
+        for ary in entries.values():
+            padding = ary.copy()
+            padding[logical_index] = 0
+            assert not padding.any()
+
+
+@pytest.mark.parametrize("dtype", ["float32", "mixed"])
+def test_verify_padded_cell(dtype):
+    pytest.importorskip("arraycontext")
+    from feinsum_evaluation.kernels import (KERNELS, generate_random_inputs,
+                                            get_axis_lengths)
+    from feinsum_evaluation.numpy_actx import NumpyReferenceArrayContext
+    from feinsum_evaluation.precision import PRECISIONS
+    from feinsum_evaluation.verification import verify_kernel
+
+    actx = NumpyReferenceArrayContext()
+    precision = PRECISIONS[dtype]
+    knl = KERNELS["xre_rij_ej_to_xei"].with_layout(
+        LAYOUTS["element-major-padded"])
+    axis_lens = get_axis_lengths(ni=4, nj=None, nel=50)
+    args = generate_random_inputs(actx, knl, 2, axis_lens, seed=0,
+                                  precision=precision)
+
+    verification = verify_kernel(actx, knl.compile(actx, axis_lens), knl,
+                                 args, 2, axis_lens, seed=0,
+                                 rtol=precision.rtol)
+
+    assert verification.passed
@@ -0,0 +1,54 @@
+import dataclasses as dc
+import numpy as np
+
+from feinsum_evaluation.results_db import (
+    ResultRecord, ResultsDatabase, compare_records, has_regressions)
+
+
+def _make_record(key, samples, peak_device_bytes=None):
+    return ResultRecord(key=key, suite="dg", kernel="kernel", actx="numpy",
+                        nbatch=1, ni=10, nj=None, nel=100, device="cpu",
+                        driver_version="1", median=float(np.median(samples)),
+                        samples=tuple(float(s) for s in samples),
+                        peak_device_bytes=peak_device_bytes,
+                        record={"nel": np.int64(100)})
+
+
+def test_compare_records():
+    samples = 1 + 0.01 * np.random.default_rng(0).random(30)
+    baseline = {"same": _make_record("same", samples),
+                "slower": _make_record("slower", samples),
+                "larger": _make_record("larger", samples, 1000),
+                "removed": _make_record("removed", samples)}
+    current = {"same": _make_record("same", samples),
+               "slower": _make_record("slower", 1.2 * samples),
+               "larger": _make_record("larger", samples, 2000),
+               "added": _make_record("added", samples)}
+
+    comparisons = {comparison.key: comparison
+                   for comparison in compare_records(baseline, current)}
+
+    assert set(comparisons) == {"same", "slower", "larger"}
+    assert not comparisons["same"].is_slowdown(alpha=0.01, threshold=0.05)
+    assert comparisons["slower"].is_slowdown(alpha=0.01, threshold=0.05)
+    assert not comparisons["slower"].is_slowdown(alpha=0.01, threshold=0.5)
+    assert comparisons["same"].relative_memory_change is None
+    assert comparisons["larger"].is_memory_regression(tolerance=0.1)
+    assert has_regressions([comparisons["same"]], alpha=0.01, threshold=0.05,
+                           memory_tolerance=0.1) is False
+
+
+def test_database_round_trip(tmp_path):
+    record = _make_record("cell", [1., 2., 3.], 1024)
+    environment = {"git": {}, "hostname": "host"}
+
+    with ResultsDatabase(str(tmp_path / "results.sqlite")) as db:
+        run_id = db.add_run("dg", [record], argv=["run"],
+                            environment=environment)
+        db.add_run("canonicalization", [], argv=["run"],
+                   environment=environment)
+
+        assert db.get_latest_run_id("dg") == run_id
+        assert [run.nresults for run in db.get_runs()] == [1, 0]
+        assert db.get_records(run_id)["cell"] == dc.replace(
+            record, record={"nel": 100})
@@ -0,0 +1,34 @@
+import pytest
+
+from feinsum_evaluation.saturation import (
+    get_geometric_batches, get_saturation_batch, is_saturated)
+
+
+@pytest.mark.parametrize(("max_nbatch", "factor", "batches"), [
+    (1, 2, [1]),
+    (16, 2, [1, 2, 4, 8, 16]),
+    (20, 2, [1, 2, 4, 8, 16, 20]),
+    (10, 1.5, [1, 2, 3, 5, 8, 10]),
+    ])
+def test_geometric_batches(max_nbatch, factor, batches):
+    assert get_geometric_batches(max_nbatch, factor) == batches
+
+
+def test_is_saturated():
+    # too few sizes to tell
+    assert not is_saturated([1, 1], 0.05)
+    # still improving
+    assert not is_saturated([1, 2, 4, 4.1], 0.05)
+    # a single noisy cell does not end the sweep
+    assert not is_saturated([1, 2, 2.01, 3], 0.05)
+    # flat for two consecutive sizes
+    assert is_saturated([1, 2, 4, 4.1, 4.15], 0.05)
+    # slowing down
+    assert is_saturated([1, 2, 4, 3, 2], 0.05)
+
+
+def test_saturation_batch():
+    batches = [1, 2, 4, 8, 16]
+
+    assert get_saturation_batch(batches, [1, 2, 3.9, 4, 3.95], 0.05) == 4
+    assert get_saturation_batch(batches, [1, 2, 3, 4, 5], 0.05) == 16
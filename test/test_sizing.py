@@ -0,0 +1,68 @@
+import pytest
+
+from feinsum_evaluation.kernels import KERNELS
+from feinsum_evaluation.sizing import (
+    get_memory_level, get_nel_for_memory_budget, get_weak_scaling_nels,
+    get_working_set_size, parse_nbytes)
+
+
+@pytest.mark.parametrize(("value", "nbytes"), [("1048576", 1 << 20),
+                                               ("512M", 512 << 20),
+                                               ("2GiB", 2 << 30),
+                                               ("1.5k", 1536),
+                                               (" 3 GB ", 3 << 30)])
+def test_parse_nbytes(value, nbytes):
+    assert parse_nbytes(value) == nbytes
+
+
+@pytest.mark.parametrize("value", ["", "M", "12X", "-1G"])
+def test_parse_nbytes_rejects_garbage(value):
+    with pytest.raises(ValueError):
+        parse_nbytes(value)
+
+
+@pytest.mark.parametrize("kernel_name", ["xre_rij_ej_to_xei",
+                                         "ifj_fe_fej_to_ei"])
+@pytest.mark.parametrize("nbatch", [1, 4])
+def test_nel_for_memory_budget_is_largest_fitting(kernel_name, nbatch):
+    knl = KERNELS[kernel_name]
+    budget = 64 << 20
+    nel = get_nel_for_memory_budget(knl, nbatch, 10, 6, budget)
+
+    assert (get_working_set_size(knl, nbatch, 10, 6, nel)
+            <= budget
+            < get_working_set_size(knl, nbatch, 10, 6, nel + 1))
+
+
+def test_nel_for_tiny_memory_budget():
+    with pytest.raises(ValueError):
+        get_nel_for_memory_budget(KERNELS["xre_rij_ej_to_xei"], 1, 10, None,
+                                  memory_budget=16)
+
+
+def test_weak_scaling_nels_increase():
+    nels = get_weak_scaling_nels(KERNELS["xre_rij_ej_to_xei"], 1, 10, None,
+                                 min_working_set_size=1 << 20,
+                                 max_working_set_size=1 << 24)
+
+    assert len(nels) == 5
+    assert nels == sorted(set(nels))
+
+
+def test_weak_scaling_nels_end_at_the_budget():
+    knl = KERNELS["xre_rij_ej_to_xei"]
+    budget = 3 << 20
+    nels = get_weak_scaling_nels(knl, 1, 10, None,
+                                 min_working_set_size=1 << 20,
+                                 max_working_set_size=budget)
+
+    assert len(nels) == 3
+    assert nels[-1] == get_nel_for_memory_budget(knl, 1, 10, None, budget)
+
+
+def test_memory_level():
+    cache_sizes = [("L1", 32 << 10), ("L2", 1 << 20)]
+
+    assert get_memory_level(32 << 10, cache_sizes) == "L1"
+    assert get_memory_level(1 << 19, cache_sizes) == "L2"
+    assert get_memory_level(1 << 21, cache_sizes) == "DRAM"
@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from feinsum_evaluation.kernels import KERNELS, get_axis_lengths
+from feinsum_evaluation.streaming import (NCHUNK_SLOTS, PRECISION,
+                                          get_chunk_nel)
+
+
+def _get_chunks_nbytes(knl, nbatch, ni, nj, chunk_nel):
+    # bytes of the chunks in flight
+    return NCHUNK_SLOTS * knl.get_working_set_size(
+        nbatch, get_axis_lengths(ni=ni, nj=nj, nel=chunk_nel), PRECISION)
+
+
+@pytest.mark.parametrize("kernel_name", ["xre_rij_ej_to_xei",
+                                         "xre_rij_xej_to_ei"])
+@pytest.mark.parametrize("nbatch", [1, 3])
+def test_get_chunk_nel_fits_device_memory(kernel_name, nbatch):
+    knl = KERNELS[kernel_name]
+    device_memory = 1 << 30
+    chunk_nel = get_chunk_nel(knl, nbatch, 10, None,
+                              device_memory=device_memory,
+                              max_alloc_size=device_memory,
+                              memory_fraction=0.5)
+
+    assert (_get_chunks_nbytes(knl, nbatch, 10, None, chunk_nel)
+            <= device_memory // 2
+            < _get_chunks_nbytes(knl, nbatch, 10, None, chunk_nel + 1))
+
+
+def test_get_chunk_nel_respects_max_alloc_size():
+    knl = KERNELS["xre_rij_ej_to_xei"]
+    unbounded_nel = get_chunk_nel(knl, 1, 10, None,
+                                  device_memory=1 << 30,
+                                  max_alloc_size=1 << 30)
+    chunk_nel = get_chunk_nel(knl, 1, 10, None,
+                              device_memory=1 << 30,
+                              max_alloc_size=1 << 16)
+
+    assert chunk_nel < unbounded_nel
+    # the gradient, 3 * 10 doubles per element, is the largest array
+    assert chunk_nel == (1 << 16) // (3 * 10 * 8)
+
+
+def test_get_chunk_nel_is_at_least_one_element():
+    knl = KERNELS["xre_rij_ej_to_xei"]
+    # a single element exceeds the largest allocation
+    assert get_chunk_nel(knl, 1, 35, None,
+                         device_memory=1 << 30,
+                         max_alloc_size=8) == 1
+
+    with pytest.raises(ValueError):
+        get_chunk_nel(knl, 64, 35, None,
+                      device_memory=1 << 10,
+                      max_alloc_size=1 << 10)
+
+
+@pytest.mark.parametrize("kernel_name", ["xre_rij_ej_to_xei",
+                                         "ifj_fe_fej_to_ei"])
+def test_host_args_match_device_rng(kernel_name):
+    from feinsum_evaluation.device_rng import (get_stream_start,
+                                               generate_uniform_slice)
+    from feinsum_evaluation.streaming import INPUT_SEED, _generate_host_args
+
+    knl = KERNELS[kernel_name]
+    nbatch = 2
+    axis_lens = get_axis_lengths(ni=4, nj=3, nel=37)
+    host_args = _generate_host_args(knl, nbatch, axis_lens, chunk_nel=10)
+
+    for ioperand, (operand, host_arg) in enumerate(zip(knl.operands,
+                                                       host_args,
+                                                       strict=True)):
+        dtype = operand.get_dtype(PRECISION)
+        shape = knl.layout.get_storage_shape(
+            operand.axes, knl.get_operand_shape(operand, axis_lens), dtype)
+        if operand.is_batched:
+            shape = (nbatch, *shape)
+        # generated at once, as on the devices
+        np.testing.assert_array_equal(
+            host_arg,
+            generate_uniform_slice(shape, (),
+                                   start=get_stream_start(INPUT_SEED,
+                                                          ioperand),
+                                   dtype=dtype))
+
+
+def test_host_memory_budget_is_checked_before_allocating():
+    pytest.importorskip("arraycontext")
+    cl = pytest.importorskip("pyopencl")
+    from feinsum_evaluation.streaming import run_streaming
+
+    actx = _make_cpu_actx(cl)
+    with pytest.raises(ValueError, match="host memory"):
+        run_streaming(actx, "pyopencl", KERNELS["xre_rij_ej_to_xei"], 1, 4,
+                      None, nel=1_000_000_000, chunk_nel=1000,
+                      host_memory_budget=1 << 30)
+
+
+def _make_cpu_actx(cl):
+    from arraycontext import PyOpenCLArrayContext
+    import pyopencl.tools as cl_tools
+
+    devices = [device
+               for platform in cl.get_platforms()
+               for device in platform.get_devices(cl.device_type.CPU)]
+    if not devices:
+        pytest.skip("no OpenCL CPU device")
+
+    queue = cl.CommandQueue(cl.Context([devices[0]]))
+    return PyOpenCLArrayContext(
+        queue, cl_tools.MemoryPool(cl_tools.ImmediateAllocator(queue)))
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_chunk_pipeline_on_cpu(streamed):
+    pytest.importorskip("arraycontext")
+    cl = pytest.importorskip("pyopencl")
+    from pytools.obj_array import make_obj_array
+    from feinsum_evaluation.streaming import (_ChunkPipeline,
+                                              _generate_host_args)
+
+    actx = _make_cpu_actx(cl)
+    knl = KERNELS["xre_rij_ej_to_xei"]
+    nbatch, ni, nel, chunk_nel = 2, 4, 37, 10
+    axis_lens = get_axis_lengths(ni=ni, nj=None, nel=nel)
+    host_args = _generate_host_args(knl, nbatch, axis_lens, chunk_nel)
+
+    pipeline = _ChunkPipeline(actx, knl, nbatch, ni, None, nel, chunk_nel,
+                              host_args)
+    assert pipeline.nchunks == 4
+    if streamed:
+        pipeline.run_streamed(range(pipeline.nchunks))
+    else:
+        for ichunk in range(pipeline.nchunks):
+            pipeline.enqueue_h2d(ichunk)
+            pipeline.enqueue_compute(ichunk)
+            pipeline.enqueue_d2h(ichunk)
+        pipeline.finish()
+
+    # the entire mesh at once
+    device_args = [
+        (make_obj_array([actx.from_numpy(ary) for ary in host_arg])
+         if operand.is_batched
+         else actx.from_numpy(host_arg))
+        for operand, host_arg in zip(knl.operands, host_args, strict=True)]
+    expected = knl.compile(actx, axis_lens)(*device_args)
+
+    for host_output, output in zip(pipeline.host_outputs, expected,
+                                   strict=True):
+        np.testing.assert_allclose(host_output, actx.to_numpy(output),
+                                   rtol=1e-13)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from feinsum_evaluation.timing import compute_statistics, get_slowdown_pvalue
+
+
+def test_statistics_reject_outliers():
+    samples = [1.0, 1.1, 0.9, 1.05, 0.95, 1.0, 100.0]
+    stats = compute_statistics(samples)
+
+    assert stats.n_outliers == 1
+    assert stats.samples == tuple(samples)
+    assert stats.median == 1.0
+    assert stats.min == 0.9
+    assert stats.ci_low <= stats.median <= stats.ci_high
+    assert stats.iqr == stats.q3 - stats.q1
+
+
+def test_statistics_of_zero_samples():
+    with pytest.raises(ValueError):
+        compute_statistics([])
+
+
+def test_slowdown_pvalue():
+    rng = np.random.default_rng(0)
+    baseline = 1 + 0.01 * rng.random(50)
+
+    assert get_slowdown_pvalue(baseline, 1.5 * baseline) < 1e-6
+    assert get_slowdown_pvalue(baseline, baseline / 1.5) > 1 - 1e-6
+    assert 0.05 < get_slowdown_pvalue(baseline, baseline) < 0.95